@@ -157,6 +157,56 @@ const fallbackFromPopulationShares = () => {
   return payload
 }
 
+// State x sex x age backbone for the BRFSS builder's --mrp poststratification (adults and
+// children alike; the builder keeps the adult cells). Not needed at runtime.
+const buildStateCells = async (fields: string[]) => {
+  const regionsPath = path.resolve(process.cwd(), 'config', 'traits', 'state_regions.json')
+  const stateRegions = JSON.parse(fs.readFileSync(regionsPath, 'utf8')) as Record<string, RegionKey>
+  const rows = await fetchCensus(withKey(`${base}?get=${fields.join(',')}&for=state:*`))
+  const [header, ...dataRows] = rows
+  const index: Record<string, number> = header.reduce((acc, key, idx) => {
+    acc[key] = idx
+    return acc
+  }, {} as Record<string, number>)
+
+  const cells: Array<{
+    cell_id: string
+    state: string
+    region: RegionKey
+    sex: SexKey
+    age_band: AgeBandKey
+    pop: number
+  }> = []
+  dataRows.forEach((row) => {
+    const state = row[index.state]
+    const region = stateRegions[state]
+    if (!region) return
+    ;(['male', 'female'] as SexKey[]).forEach((sex) => {
+      ;(Object.keys(ageBands[sex]) as AgeBandKey[]).forEach((band) => {
+        const pop = sumCodes(row, index, ageBands[sex][band])
+        cells.push({ cell_id: `${state}_${sex}_${band}`, state, region, sex, age_band: band, pop })
+      })
+    })
+  })
+
+  const payload = {
+    meta: {
+      year: Number(year),
+      source: 'ACS 1-year',
+      table: 'B01001',
+      generatedAt: new Date().toISOString(),
+      universe: 'all_ages',
+      geography: 'state',
+    },
+    total_pop: cells.reduce((sum, cell) => sum + cell.pop, 0),
+    cells,
+  }
+  const outputPath = path.resolve(process.cwd(), 'data', 'derived', 'acs_state_cells.json')
+  fs.mkdirSync(path.dirname(outputPath), { recursive: true })
+  fs.writeFileSync(outputPath, `${JSON.stringify(payload, null, 2)}\n`, 'utf8')
+  console.log(`Wrote ${cells.length} state cells to data/derived/acs_state_cells.json`)
+}
+
 const run = async () => {
   console.log(`Building ACS cell backbone for year ${year}...`)
   const requestedFields = new Set<string>(['NAME'])
@@ -220,6 +270,11 @@ const run = async () => {
 
     writePayload(payload)
     console.log(`Wrote ${cells.length} cells (all ages) to data/derived/acs_cells.json`)
+    try {
+      await buildStateCells(Array.from(requestedFields))
+    } catch (err) {
+      console.warn('Could not build the ACS state backbone (only needed for --mrp):', err)
+    }
     return
   } catch (err) {
     console.error(err)
@@ -0,0 +1,165 @@
+"""
+Batched weighted logistic regression for many traits over one shared design.
+
+Every trait is fitted on the same covariate patterns (rows of X); only the weighted positive
+and total mass per pattern differ. Newton/IRLS steps for all K traits run together: one
+matrix product for the linear predictors, one einsum for the K Hessians and one stacked
+solve per iteration, instead of a statsmodels GLM per trait.
+
+The likelihood is the binomial GLM with freq_weights used elsewhere in the builders, so
+coefficients match statsmodels to numerical precision. A coefficient whose column has no
+weight for a trait (e.g. a region level a trait never observes) is not identified; the
+pseudo-inverse leaves it at 0, which predicts like the reference level, and its standard
+error is NaN.
+
+An optional ridge `penalty` (a precision per trait and column) turns the same iterations into
+penalized IRLS, e.g. for Gaussian random effects; penalized columns are always identified.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy.special import expit, xlogy
+
+MAX_ITER = 100
+STEP_TOL = 1e-10
+
+
+@dataclass
+class BatchedFit:
+    """Per-trait results; arrays are indexed [trait] or [trait, column]."""
+    columns: List[str]
+    patterns: int
+    params: np.ndarray
+    cov: np.ndarray
+    bse: np.ndarray
+    deviance: np.ndarray
+    iterations: np.ndarray
+    converged: np.ndarray
+
+    def predict(self, design: np.ndarray) -> np.ndarray:
+        """Probabilities for each row of `design` (same columns), shape (rows, traits)."""
+        return expit(design @ self.params.T)
+
+    def coefficients(self, k: int) -> List[dict]:
+        """Coefficient rows for trait `k`: term, estimate, standard error and Wald z."""
+        return [
+            {"term": name, "coef": float(coef), "std_err": float(se), "z": float(coef / se)}
+            for name, coef, se in zip(self.columns, self.params[k], self.bse[k])
+        ]
+
+
+def stack_coefficients(fits: List[Tuple[BatchedFit, int]]) -> Tuple[List[str], np.ndarray]:
+    """
+    Union of the fits' columns, in first-seen order, and the (traits, columns) coefficient
+    matrix of trait `k` of each (fit, k); a column outside a trait's fit gets 0.
+    """
+    columns: List[str] = []
+    for fit, _ in fits:
+        columns += [name for name in fit.columns if name not in columns]
+    position = {name: j for j, name in enumerate(columns)}
+    coefficients = np.zeros((len(fits), len(columns)))
+    for row, (fit, k) in enumerate(fits):
+        coefficients[row, [position[name] for name in fit.columns]] = fit.params[k]
+    return columns, coefficients
+
+
+def binomial_deviance(pos: np.ndarray, total: np.ndarray, mu: np.ndarray) -> np.ndarray:
+    """Deviance per trait for weighted successes `pos` out of `total` at fitted `mu`."""
+    neg = total - pos
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(total > 0, pos / total, 0.0)
+    terms = xlogy(pos, share) - xlogy(pos, mu) + xlogy(neg, 1 - share) - xlogy(neg, 1 - mu)
+    return 2 * terms.sum(axis=0)
+
+
+def fit_logit_batch(
+    design: np.ndarray,
+    pos: np.ndarray,
+    total: np.ndarray,
+    columns: List[str],
+    start: Optional[np.ndarray] = None,
+    max_iter: int = MAX_ITER,
+    tol: float = STEP_TOL,
+    penalty: Optional[np.ndarray] = None,
+) -> BatchedFit:
+    """
+    Fit K weighted logits at once. `design` is (patterns, p); `pos` and `total` are
+    (patterns, K) weighted positive and total mass. Traits stop updating once their
+    largest coefficient step falls below `tol`.
+
+    `start` (K, p) warm-starts IRLS from earlier coefficients; rows with NaN use the
+    default start. `penalty` (K, p) adds 0.5 * penalty * coef**2 to each trait's negative
+    log-likelihood; the returned covariance is then the inverse penalized Hessian.
+    """
+    design = np.asarray(design, dtype="float64")
+    pos = np.asarray(pos, dtype="float64")
+    total = np.asarray(total, dtype="float64")
+    n_traits = pos.shape[1]
+    n_params = design.shape[1]
+    ridge = np.zeros((n_traits, n_params)) if penalty is None else np.asarray(penalty, dtype="float64")
+
+    # Start from the pooled log-odds on the intercept, like a null model
+    params = np.zeros((n_traits, n_params))
+    rate = np.clip(pos.sum(axis=0) / np.maximum(total.sum(axis=0), 1e-300), 1e-6, 1 - 1e-6)
+    params[:, 0] = np.log(rate / (1 - rate))
+    if start is not None:
+        warm = np.isfinite(start).all(axis=1)
+        params[warm] = start[warm]
+
+    active = np.ones(n_traits, dtype=bool)
+    iterations = np.zeros(n_traits, dtype=int)
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        mu = expit(design @ params[idx].T)
+        score = design.T @ (pos[:, idx] - total[:, idx] * mu) - (ridge[idx] * params[idx]).T
+        hessian = np.einsum("nk,ni,nj->kij", total[:, idx] * mu * (1 - mu), design, design)
+        hessian[:, np.arange(n_params), np.arange(n_params)] += ridge[idx]
+        step = np.einsum("kij,jk->ki", np.linalg.pinv(hessian, hermitian=True), score)
+        params[idx] += step
+        iterations[idx] += 1
+        active[idx] = np.abs(step).max(axis=1) >= tol
+
+    return summarize_fit(design, pos, total, columns, params, iterations, ~active, ridge)
+
+
+def summarize_fit(
+    design: np.ndarray,
+    pos: np.ndarray,
+    total: np.ndarray,
+    columns: List[str],
+    params: np.ndarray,
+    iterations: np.ndarray,
+    converged: np.ndarray,
+    ridge: Optional[np.ndarray] = None,
+) -> BatchedFit:
+    """
+    BatchedFit at the (K, p) coefficients `params`, however they were found: unidentified
+    coefficients are zeroed, and covariance and deviance come from the (penalized) Hessian there.
+    """
+    n_params = design.shape[1]
+    ridge = np.zeros_like(params) if ridge is None else ridge
+    params = params.copy()
+    column_weight = total.T @ (design != 0)
+    params[column_weight == 0] = 0.0
+    mu = expit(design @ params.T)
+    hessian = np.einsum("nk,ni,nj->kij", total * mu * (1 - mu), design, design)
+    hessian[:, np.arange(n_params), np.arange(n_params)] += ridge
+    cov = np.linalg.pinv(hessian, hermitian=True)
+    identified = (column_weight > 0) | (ridge > 0)
+    cov[~(identified[:, :, None] & identified[:, None, :])] = np.nan
+    bse = np.sqrt(np.clip(np.diagonal(cov, axis1=1, axis2=2), 0, None))
+    return BatchedFit(
+        columns=list(columns),
+        patterns=design.shape[0],
+        params=params,
+        cov=cov,
+        bse=bse,
+        deviance=binomial_deviance(pos, total, mu),
+        iterations=iterations,
+        converged=converged,
+    )
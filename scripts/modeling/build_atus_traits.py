@@ -10,6 +10,7 @@ Outputs:
 """
 from __future__ import annotations
 
+import argparse
 import json
 import re
 import sys
@@ -19,13 +20,54 @@ from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
+
+from batched_logit import BatchedFit
+from bootstrap import (
+    PoissonMultipliers,
+    converged_replicates,
+    fit_replicates,
+    pattern_replicate_totals,
+    percentile_intervals,
+)
+from calibration import calibrate_cells, shift_intervals
+from cell_layout import CellLayout, child_rows, validate_probabilities
+from diagnostics import diagnostics_enabled, fit_diagnostics, write_diagnostics
+from fit_cache import FitCache, cache_namespace, fit_logit_cached
+from logit_backends import (
+    BACKENDS,
+    BENCHMARK_TOL,
+    DEFAULT_BACKEND,
+    benchmark_backends,
+    combine_benchmarks,
+    report_benchmark,
+)
+from preflight import PreflightReport, normalize_names, raise_if_failed
+from survey_archives import find_member, is_zip, member_size, open_member, require_member
+from recode import recode_atus_age, recode_census_region, recode_sex
+from model_specs import (
+    AUTO_SPEC,
+    CV_FOLDS,
+    MODEL_SPECS,
+    SELECTION_CRITERIA,
+    CellEncoder,
+    check_spec,
+    expand_design,
+    predict_cells,
+    select_specs,
+    selection_meta,
+    spec_design,
+)
+from survey_schema import ATUS_PATTERN_SCHEMA, ATUS_SCHEMA, apply_schema
+from survey_variance import uncertainty_by_cell
+from trait_output import build_timestamp
 
 ROOT = Path(__file__).resolve().parents[2]
 CONFIG_PATH = ROOT / "config" / "traits" / "atus.json"
 ACS_CELLS_PATH = ROOT / "data" / "derived" / "acs_cells.json"
 TRAIT_OUTPUT_DIR = ROOT / "data" / "derived" / "traits"
 PUBLIC_OUTPUT_DIR = ROOT / "public" / "data" / "derived" / "traits"
+# Ends the error when a trait's implied prevalence falls outside its bounds
+PREVALENCE_HINT = "Check the column patterns and threshold for this trait."
 
 
 @dataclass
@@ -47,6 +89,8 @@ class TraitConfig:
     universeLabel: str = "Adults 18+"
     regionSupport: str = "national_only"
     prevalence_bounds: List[float] = field(default_factory=lambda: [0.01, 0.50])
+    model_spec: str = "main"
+    model_selection: str = "aic"
 
 
 def load_json(path: Path) -> dict:
@@ -76,44 +120,6 @@ def detect_caseid(resp_df: pd.DataFrame, sum_df: pd.DataFrame) -> str:
     raise KeyError("Could not detect respondent ID column shared by ATUS respondent and summary files.")
 
 
-def to_age_band(age: float) -> Optional[str]:
-    if pd.isna(age):
-        return None
-    age_int = int(age)
-    if age_int < 18:
-        return None  # ATUS includes 15+, but we're limiting to 18+
-    if 18 <= age_int <= 24:
-        return "18_24"
-    if 25 <= age_int <= 34:
-        return "25_34"
-    if 35 <= age_int <= 44:
-        return "35_44"
-    if 45 <= age_int <= 54:
-        return "45_54"
-    if 55 <= age_int <= 64:
-        return "55_64"
-    return "65_plus"
-
-
-def to_sex(value: float) -> Optional[str]:
-    if pd.isna(value):
-        return None
-    code = int(value)
-    if code == 1:
-        return "male"
-    if code == 2:
-        return "female"
-    return None
-
-
-def to_region_from_code(value: float) -> Optional[str]:
-    if pd.isna(value):
-        return None
-    code = int(value)
-    mapping = {1: "northeast", 2: "midwest", 3: "south", 4: "west"}
-    return mapping.get(code)
-
-
 def sum_time_columns(df: pd.DataFrame, patterns: List[str], label: str) -> Tuple[pd.Series, List[str]]:
     """
     Sum time-use columns matching the given regex patterns.
@@ -125,7 +131,7 @@ def sum_time_columns(df: pd.DataFrame, patterns: List[str], label: str) -> Tuple
         cols = [c for c in df.columns if regex.match(c)]
         matched_cols.extend(cols)
     
-    matched_cols = list(set(matched_cols))  # Dedupe
+    matched_cols = list(dict.fromkeys(matched_cols))  # Dedupe, keeping match order so outputs are reproducible
     
     if not matched_cols:
         print(f"WARNING: No columns matched patterns {patterns} for {label}")
@@ -140,72 +146,142 @@ def sum_time_columns(df: pd.DataFrame, patterns: List[str], label: str) -> Tuple
     return minutes, matched_cols
 
 
-def fit_logit(df: pd.DataFrame, label_col: str, weight_col: str, include_region: bool):
-    feature_cols = ["sex_key", "age_band"]
-    if include_region:
-        feature_cols.append("region_key")
-    dummies = pd.get_dummies(df[feature_cols], drop_first=True).astype(float)
-    design = sm.add_constant(dummies, has_constant="add").astype(float)
-    y = pd.to_numeric(df[label_col], errors="coerce").astype(float)
-    weights = pd.to_numeric(df[weight_col], errors="coerce").astype(float)
-    model = sm.GLM(y, design, family=sm.families.Binomial(), freq_weights=weights)
-    result = model.fit()
-    return result, design.columns, feature_cols
+def aggregate_patterns(df: pd.DataFrame, label_cols: List[str], weight_col: str, feature_cols: List[str]) -> pd.DataFrame:
+    """Collapse respondents to total weight and each trait's positive weight per covariate pattern."""
+    weight = df[weight_col].astype("float64")
+    stats = pd.DataFrame({"total_weight": weight, "row_count": 1})
+    for col in label_cols:
+        stats[col] = weight.where(df[col] == 1, 0.0)
+    return stats.groupby([df[col] for col in feature_cols], observed=True).sum()
 
 
-def predict_for_cells(result, design_columns, cells: pd.DataFrame):
-    dummies = pd.get_dummies(cells, drop_first=True)
-    design = sm.add_constant(dummies, has_constant="add").astype(float)
-    design = design.reindex(columns=design_columns, fill_value=0)
-    preds = result.predict(design)
-    return np.clip(preds, 0, 1)
+def pattern_design(patterns: pd.DataFrame, feature_cols: List[str], spec: str = "main") -> pd.DataFrame:
+    """Intercept, drop-first dummies for the observed feature levels and the spec's interactions."""
+    return spec_design(patterns, feature_cols, spec)
 
 
-def is_child_age_band(age_band: str) -> bool:
-    """Check if an age band is for children (under 18)."""
-    return age_band in ("0_17", "0_14", "15_17")
+def model_features(include_region: bool) -> List[str]:
+    return ["sex_key", "age_band", "region_key"] if include_region else ["sex_key", "age_band"]
 
 
-def validate_probabilities(
-    prob_by_cell: Dict[str, float], 
-    cells_df: pd.DataFrame, 
-    trait_key: str,
-    bounds: List[float]
-) -> float:
-    """Validate probabilities and compute implied prevalence."""
-    min_prev, max_prev = bounds
-    
-    for cell_id, prob in prob_by_cell.items():
-        if not np.isfinite(prob):
-            raise ValueError(f"Trait {trait_key}: probability for {cell_id} is not finite: {prob}")
-        if prob < 0 or prob > 1:
-            raise ValueError(f"Trait {trait_key}: probability for {cell_id} out of bounds [0,1]: {prob}")
-    
-    # Only use adult cells for prevalence calculation (exclude child age bands)
-    adult_cells = cells_df[~cells_df["age_band"].apply(is_child_age_band)].copy()
-    
-    if adult_cells.empty:
-        raise ValueError(f"Trait {trait_key}: No adult cells found for prevalence calculation")
-    
-    total_pop = adult_cells["pop"].sum()
-    weighted_sum = sum(
-        adult_cells.loc[adult_cells["cell_id"] == cell_id, "pop"].iloc[0] * prob
-        for cell_id, prob in prob_by_cell.items()
-        if cell_id in adult_cells["cell_id"].values
-    )
-    
-    prevalence = weighted_sum / total_pop if total_pop > 0 else 0
-    
-    print(f"  Implied national prevalence: {prevalence:.2%}")
-    
-    if prevalence < min_prev or prevalence > max_prev:
-        raise ValueError(
-            f"Trait {trait_key}: Implied prevalence {prevalence:.2%} is outside plausible bounds "
-            f"[{min_prev:.0%}, {max_prev:.0%}]. "
-            f"Check the column patterns and threshold for this trait."
+def trait_problem(
+    df: pd.DataFrame, label_cols: List[str], weight_col: str, feature_cols: List[str], spec: str = "main"
+) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Pattern design and per-trait positive/total weight for every trait in `label_cols`."""
+    patterns = aggregate_patterns(df, label_cols, weight_col, feature_cols).reset_index()
+    design = pattern_design(patterns, feature_cols, spec)
+    pos = patterns[label_cols].to_numpy(dtype="float64")
+    total = np.repeat(patterns[["total_weight"]].to_numpy(dtype="float64"), len(label_cols), axis=1)
+    return design, pos, total
+
+
+def fit_logit(
+    df: pd.DataFrame,
+    label_cols: List[str],
+    weight_col: str,
+    include_region: bool,
+    cache: Optional[FitCache] = None,
+    spec: str = "main",
+    backend: str = DEFAULT_BACKEND,
+):
+    """
+    Weighted logits for every trait in one batched solve over the per-pattern aggregates:
+    the weighted share as the response and the total weight as freq_weights give the same
+    likelihood, and coefficients, as a row-level fit. With a `cache`, unchanged traits reuse
+    their stored fit and changed ones warm-start from it.
+    """
+    feature_cols = model_features(include_region)
+    design, pos, total = trait_problem(df, label_cols, weight_col, feature_cols, spec)
+    fit = fit_logit_cached(design.to_numpy(), pos, total, list(design.columns), label_cols, cache, backend)
+    return fit, feature_cols
+
+
+def cell_design(cells: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Design rows for cells, aligned to a fit's columns."""
+    return expand_design(cells, list(cells.columns), columns)
+
+
+def choose_specs(
+    df: pd.DataFrame,
+    traits: List[TraitConfig],
+    weight_col: str,
+    feature_cols: List[str],
+    spec_override: Optional[str] = None,
+    selection_override: Optional[str] = None,
+    n_folds: int = CV_FOLDS,
+) -> Dict[str, dict]:
+    """
+    Each trait's meta["model"] entry. Traits set to "auto" have every candidate spec scored
+    on per-pattern totals; held-out folds deal respondent rows round-robin.
+    """
+    choices: Dict[str, dict] = {}
+    auto: Dict[str, List[str]] = {}
+    for trait in traits:
+        spec = spec_override or trait.model_spec
+        if spec == AUTO_SPEC:
+            auto.setdefault(selection_override or trait.model_selection, []).append(trait.key)
+        else:
+            choices[trait.key] = selection_meta(spec, None, None, 0)
+    if not auto:
+        return choices
+
+    patterns = aggregate_patterns(df, [], weight_col, feature_cols)
+    weight = df[weight_col].astype("float64")
+    size = float(weight.sum() ** 2 / (weight**2).sum())
+    for criterion, keys in auto.items():
+        stats = aggregate_patterns(df, keys, weight_col, feature_cols).reindex(patterns.index, fill_value=0)
+        pos = stats[keys].to_numpy(dtype="float64")
+        total = np.repeat(stats[["total_weight"]].to_numpy(dtype="float64"), len(keys), axis=1)
+        folds = None
+        if criterion == "heldout":
+            fold = pd.Series(np.arange(len(df)) % n_folds, index=df.index)
+            per_fold = [
+                aggregate_patterns(df[fold == v], keys, weight_col, feature_cols).reindex(patterns.index, fill_value=0)
+                for v in range(n_folds)
+            ]
+            folds = (
+                np.stack([f[keys].to_numpy(dtype="float64") for f in per_fold]),
+                np.stack([np.repeat(f[["total_weight"]].to_numpy(dtype="float64"), len(keys), axis=1) for f in per_fold]),
+            )
+        sizes = np.full(len(keys), size)
+        chosen, scores = select_specs(
+            patterns.index.to_frame(index=False), feature_cols, pos, total, sizes, criterion, folds
         )
-    
-    return prevalence
+        for k, key in enumerate(keys):
+            choices[key] = selection_meta(chosen[k], criterion, scores, k)
+            print(f"Model spec for {key}: {chosen[k]} (by {criterion})")
+    return choices
+
+
+def bootstrap_intervals(
+    df: pd.DataFrame,
+    label_cols: List[str],
+    weight_col: str,
+    feature_cols: List[str],
+    fit: BatchedFit,
+    cells_matrix: np.ndarray,
+    replicates: int,
+    seed: int,
+):
+    """
+    Poisson-bootstrap percentile intervals for every trait: replicate totals per covariate
+    pattern, refitted in one batched solve warm-started from `fit`. Returns per-cell
+    (se, lower, upper) arrays of shape (cells, traits) and each trait's converged replicate count.
+    """
+    grouped = df.groupby([df[col] for col in feature_cols], observed=True)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    patterns = grouped.size().index.to_frame(index=False)
+    weight = df[weight_col].to_numpy(dtype="float64")
+    columns = [np.where(df[col].to_numpy() == 1, weight, 0.0) for col in label_cols] + [weight]
+    totals = pattern_replicate_totals(
+        codes, len(patterns), np.column_stack(columns), PoissonMultipliers(replicates, seed)
+    )
+    pos = totals[:, :-1]
+    total = np.repeat(totals[:, -1:], len(label_cols), axis=1)
+    design = cell_design(patterns[feature_cols], fit.columns)
+    replicate_fit = fit_replicates(design, pos, total, fit.columns, fit.params)
+    intervals = percentile_intervals(replicate_fit, cells_matrix, len(label_cols))
+    return intervals, converged_replicates(replicate_fit, len(label_cols))
 
 
 def log_trait_summary(trait_key: str, trait_df: pd.DataFrame, weight_col: str):
@@ -225,11 +301,17 @@ def log_trait_summary(trait_key: str, trait_df: pd.DataFrame, weight_col: str):
     print(f"    Positive cases: {(labels == 1).sum():,} ({(labels == 1).mean():.1%} unweighted)")
 
 
-def write_trait_output(trait_key: str, meta: dict, prob_by_cell: Dict[str, float]):
+def write_trait_output(
+    trait_key: str,
+    meta: dict,
+    prob_by_cell: Dict[str, float],
+    uncertainty: Optional[Dict[str, dict]] = None,
+):
     TRAIT_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     PUBLIC_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    payload = {"meta": meta, "prob_by_cell": prob_by_cell}
+    # se_by_cell / ci95_by_cell sit next to prob_by_cell for bootstrap runs
+    payload = {"meta": meta, "prob_by_cell": prob_by_cell, **(uncertainty or {})}
     out_path = TRAIT_OUTPUT_DIR / f"{trait_key}.json"
     pub_path = PUBLIC_OUTPUT_DIR / f"{trait_key}.json"
 
@@ -239,11 +321,79 @@ def write_trait_output(trait_key: str, meta: dict, prob_by_cell: Dict[str, float
     print(f"Wrote trait probabilities: {out_path}")
 
 
-def load_atus_data(data_dir: Path) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Load ATUS respondent and summary files."""
-    # Try CSV first, then DAT files
-    resp_files = sorted(data_dir.glob("*atusresp*.csv")) or sorted(data_dir.glob("*atusresp*.dat"))
-    sum_files = sorted(data_dir.glob("*atussum*.csv")) or sorted(data_dir.glob("*atussum*.dat"))
+def finish_trait(
+    trait: TraitConfig,
+    model_df: pd.DataFrame,
+    fit_note: str,
+    preds: np.ndarray,
+    intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    layout: CellLayout,
+    meta: dict,
+) -> tuple:
+    """Log, validate and assemble one fitted trait."""
+    print(f"\n{'='*60}")
+    print(f"Modeling trait: {trait.label} ({trait.key})")
+    print(f"{'='*60}")
+    log_trait_summary(trait.key, model_df, "weight")
+    if fit_note:
+        print(fit_note)
+
+    # Adult cells carry the model predictions; child cells (0_14, 15_17, or legacy 0_17) are 0 (ineligible)
+    rounded = np.round(preds, 6)
+    prob_by_cell = layout.prob_by_cell(rounded)
+    prevalence = validate_probabilities(rounded, layout, trait.key, trait.prevalence_bounds, PREVALENCE_HINT)
+    meta = {**meta, "implied_prevalence": round(prevalence, 4)}
+
+    uncertainty = None
+    if intervals is not None:
+        uncertainty = uncertainty_by_cell(layout.adult_ids, layout.child_ids, intervals)
+    return trait.key, meta, prob_by_cell, uncertainty
+
+
+def find_atus_files(data_dir: Path, stem: str) -> List[Path]:
+    """
+    Find ATUS extracts for `stem` ("atusresp", "atussum"): CSV first, then DAT, then the
+    BLS zip archives, which are read in place.
+    """
+    files = sorted(data_dir.glob(f"*{stem}*.csv")) or sorted(data_dir.glob(f"*{stem}*.dat"))
+    if not files:
+        files = [p for p in sorted(data_dir.glob(f"*{stem}*.zip")) if find_member(p, atus_member_patterns(stem))]
+    return files
+
+
+def atus_member_patterns(stem: str) -> List[str]:
+    return [f"*{stem}*.dat", f"*{stem}*.csv"]
+
+
+def atus_file_size(path: Path, stem: str) -> int:
+    if is_zip(path):
+        return member_size(path, require_member(path, atus_member_patterns(stem)))
+    return path.stat().st_size
+
+
+def read_atus_file(path: Path, stem: str) -> pd.DataFrame:
+    """Read one ATUS extract and cast it to the compact dtypes declared in ATUS_SCHEMA."""
+    if is_zip(path):
+        with open_member(path, require_member(path, atus_member_patterns(stem))) as stream:
+            df = pd.read_csv(stream, low_memory=False)
+    else:
+        df = pd.read_csv(path, low_memory=False)
+    return apply_schema(df, ATUS_SCHEMA, ATUS_PATTERN_SCHEMA)
+
+
+def read_atus_header(path: Path, stem: str) -> List[str]:
+    """Column names from the CSV header row only."""
+    if is_zip(path):
+        with open_member(path, require_member(path, atus_member_patterns(stem))) as stream:
+            return list(pd.read_csv(stream, nrows=0).columns)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def find_atus_inputs(data_dir: Path) -> Tuple[Path, Path]:
+    """Pick the ATUS respondent and summary files."""
+    # Try CSV first, then DAT files, then zip archives
+    resp_files = find_atus_files(data_dir, "atusresp")
+    sum_files = find_atus_files(data_dir, "atussum")
     
     if not resp_files:
         raise FileNotFoundError(f"No ATUS respondent files found in {data_dir}")
@@ -251,33 +401,127 @@ def load_atus_data(data_dir: Path) -> Tuple[pd.DataFrame, pd.DataFrame]:
         raise FileNotFoundError(f"No ATUS summary files found in {data_dir}")
     
     # Use largest files (most recent year typically)
-    resp_files.sort(key=lambda p: p.stat().st_size, reverse=True)
-    sum_files.sort(key=lambda p: p.stat().st_size, reverse=True)
-    
-    resp_path = resp_files[0]
-    sum_path = sum_files[0]
-    
+    resp_files.sort(key=lambda p: atus_file_size(p, "atusresp"), reverse=True)
+    sum_files.sort(key=lambda p: atus_file_size(p, "atussum"), reverse=True)
+    return resp_files[0], sum_files[0]
+
+
+def preflight_atus(resp_path: Path, sum_path: Path, traits: List[TraitConfig]) -> PreflightReport:
+    """Resolve configured variables and activity patterns against the CSV headers only."""
+    report = PreflightReport(f"{resp_path.name} + {sum_path.name}")
+    names = read_atus_header(resp_path, "atusresp") + read_atus_header(sum_path, "atussum")
+    columns = normalize_names(names)
+    report.require("weight", columns, traits[0].weight_vars)
+    report.require("sex", columns, traits[0].sex_vars)
+    report.require("age", columns, traits[0].age_vars)
+    report.prefer("region", columns, traits[0].region_vars)
+    for trait in traits:
+        patterns = trait.label_rule.get("column_patterns", [])
+        regexes = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        matched = sorted({name for name in names if any(r.match(name) for r in regexes)})
+        if matched:
+            report.resolved[f"{trait.key} label_rule"] = f"{len(matched)} columns matching {patterns}"
+        else:
+            report.warnings.append(f"{trait.key}: no columns match {patterns}; trait will be skipped")
+    return report
+
+
+def load_atus_data(resp_path: Path, sum_path: Path) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Load ATUS respondent and summary files."""
     print(f"Loading ATUS respondent file: {resp_path}")
     print(f"Loading ATUS summary file: {sum_path}")
     
-    resp_df = pd.read_csv(resp_path, low_memory=False)
-    sum_df = pd.read_csv(sum_path, low_memory=False)
+    resp_df = read_atus_file(resp_path, "atusresp")
+    sum_df = read_atus_file(sum_path, "atussum")
     
     return resp_df, sum_df
 
 
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build modeled trait probabilities from ATUS microdata.")
+    parser.add_argument(
+        "--no-fit-cache",
+        action="store_true",
+        help="Refit every trait from scratch instead of reusing or warm-starting from data/cache/fits/.",
+    )
+    parser.add_argument(
+        "--model-spec",
+        choices=MODEL_SPECS + (AUTO_SPEC,),
+        help="Model every trait with this spec instead of its configured model_spec.",
+    )
+    parser.add_argument(
+        "--model-selection",
+        choices=SELECTION_CRITERIA,
+        help="Criterion for auto specs instead of each trait's model_selection.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND,
+        help="Solver for the trait logits (selection and bootstrap always use the batched NumPy IRLS).",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Fit every trait with each backend, report time, peak memory and prediction differences, and exit.",
+    )
+    parser.add_argument(
+        "--benchmark-tol",
+        type=float,
+        default=BENCHMARK_TOL,
+        help="Largest prediction difference from statsmodels a backend may show to be recommended.",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        metavar="B",
+        help="Add Poisson-bootstrap standard errors and percentile intervals from B replicates.",
+    )
+    parser.add_argument(
+        "--bootstrap-seed",
+        type=int,
+        default=0,
+        help="Seed for the bootstrap weight multipliers.",
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Rake cell probabilities on the logit scale to the survey's weighted margins of each model feature.",
+    )
+    parser.add_argument(
+        "--diagnostics",
+        action="store_true",
+        help="Write per-trait fit diagnostics (JSON + HTML) to data/diagnostics/ (or set TRAIT_DIAGNOSTICS=1).",
+    )
+    parser.add_argument(
+        "--preflight-only",
+        action="store_true",
+        help="Check the configured variables against the file headers and exit.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
     config = load_json(CONFIG_PATH)
     acs_cells = load_json(ACS_CELLS_PATH)
     
     traits = [TraitConfig(**t) for t in config.get("traits", [])]
+    for trait in traits:
+        check_spec(trait.model_spec, trait.model_selection, trait.key)
     
     if not traits:
         print("No ATUS traits configured. Exiting.")
         return 0
 
     data_dir = ROOT / "data" / "raw" / "atus"
-    resp_df, sum_df = load_atus_data(data_dir)
+    resp_path, sum_path = find_atus_inputs(data_dir)
+    raise_if_failed([preflight_atus(resp_path, sum_path, traits)])
+    if args.preflight_only:
+        return 0
+
+    resp_df, sum_df = load_atus_data(resp_path, sum_path)
     
     case_col = detect_caseid(resp_df, sum_df)
     print(f"Using case ID column: {case_col}")
@@ -314,12 +558,12 @@ def main():
     if include_region and region_col:
         merged[region_col] = pd.to_numeric(merged[region_col], errors="coerce")
 
-    merged["weight"] = merged[weight_col].apply(lambda x: float(x) if pd.notna(x) else np.nan)
-    merged["sex_key"] = merged[sex_col].apply(to_sex)
-    merged["age_band"] = merged[age_col].apply(to_age_band)
+    merged["weight"] = merged[weight_col].astype("float32")
+    merged["sex_key"] = recode_sex(merged[sex_col])
+    merged["age_band"] = recode_atus_age(merged[age_col])
     
     if include_region and region_col:
-        merged["region_key"] = merged[region_col].apply(to_region_from_code)
+        merged["region_key"] = recode_census_region(merged[region_col])
     else:
         merged["region_key"] = "nationwide"
         include_region = False
@@ -328,101 +572,155 @@ def main():
     cells_df = pd.DataFrame(acs_cells["cells"])[["cell_id", "sex", "age_band", "region", "pop"]].copy()
     cells_df = cells_df.rename(columns={"sex": "sex_key", "region": "region_key"})
 
+    # Filter to valid records; the mask does not depend on the trait
+    keep_mask = (
+        merged["weight"].notna()
+        & (merged["weight"] > 0)
+        & merged["sex_key"].notna()
+        & merged["age_band"].notna()
+    )
+    if include_region and not (keep_mask & merged["region_key"].notna()).any():
+        print("No usable ATUS records with region; retrying without region term.")
+        include_region = False
+        merged["region_key"] = "nationwide"
+    if include_region:
+        keep_mask &= merged["region_key"].notna()
+    if not keep_mask.any():
+        raise RuntimeError("No usable ATUS records after filtering.")
+
+    # Label every trait first, then fit them together in one batched solve
+    labeled: List[Tuple[TraitConfig, List[str], int]] = []
     for trait in traits:
-        print(f"\n{'='*60}")
-        print(f"Modeling trait: {trait.label} ({trait.key})")
-        print(f"{'='*60}")
-        
         rule = trait.label_rule
         patterns = rule.get("column_patterns", [])
         threshold = rule.get("threshold_minutes", 1)
-        
+
         # Sum time columns based on patterns
         minutes, matched_cols = sum_time_columns(merged, patterns, trait.key)
-        merged[f"{trait.key}_minutes"] = minutes
-        merged[trait.key] = (minutes >= threshold).astype(int)
-        
         if not matched_cols:
             print(f"  WARNING: No columns matched for {trait.key}. Skipping.")
             continue
-        
-        # Filter to valid records
-        keep_mask = (
-            merged["weight"].notna()
-            & (merged["weight"] > 0)
-            & merged["sex_key"].notna()
-            & merged["age_band"].notna()
+        merged[trait.key] = (minutes >= threshold).astype(int)
+        labeled.append((trait, matched_cols, threshold))
+    if not labeled:
+        print("No ATUS traits matched any activity columns.")
+        return 0
+
+    label_cols = [trait.key for trait, _, _ in labeled]
+    model_df = merged.loc[keep_mask, ["sex_key", "age_band", "region_key", "weight", *label_cols]]
+    fit_cache = None if args.no_fit_cache else FitCache(cache_namespace("atus", args.backend))
+    feature_cols = model_features(include_region)
+    models = choose_specs(
+        model_df, [trait for trait, _, _ in labeled], "weight", feature_cols, args.model_spec, args.model_selection
+    )
+
+    # Prepare cells for prediction (adults only)
+    layout = CellLayout.from_cells(cells_df)
+    adult_cells_df = cells_df[~child_rows(cells_df["age_band"])].copy()
+    if not include_region:
+        adult_cells_df["region_key"] = "nationwide"
+    adult_keys = adult_cells_df[["sex_key", "age_band", "region_key"]]
+    cell_encoder = CellEncoder(adult_keys, feature_cols)
+
+    if args.benchmark:
+        groups = []
+        for spec in MODEL_SPECS:
+            keys = [key for key in label_cols if models[key]["spec"] == spec]
+            if keys:
+                design, pos, total = trait_problem(model_df, keys, "weight", feature_cols, spec)
+                adult_matrix = cell_encoder.design(design.columns)
+                groups.append(benchmark_backends(design.to_numpy(), pos, total, list(design.columns), adult_matrix))
+        report_benchmark(combine_benchmarks(groups), args.benchmark_tol)
+        return 0
+
+    # One batched solve per model spec
+    fit_index: Dict[str, Tuple[BatchedFit, int]] = {}
+    replicate_intervals: Dict[str, tuple] = {}
+    for spec in MODEL_SPECS:
+        keys = [key for key in label_cols if models[key]["spec"] == spec]
+        if not keys:
+            continue
+        fit, _ = fit_logit(
+            model_df, keys, "weight", include_region=include_region, cache=fit_cache, spec=spec, backend=args.backend
         )
-        if include_region:
-            keep_mask &= merged["region_key"].notna()
-
-        model_df = merged.loc[keep_mask, ["sex_key", "age_band", "region_key", "weight", trait.key]].copy()
-        
-        if model_df.empty and include_region:
-            print("No usable ATUS records with region; retrying without region term.")
-            include_region = False
-            merged["region_key"] = "nationwide"
-            keep_mask = (
-                merged["weight"].notna()
-                & (merged["weight"] > 0)
-                & merged["sex_key"].notna()
-                & merged["age_band"].notna()
+        if args.bootstrap > 0:
+            intervals, converged = bootstrap_intervals(
+                model_df,
+                keys,
+                "weight",
+                feature_cols,
+                fit,
+                cell_encoder.design(fit.columns),
+                args.bootstrap,
+                args.bootstrap_seed,
             )
-            model_df = merged.loc[keep_mask, ["sex_key", "age_band", "region_key", "weight", trait.key]].copy()
-        
-        if model_df.empty:
-            raise RuntimeError(f"No usable ATUS records for trait {trait.key} after filtering.")
-
-        model_df[trait.key] = pd.to_numeric(model_df[trait.key], errors="coerce").astype(float)
-        model_df["weight"] = pd.to_numeric(model_df["weight"], errors="coerce").astype(float)
-        
-        # Log summary before modeling
-        log_trait_summary(trait.key, model_df, "weight")
-
-        result, design_columns, feature_cols = fit_logit(
-            model_df,
-            trait.key,
-            "weight",
-            include_region=include_region,
-        )
-        print(result.summary())
-
-        # Prepare cells for prediction (adults only)
-        adult_cells_df = cells_df[~cells_df["age_band"].apply(is_child_age_band)].copy()
-        if not include_region:
-            adult_cells_df["region_key"] = "nationwide"
-
-        preds = predict_for_cells(result, design_columns, adult_cells_df[["sex_key", "age_band", "region_key"]])
-        
-        # Build prob_by_cell
-        prob_by_cell = {cell_id: float(round(prob, 6)) for cell_id, prob in zip(adult_cells_df["cell_id"], preds)}
-        
-        # Add child cells (0_14, 15_17, or legacy 0_17) with probability 0 (ineligible)
-        child_cells = cells_df[cells_df["age_band"].apply(is_child_age_band)]
-        for _, row in child_cells.iterrows():
-            prob_by_cell[row["cell_id"]] = 0.0
-        
-        # Validate
-        prevalence = validate_probabilities(prob_by_cell, cells_df, trait.key, trait.prevalence_bounds)
-        
-        region_support = "national_only" if not include_region else "modeled"
-        
+        for k, key in enumerate(keys):
+            fit_index[key] = (fit, k)
+            if args.bootstrap > 0:
+                replicate_intervals[key] = (tuple(values[:, k] for values in intervals), int(converged[k]))
+
+    # Every trait predicts in one product over the union of the specs' columns
+    preds = np.clip(predict_cells(cell_encoder, list(fit_index.values())), 0, 1)
+    all_preds = {key: preds[:, k] for k, key in enumerate(fit_index)}
+
+    calibrated: Dict[str, tuple] = {}
+    if args.calibrate:
+        stats = aggregate_patterns(model_df, label_cols, "weight", feature_cols).reset_index()
+        patterns = {
+            key: stats[feature_cols].assign(pos_weight=stats[key], total_weight=stats["total_weight"]) for key in label_cols
+        }
+        calibrated = calibrate_cells(all_preds, adult_cells_df, feature_cols, patterns)
+        for key, (prob, _, _) in calibrated.items():
+            all_preds[key] = np.clip(prob, 0, 1)
+
+    region_support = "national_only" if not include_region else "modeled"
+    generated_at = build_timestamp()
+    if diagnostics_enabled(args.diagnostics):
+        data = {
+            "rows_used": len(model_df),
+            "total_weight": float(model_df["weight"].astype("float64").sum()),
+            "features": feature_cols,
+        }
+        for key, (fit, k) in fit_index.items():
+            write_diagnostics(fit_diagnostics(fit, k, key, data, generated_at, args.backend))
+    for trait, matched_cols, threshold in labeled:
+        fit, k = fit_index[trait.key]
+        fit_note = ""
+        if not fit.converged[k]:
+            fit_note = f"  WARNING: logit for {trait.key} did not converge in {fit.iterations[k]} iterations"
         meta = {
             "source": trait.source,
             "year": 2024,
             "method": "weighted_logit",
+            "backend": args.backend,
             "features": feature_cols,
+            "model": models[trait.key],
             "minAge": trait.minAge,
             "universeLabel": trait.universeLabel,
             "regionSupport": region_support,
-            "generatedAt": pd.Timestamp.utcnow().isoformat(),
+            "generatedAt": generated_at,
             "definition": trait.definition_notes,
             "columns_used": matched_cols[:10],  # Limit for readability
             "threshold_minutes": threshold,
-            "implied_prevalence": round(prevalence, 4),
+            "implied_prevalence": None,
             "notes": "Region term excluded; national model." if not include_region else "Region-specific model.",
         }
-        write_trait_output(trait.key, meta, prob_by_cell)
+        intervals = None
+        if trait.key in replicate_intervals:
+            intervals, replicates_converged = replicate_intervals[trait.key]
+            meta["variance"] = {
+                "method": "poisson_bootstrap",
+                "replicates": args.bootstrap,
+                "replicates_converged": replicates_converged,
+                "seed": args.bootstrap_seed,
+                "ci_level": 0.95,
+                "ci_method": "percentile",
+            }
+        if trait.key in calibrated:
+            _, shift, meta["calibration"] = calibrated[trait.key]
+            if intervals is not None:
+                intervals = shift_intervals(intervals, all_preds[trait.key], shift)
+        write_trait_output(*finish_trait(trait, model_df, fit_note, all_preds[trait.key], intervals, layout, meta))
 
     print(f"\n{'='*60}")
     print("All ATUS traits built successfully!")
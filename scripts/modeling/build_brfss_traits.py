@@ -1,33 +1,106 @@
 """
-Build modeled trait probabilities from BRFSS 2024 microdata.
+Build modeled trait probabilities from BRFSS microdata (one year, or several pooled).
 
 Steps:
 - Load the ACS cell backbone (data/derived/acs_cells.json).
-- Detect the latest BRFSS XPT file under data/raw/brfss/2024/.
+- Pick the sources: --inputs as given, otherwise the largest XPT (or zipped XPT, read in
+  place) in each --years directory under data/raw/brfss/<year>/ (default 2024).
+- Preflight every configured variable against each source header.
 - Normalize sex, age_band, and region (from state FIPS → Census region).
+- Aggregate respondents into per-pattern weighted totals. Pooled sources are aggregated per
+  file, weights scaled by each file's share of the respondents, with strata kept per file.
 - Fit weighted logistic regressions for each configured trait.
 - Predict probabilities for every ACS cell and write JSON artifacts to data/derived/traits/.
 - Validate implied prevalence is within plausible bounds.
 """
 from __future__ import annotations
 
+import argparse
 import json
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import pyreadstat
 import statsmodels.api as sm
 
+from survey_archives import (
+    XPT_MEMBER_PATTERNS,
+    clean_xport_zeros,
+    find_member,
+    is_zip,
+    iter_zipped_xpt,
+    member_size,
+    open_member,
+    require_member,
+)
+from batched_logit import BatchedFit
+from bootstrap import (
+    PoissonMultipliers,
+    converged_replicates,
+    fit_replicates,
+    pattern_replicate_totals,
+    percentile_intervals,
+)
+from calibration import calibrate_cells, shift_intervals
+from cell_layout import CellLayout, child_rows, validate_probabilities
+from diagnostics import diagnostics_enabled, fit_diagnostics, mrp_diagnostics, write_diagnostics
+from fit_cache import FitCache, cache_namespace, fit_logit_cached
+from label_rules import ColumnStore, CompiledRule, compile_label_rule, is_coded_rule
+from logit_backends import (
+    BACKENDS,
+    BENCHMARK_TOL,
+    DEFAULT_BACKEND,
+    benchmark_backends,
+    combine_benchmarks,
+    report_benchmark,
+)
+from model_specs import (
+    AUTO_SPEC,
+    CV_FOLDS,
+    MODEL_SPECS,
+    SELECTION_CRITERIA,
+    CellEncoder,
+    check_spec,
+    expand_design,
+    predict_cells,
+    select_specs,
+    selection_meta,
+    spec_design,
+)
+from preflight import PreflightReport, normalize_names, raise_if_failed
+from mrp import MrpFit, fit_mrp, poststratification_weights, poststratify
+from recode import recode_brfss_age, recode_sex, recode_state, recode_state_region, state_region_table
+from survey_schema import BRFSS_SCHEMA, KEY_DTYPES, apply_schema, observed_levels
+from survey_variance import DesignMoments, cell_intervals, moment_covariance, uncertainty_by_cell
+from trait_output import build_timestamp
+from xpt_cache import ensure_parquet, read_parquet_columns
+from xpt_parallel import default_workers, iter_xpt_parallel, read_xpt_parallel
+
 ROOT = Path(__file__).resolve().parents[2]
 CONFIG_PATH = ROOT / "config" / "traits" / "brfss_2024.json"
 STATE_REGION_PATH = ROOT / "config" / "traits" / "state_regions.json"
 ACS_CELLS_PATH = ROOT / "data" / "derived" / "acs_cells.json"
+ACS_STATE_CELLS_PATH = ROOT / "data" / "derived" / "acs_state_cells.json"
+BRFSS_RAW_DIR = ROOT / "data" / "raw" / "brfss"
+DEFAULT_YEAR = 2024
+POOL_CHUNK_ROWS = 100_000
 TRAIT_OUTPUT_DIR = ROOT / "data" / "derived" / "traits"
 PUBLIC_OUTPUT_DIR = ROOT / "public" / "data" / "derived" / "traits"
+CELL_KEYS = ["sex_key", "age_band", "region_key"]
+STATE_KEYS = ["state_key", "sex_key", "age_band"]
+# Column order of DesignMoments: respondents, sum w y, sum w, sum w^2 y, sum w^2
+MOMENT_COLUMNS = ["row_count", "pos_weight", "total_weight", "pos_sq_weight", "sq_weight"]
+LABEL_MISSING = -1
+# Ends the error when a trait's implied prevalence falls outside its bounds
+PREVALENCE_HINT = "This likely indicates label inversion or incorrect missing value handling. Check the derive function logic."
 
 
 @dataclass
@@ -45,10 +118,14 @@ class TraitConfig:
     sex_vars: List[str]
     age_vars: List[str]
     state_vars: List[str]
+    strata_vars: List[str] = field(default_factory=lambda: ["_STSTR"])
+    psu_vars: List[str] = field(default_factory=lambda: ["_PSU"])
     minAge: int = 18
     universeLabel: str = "Adults 18+"
     regionSupport: str = "modeled"
     prevalence_bounds: List[float] = field(default_factory=lambda: [0.01, 0.50])
+    model_spec: str = "main"
+    model_selection: str = "aic"
 
 
 def load_json(path: Path) -> dict:
@@ -71,48 +148,158 @@ def select_column(columns: Dict[str, str], candidates: List[str], label: str) ->
     raise KeyError(f"Could not find column for {label}. Tried: {', '.join(candidates)}")
 
 
-def to_age_band(value: float) -> Optional[str]:
-    """Map BRFSS _AGEG5YR code into aggregated bands."""
-    if pd.isna(value):
+def select_design_columns(columns: Dict[str, str], traits: List[TraitConfig]) -> Optional[Tuple[str, str]]:
+    """Stratum and PSU columns for design-based variance, or None when either is missing."""
+    try:
+        design = (
+            select_column(columns, traits[0].strata_vars, "stratum"),
+            select_column(columns, traits[0].psu_vars, "psu"),
+        )
+    except KeyError:
+        print("No stratum/PSU columns; skipping design-based variance.")
         return None
-    code = int(value)
-    if code == 1:
-        return "18_24"
-    if code in (2, 3):
-        return "25_34"
-    if code in (4, 5):
-        return "35_44"
-    if code in (6, 7):
-        return "45_54"
-    if code in (8, 9):
-        return "55_64"
-    if code >= 10:
-        return "65_plus"
-    return None
+    print(f"Using design columns: {design[0]}, {design[1]}")
+    return design
 
 
-def to_sex(value: float) -> Optional[str]:
-    if pd.isna(value):
-        return None
-    code = int(value)
-    if code == 1:
-        return "male"
-    if code == 2:
-        return "female"
-    return None
-
+def collect_needed_vars(traits: List[TraitConfig]) -> List[str]:
+    """
+    Collect every BRFSS variable the build can touch: weight/sex/age/state and design
+    (stratum/PSU) candidates plus each trait's preferred_vars, fallback and condition_vars, or the variables its
+    coded_rule reads.
+    """
+    needed = set()
+    # Always include these smoking columns for fallback
+    needed.update(["_SMOKER3", "_RFSMOK3", "SMOKE100", "SMOKDAY2"])
+    for trait in traits:
+        needed.update(trait.weight_vars)
+        needed.update(trait.sex_vars)
+        needed.update(trait.age_vars)
+        needed.update(trait.state_vars)
+        needed.update(trait.strata_vars)
+        needed.update(trait.psu_vars)
+        needed.update(label_rule_vars(trait))
+    return sorted(v.upper() for v in needed)
+
+
+def read_source_columns(path: Path) -> List[str]:
+    """Read only the XPT header (or Parquet footer for cached sources) and return its column names."""
+    if path.suffix == ".parquet":
+        return read_parquet_columns(path)
+    if is_zip(path):
+        with open_member(path, require_member(path, XPT_MEMBER_PATTERNS)) as stream:
+            _, meta = pyreadstat.read_xport(stream, metadataonly=True)
+        return list(meta.column_names)
+    _, meta = pyreadstat.read_xport(path, metadataonly=True)
+    return list(meta.column_names)
+
+
+def source_size(path: Path) -> int:
+    """Size of the XPT data; for archives, the uncompressed member size."""
+    if is_zip(path):
+        return member_size(path, require_member(path, XPT_MEMBER_PATTERNS))
+    return path.stat().st_size
+
+
+def resolve_columns(available: Iterable[str], wanted: Iterable[str]) -> List[str]:
+    """Match wanted variable names case-insensitively; names not in the file are dropped."""
+    columns = {col.upper(): col for col in available}
+    return sorted({columns[name.upper()] for name in wanted if name.upper() in columns})
+
+
+def load_brfss_dataframe(
+    xpt_path: Path,
+    usecols: Optional[Iterable[str]] = None,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """Load the BRFSS source and cast it to the compact dtypes declared in BRFSS_SCHEMA."""
+    return apply_schema(decode_brfss_dataframe(xpt_path, usecols, workers), BRFSS_SCHEMA)
+
+
+def decode_brfss_dataframe(
+    xpt_path: Path,
+    usecols: Optional[Iterable[str]] = None,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """
+    Load the BRFSS XPT, or its Parquet cache. When `usecols` is given, only those variables
+    are decoded; the LLCP file has ~300 columns and the build needs a small fraction of them.
+    With `workers` > 1 the XPT is split into row ranges decoded on a process pool.
+    """
+    if xpt_path.suffix == ".parquet":
+        print(f"Reading cached BRFSS Parquet: {xpt_path}")
+        columns = None if usecols is None else resolve_columns(read_source_columns(xpt_path), usecols)
+        return pq.read_table(xpt_path, columns=columns, memory_map=True).to_pandas()
 
-def load_brfss_dataframe(xpt_path: Path) -> pd.DataFrame:
     print(f"Reading BRFSS XPT: {xpt_path}")
+    if is_zip(xpt_path):
+        # Zip members are read as one sequential stream; row-range workers would each re-inflate the prefix.
+        projected = None if usecols is None else resolve_columns(read_source_columns(xpt_path), usecols)
+        with open_member(xpt_path, require_member(xpt_path, XPT_MEMBER_PATTERNS)) as stream:
+            df, _ = pyreadstat.read_xport(stream, usecols=projected)
+        return df
+
+    if usecols is not None:
+        try:
+            all_cols = read_source_columns(xpt_path)
+            projected = resolve_columns(all_cols, usecols)
+            print(f"Decoding {len(projected)} of {len(all_cols)} columns")
+            if workers > 1:
+                return read_xpt_parallel(xpt_path, projected, workers)
+            df, _ = pyreadstat.read_xport(xpt_path, usecols=projected)
+            return df
+        except Exception as first_err:
+            print(f"Projected pyreadstat read failed ({first_err}); retrying with full pandas read.")
+            df = pd.read_sas(xpt_path, format="xport", encoding="latin-1")
+            return clean_xport_zeros(df[resolve_columns(df.columns, usecols)])
     try:
         # Prefer pandas for broader encoding support
-        return pd.read_sas(xpt_path, format="xport", encoding="latin-1")
+        return clean_xport_zeros(pd.read_sas(xpt_path, format="xport", encoding="latin-1"))
     except Exception as first_err:
         print(f"Pandas read_sas failed ({first_err}); retrying with pyreadstat.")
         df, _ = pyreadstat.read_xport(xpt_path)
         return df
 
 
+def iter_brfss_chunks(
+    xpt_path: Path,
+    usecols: Iterable[str],
+    chunksize: int,
+    workers: int = 1,
+) -> Iterator[pd.DataFrame]:
+    """Yield schema-typed BRFSS chunks."""
+    for chunk in decode_brfss_chunks(xpt_path, usecols, chunksize, workers):
+        yield apply_schema(chunk, BRFSS_SCHEMA)
+
+
+def decode_brfss_chunks(
+    xpt_path: Path,
+    usecols: Iterable[str],
+    chunksize: int,
+    workers: int = 1,
+) -> Iterator[pd.DataFrame]:
+    """Yield the projected BRFSS columns in row chunks so only one chunk is decoded at a time."""
+    print(f"Streaming BRFSS source in chunks of {chunksize:,} rows: {xpt_path}")
+    projected = resolve_columns(read_source_columns(xpt_path), usecols)
+    if xpt_path.suffix == ".parquet":
+        parquet_file = pq.ParquetFile(xpt_path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=projected):
+            yield batch.to_pandas()
+        return
+    if is_zip(xpt_path):
+        for chunk in iter_zipped_xpt(xpt_path, chunksize):
+            yield chunk[projected]
+        return
+    if workers > 1:
+        yield from iter_xpt_parallel(xpt_path, chunksize, workers, projected)
+        return
+    reader = pyreadstat.read_file_in_chunks(
+        pyreadstat.read_xport, xpt_path, chunksize=chunksize, usecols=projected
+    )
+    for chunk, _ in reader:
+        yield chunk
+
+
 def derive_smoking(row: pd.Series, rule: dict, columns: Dict[str, str]) -> Optional[int]:
     """
     Derive current smoker status using _SMOKER3 (preferred) or fallback variables.
@@ -356,103 +543,661 @@ DERIVE_FUNCTIONS = {
 }
 
 
-def fit_logit(df: pd.DataFrame, label_col: str, weight_col: str):
+# Vectorized equivalents of the derive_* functions above. Each priority chain becomes an
+# np.select over whole columns: a step's condition marks the rows it decides (including
+# decisions to exclude, encoded as NaN), and the first matching step wins, exactly like the
+# early returns in the row functions. The row functions stay as the reference semantics.
+
+def _codes(df: pd.DataFrame, columns: Dict[str, str], name: str) -> Optional[np.ndarray]:
+    """Column values as float64 with NaN for missing, or None when the variable is absent."""
+    col = columns.get(name.upper())
+    if not col:
+        return None
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _present(values: np.ndarray) -> np.ndarray:
+    return ~np.isnan(values)
+
+
+def _first_match(n: int, conditions: List[np.ndarray], choices: List[np.ndarray]) -> np.ndarray:
+    if not conditions:
+        return np.full(n, np.nan)
+    return np.select(conditions, choices, np.nan)
+
+
+def derive_smoking_vectorized(df: pd.DataFrame, rule: dict, columns: Dict[str, str]) -> np.ndarray:
+    conditions, choices = [], []
+    smoker3 = _codes(df, columns, "_SMOKER3")
+    if smoker3 is not None:
+        code = np.trunc(smoker3)
+        conditions.append(_present(smoker3))
+        choices.append(np.select([np.isin(code, (1, 2)), np.isin(code, (3, 4))], [1.0, 0.0], np.nan))
+    rfsmok3 = _codes(df, columns, "_RFSMOK3")
+    if rfsmok3 is not None:
+        code = np.trunc(rfsmok3)
+        conditions.append(_present(rfsmok3))
+        choices.append(np.select([code == 2, code == 1], [1.0, 0.0], np.nan))
+    smoke100 = _codes(df, columns, "SMOKE100")
+    smokday2 = _codes(df, columns, "SMOKDAY2")
+    if smoke100 is not None and smokday2 is not None:
+        smoke100, smokday2 = np.trunc(smoke100), np.trunc(smokday2)
+        conditions.append(np.ones(len(df), dtype=bool))
+        choices.append(
+            np.select(
+                [
+                    (smoke100 == 1) & np.isin(smokday2, (1, 2)),
+                    smoke100 == 2,
+                    (smoke100 == 1) & (smokday2 == 3),
+                ],
+                [1.0, 0.0, 0.0],
+                np.nan,
+            )
+        )
+        # Either fallback variable missing excludes the row
+        choices[-1][np.isnan(smoke100) | np.isnan(smokday2)] = np.nan
+    return _first_match(len(df), conditions, choices)
+
+
+def derive_activity_vectorized(df: pd.DataFrame, rule: dict, columns: Dict[str, str]) -> np.ndarray:
+    conditions, choices = [], []
+    for var in rule.get("preferred_vars", []):
+        values = _codes(df, columns, var)
+        if values is None:
+            continue
+        code = np.trunc(values)
+        # Unlike the other traits, a 9 (missing/refused) falls through to the next variable
+        conditions.append(np.isin(code, (1, 2)))
+        choices.append(np.where(code == 1, 1.0, 0.0))
+    return _first_match(len(df), conditions, choices)
+
+
+def derive_alcohol_vectorized(df: pd.DataFrame, rule: dict, columns: Dict[str, str]) -> np.ndarray:
+    conditions, choices = [], []
+    drnkany = _codes(df, columns, "DRNKANY6")
+    if drnkany is not None:
+        code = np.trunc(drnkany)
+        conditions.append(_present(drnkany))
+        choices.append(np.select([code == 1, code == 2], [1.0, 0.0], np.nan))
+    drnkwk = _codes(df, columns, "_DRNKWK3")
+    if drnkwk is not None:
+        conditions.append(_present(drnkwk))
+        choices.append(np.select([drnkwk == 99999, (drnkwk > 0) & (drnkwk < 88888)], [np.nan, 1.0], 0.0))
+    alcday = _codes(df, columns, "ALCDAY4")
+    if alcday is not None:
+        code = np.trunc(alcday)
+        conditions.append(_present(alcday))
+        choices.append(
+            np.select(
+                [code == 888, ((code >= 101) & (code <= 199)) | ((code >= 201) & (code <= 299))],
+                [0.0, 1.0],
+                np.nan,
+            )
+        )
+    return _first_match(len(df), conditions, choices)
+
+
+def derive_obese_vectorized(df: pd.DataFrame, rule: dict, columns: Dict[str, str]) -> np.ndarray:
+    conditions, choices = [], []
+    bmi5cat = _codes(df, columns, "_BMI5CAT")
+    if bmi5cat is not None:
+        code = np.trunc(bmi5cat)
+        conditions.append(_present(bmi5cat))
+        choices.append(np.select([code == 4, np.isin(code, (1, 2, 3))], [1.0, 0.0], np.nan))
+    bmi5 = _codes(df, columns, "_BMI5")
+    if bmi5 is not None:
+        conditions.append(_present(bmi5))
+        choices.append(np.select([(bmi5 < 1000) | (bmi5 > 9900), bmi5 / 100.0 >= 30.0], [np.nan, 1.0], 0.0))
+    return _first_match(len(df), conditions, choices)
+
+
+def derive_chronic_condition_vectorized(df: pd.DataFrame, rule: dict, columns: Dict[str, str]) -> np.ndarray:
+    condition_vars = rule.get("condition_vars", [
+        "DIABETE4", "ASTHMA3", "CHCCOPD3", "CVDCRHD4",
+        "CVDSTRK3", "CHCKDNY2", "CHCOCNCR", "HAVARTH5"
+    ])
+    any_yes = np.zeros(len(df), dtype=bool)
+    any_no = np.zeros(len(df), dtype=bool)
+    for var in condition_vars:
+        values = _codes(df, columns, var)
+        if values is None:
+            continue
+        code = np.trunc(values)
+        any_yes |= code == 1
+        any_no |= code == 2
+    return np.select([any_yes, any_no], [1.0, 0.0], np.nan)
+
+
+VECTORIZED_DERIVE_FUNCTIONS = {
+    "smokes": derive_smoking_vectorized,
+    "physically_active": derive_activity_vectorized,
+    "any_alcohol_use": derive_alcohol_vectorized,
+    "obese": derive_obese_vectorized,
+    "any_chronic_condition": derive_chronic_condition_vectorized,
+}
+
+# Compiled coded_rule evaluators, keyed by the rule's JSON. Compiled rules hold closures and
+# do not pickle, so each process (including pool workers) compiles on first use.
+_COMPILED_RULES: Dict[str, CompiledRule] = {}
+
+
+def compiled_rule(trait: TraitConfig) -> CompiledRule:
+    cache_key = json.dumps(trait.label_rule, sort_keys=True)
+    if cache_key not in _COMPILED_RULES:
+        _COMPILED_RULES[cache_key] = compile_label_rule(trait.label_rule, trait.key)
+    return _COMPILED_RULES[cache_key]
+
+
+def has_label_rule(trait: TraitConfig) -> bool:
+    """True when the trait has a coded_rule or a built-in derive function."""
+    return is_coded_rule(trait.label_rule) or trait.key in DERIVE_FUNCTIONS
+
+
+def label_rule_vars(trait: TraitConfig) -> List[str]:
+    rule = trait.label_rule
+    if is_coded_rule(rule):
+        return sorted(compiled_rule(trait).variables)
+    return rule.get("preferred_vars", []) + rule.get("fallback", []) + rule.get("condition_vars", [])
+
+
+def fit_logit(df: pd.DataFrame, labels: np.ndarray, weight_col: str):
+    """Row-level weighted logit; the reference that `fit_logit_aggregated` reproduces."""
     feature_cols = ["sex_key", "age_band", "region_key"]
-    dummies = pd.get_dummies(df[feature_cols], drop_first=True)
+    dummies = pd.get_dummies(observed_levels(df[feature_cols]), drop_first=True)
     design = sm.add_constant(dummies, has_constant="add").astype(float)
-    y = pd.to_numeric(df[label_col], errors="coerce").astype(float)
+    y = pd.Series(labels, index=df.index, dtype=float)
     weights = pd.to_numeric(df[weight_col], errors="coerce").astype(float)
     model = sm.GLM(y, design, family=sm.families.Binomial(), freq_weights=weights)
     result = model.fit()
     return result, design.columns
 
 
-def predict_for_cells(result, design_columns, cells: pd.DataFrame):
-    cell_dummies = pd.get_dummies(cells[["sex_key", "age_band", "region_key"]], drop_first=True)
-    cell_design = sm.add_constant(cell_dummies, has_constant="add").astype(float)
-    cell_design = cell_design.reindex(columns=design_columns, fill_value=0)
-    preds = result.predict(cell_design)
-    preds = np.clip(preds, 0, 1)
-    return preds
+@dataclass
+class TraitAggregates:
+    """
+    Running weighted sufficient statistics for one trait, indexed by (sex_key, age_band, region_key).
+    The logit only sees these covariates, so the per-pattern positive and total weight carry
+    everything the fit needs and respondent rows can be discarded after each chunk.
+
+    When the frame carries the sample design (stratum/psu columns), `stratum_cells` keeps the
+    respondent count, positive and total weight and their squared-weight sums per (source,
+    stratum, pattern code) for design-based variance, and `fold_cells` the totals per
+    (held-out fold, pattern); neither grows with the sample.
+    `cluster_cells` keeps the same moments per (source, stratum, psu, pattern) for rows of PSUs
+    holding several respondents only (none in BRFSS, where each respondent is a PSU). Bootstrap runs
+    add `replicate_pos`/`replicate_total`: per-pattern totals with one column per replicate,
+    filled by `fold_replicates`. Frames with a state_key column (MRP runs) also fill
+    `state_cells`, the totals by (state, sex, age).
+    """
+    key: str
+    cells: Optional[pd.DataFrame] = None
+    rows_seen: int = 0
+    rows_missing_label: int = 0
+    replicate_pos: Optional[pd.DataFrame] = None
+    replicate_total: Optional[pd.DataFrame] = None
+    state_cells: Optional[pd.DataFrame] = None
+    stratum_cells: Optional[pd.DataFrame] = None
+    cluster_cells: Optional[pd.DataFrame] = None
+    fold_cells: Optional[pd.DataFrame] = None
+
+    def fold(self, frame: pd.DataFrame, matrix: "LabelMatrix", clustered: Optional[np.ndarray] = None) -> None:
+        """
+        Add a block of respondents. With design columns, `clustered` marks the rows whose PSU
+        holds several respondents (default: PSUs repeated within `frame`). A caller streaming
+        a file passes an all-False mask and adds those rows once known, with `fold_clusters`.
+        """
+        labels = matrix.column(self.key)
+        self.rows_seen += len(frame)
+        self.rows_missing_label += int((labels == LABEL_MISSING).sum())
+        usable = matrix.usable(self.key)
+        if not usable.any():
+            return
+        positive = labels[usable] == 1
+        weight = frame["weight"].to_numpy(dtype="float64")[usable]
+        rows = pd.DataFrame(
+            {
+                "pos_weight": np.where(positive, weight, 0.0),
+                "total_weight": weight,
+                "sq_weight": weight**2,
+                "pos_count": positive.astype(int),
+                "row_count": 1,
+            }
+        )
+        keys = [frame[k][usable].reset_index(drop=True) for k in CELL_KEYS]
+        stats = rows.groupby(keys, observed=True).sum()
+        self.cells = stats if self.cells is None else self.cells.add(stats, fill_value=0)
+        if "stratum" in frame and "psu" in frame:
+            designed = usable & has_design(frame)
+            moments = design_moments(frame, designed, labels[designed] == 1)
+            self.stratum_cells = add_totals(self.stratum_cells, tag_source(moments.groupby(["stratum", "pattern"]).sum()))
+            fold_keys = [pd.Series(psu_folds(frame)[designed], name="fold")]
+            fold_keys += [frame[k][designed].reset_index(drop=True) for k in CELL_KEYS]
+            folds = moments[["pos_weight", "total_weight"]].groupby(fold_keys, observed=True).sum()
+            self.fold_cells = add_totals(self.fold_cells, folds)
+            self.fold_clusters(frame, matrix, shared_psu_rows(frame) if clustered is None else clustered)
+        if "state_key" in frame:
+            state_keys = [frame[k][usable].reset_index(drop=True) for k in STATE_KEYS]
+            state_stats = rows[["pos_weight", "total_weight"]].groupby(state_keys, observed=True).sum()
+            self.state_cells = (
+                state_stats if self.state_cells is None else self.state_cells.add(state_stats, fill_value=0)
+            )
+
+    def fold_clusters(self, frame: pd.DataFrame, matrix: "LabelMatrix", clustered: np.ndarray) -> None:
+        """Add the per-PSU moments of the `clustered` rows (PSUs with several respondents)."""
+        rows = matrix.usable(self.key) & clustered & has_design(frame)
+        if not rows.any():
+            return
+        moments = design_moments(frame, rows, matrix.column(self.key)[rows] == 1)
+        moments["psu"] = frame["psu"].to_numpy(dtype="float64")[rows]
+        stats = moments.groupby(["stratum", "psu", "pattern"]).sum()
+        self.cluster_cells = add_totals(self.cluster_cells, tag_source(stats))
+
+    def merge(self, other: "TraitAggregates") -> None:
+        self.rows_seen += other.rows_seen
+        self.rows_missing_label += other.rows_missing_label
+        if other.cells is not None:
+            self.cells = other.cells if self.cells is None else self.cells.add(other.cells, fill_value=0)
+        self.stratum_cells = add_totals(self.stratum_cells, other.stratum_cells)
+        self.cluster_cells = add_totals(self.cluster_cells, other.cluster_cells)
+        self.fold_cells = add_totals(self.fold_cells, other.fold_cells)
+        if other.state_cells is not None:
+            self.state_cells = (
+                other.state_cells if self.state_cells is None else self.state_cells.add(other.state_cells, fill_value=0)
+            )
+        if other.replicate_pos is not None:
+            self.add_replicates(other.replicate_pos, other.replicate_total)
+
+    def add_replicates(self, pos: pd.DataFrame, total: pd.DataFrame) -> None:
+        if self.replicate_pos is None:
+            self.replicate_pos, self.replicate_total = pos, total
+        else:
+            self.replicate_pos = self.replicate_pos.add(pos, fill_value=0)
+            self.replicate_total = self.replicate_total.add(total, fill_value=0)
+
+    def scaled(self, factor: float) -> "TraitAggregates":
+        """Copy with weighted totals multiplied by `factor`; counts are unchanged."""
+        cells = None
+        if self.cells is not None:
+            cells = self.cells.copy()
+            cells[["pos_weight", "total_weight"]] *= factor
+            cells["sq_weight"] *= factor**2
+        scaled = TraitAggregates(self.key, cells, self.rows_seen, self.rows_missing_label)
+        scaled.stratum_cells = scaled_moments(self.stratum_cells, factor)
+        scaled.cluster_cells = scaled_moments(self.cluster_cells, factor)
+        if self.fold_cells is not None:
+            scaled.fold_cells = self.fold_cells * factor
+        if self.state_cells is not None:
+            scaled.state_cells = self.state_cells * factor
+        if self.replicate_pos is not None:
+            scaled.add_replicates(self.replicate_pos * factor, self.replicate_total * factor)
+        return scaled
+
+    def with_source(self, source: int) -> "TraitAggregates":
+        """Tag the design totals with a source index so strata stay distinct across pooled files."""
+        if self.stratum_cells is not None:
+            self.stratum_cells = self.stratum_cells.rename(index={0: source}, level="source")
+        if self.cluster_cells is not None:
+            self.cluster_cells = self.cluster_cells.rename(index={0: source}, level="source")
+        return self
+
+
+def has_design(frame: pd.DataFrame) -> np.ndarray:
+    """Rows with both a stratum and a PSU."""
+    return (frame["stratum"].notna() & frame["psu"].notna()).to_numpy()
+
+
+def pattern_codes(frame: pd.DataFrame, rows: np.ndarray) -> np.ndarray:
+    """Each selected row's (sex, age, region) pattern as one int16, ordered like the keys' levels."""
+    code = np.zeros(int(rows.sum()), dtype=np.int16)
+    for key in CELL_KEYS:
+        code = code * len(KEY_DTYPES[key].categories) + frame[key].cat.codes.to_numpy()[rows]
+    return code
+
+
+def pattern_keys(codes: np.ndarray) -> pd.DataFrame:
+    """The sex/age/region rows behind `pattern_codes` values."""
+    keys = {}
+    for key in reversed(CELL_KEYS):
+        size = len(KEY_DTYPES[key].categories)
+        keys[key] = pd.Categorical.from_codes(codes % size, dtype=KEY_DTYPES[key])
+        codes = codes // size
+    return pd.DataFrame({key: keys[key] for key in CELL_KEYS})
+
+
+def design_moments(frame: pd.DataFrame, rows: np.ndarray, positive: np.ndarray) -> pd.DataFrame:
+    """Stratum, pattern code and the design-moment terms (count, w y, w, w^2 y, w^2) of the selected rows."""
+    weight = frame["weight"].to_numpy(dtype="float64")[rows]
+    return pd.DataFrame(
+        {
+            "stratum": frame["stratum"].to_numpy(dtype="float64")[rows],
+            "pattern": pattern_codes(frame, rows),
+            "row_count": 1,
+            "pos_weight": np.where(positive, weight, 0.0),
+            "total_weight": weight,
+            "pos_sq_weight": np.where(positive, weight**2, 0.0),
+            "sq_weight": weight**2,
+        }
+    )
 
 
-def is_child_age_band(age_band: str) -> bool:
-    """Check if an age band is for children (under 18)."""
-    return age_band in ("0_17", "0_14", "15_17")
+def tag_source(stats: pd.DataFrame) -> pd.DataFrame:
+    """Prefix a source level (0 until the file is pooled) to grouped design totals."""
+    return pd.concat({0: stats}, names=["source"])
 
 
-def validate_probabilities(
-    prob_by_cell: Dict[str, float], 
-    cells_df: pd.DataFrame, 
-    trait_key: str,
-    bounds: List[float]
-) -> float:
+def add_totals(left: Optional[pd.DataFrame], right: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    if right is None:
+        return left
+    return right if left is None else left.add(right, fill_value=0)
+
+
+def scaled_moments(moments: Optional[pd.DataFrame], factor: float) -> Optional[pd.DataFrame]:
+    """Design moments with weights scaled by `factor` (squared weights by its square)."""
+    if moments is None:
+        return None
+    moments = moments.copy()
+    moments[["pos_weight", "total_weight"]] *= factor
+    moments[["pos_sq_weight", "sq_weight"]] *= factor**2
+    return moments
+
+
+def psu_folds(frame: pd.DataFrame, n_folds: int = CV_FOLDS) -> np.ndarray:
+    """Held-out fold of each row, hashed from its (stratum, psu) so a PSU's rows share one fold."""
+    hashed = pd.util.hash_pandas_object(frame[["stratum", "psu"]], index=False).to_numpy()
+    return (hashed % n_folds).astype(np.int8)
+
+
+def shared_psu_rows(frame: pd.DataFrame) -> np.ndarray:
+    """Rows whose (stratum, psu) holds more than one respondent of `frame`."""
+    return frame[["stratum", "psu"]].duplicated(keep=False).to_numpy()
+
+
+class PsuTally:
+    """Respondents per (stratum, psu) over a streamed file, kept once for all traits."""
+
+    def __init__(self):
+        self.counts: Optional[pd.Series] = None
+        self.pending: List[pd.Series] = []
+
+    def add(self, frame: pd.DataFrame) -> None:
+        self.pending.append(frame[["stratum", "psu"]].value_counts(sort=False))
+        if len(self.pending) >= 8:
+            self.compact()
+
+    def compact(self) -> None:
+        if self.counts is not None:
+            self.pending.append(self.counts)
+        if self.pending:
+            self.counts = pd.concat(self.pending).groupby(level=[0, 1]).sum()
+            self.pending = []
+
+    def shared(self) -> pd.MultiIndex:
+        """The (stratum, psu) keys seen more than once."""
+        self.compact()
+        if self.counts is None:
+            return pd.MultiIndex.from_arrays([[], []], names=["stratum", "psu"])
+        return self.counts.index[self.counts.to_numpy() > 1]
+
+
+def rows_in_psus(frame: pd.DataFrame, keys: pd.MultiIndex) -> np.ndarray:
+    return pd.MultiIndex.from_arrays([frame["stratum"], frame["psu"]]).isin(keys)
+
+
+def fold_replicates(
+    aggregates: Dict[str, TraitAggregates],
+    frame: pd.DataFrame,
+    matrix: "LabelMatrix",
+    multipliers: PoissonMultipliers,
+) -> None:
     """
-    Validate probabilities are finite and within [0,1].
-    Compute and validate implied national prevalence.
-    Returns the computed prevalence.
+    Add every trait's Poisson-bootstrap replicate totals for a block of respondents. All
+    traits share each respondent's multipliers, which are drawn for every row in order.
     """
-    min_prev, max_prev = bounds
-    
-    # Check all probabilities are valid
-    for cell_id, prob in prob_by_cell.items():
-        if not np.isfinite(prob):
-            raise ValueError(f"Trait {trait_key}: probability for {cell_id} is not finite: {prob}")
-        if prob < 0 or prob > 1:
-            raise ValueError(f"Trait {trait_key}: probability for {cell_id} out of bounds [0,1]: {prob}")
-    
-    # Compute implied national prevalence: Σ(pop × prob) / Σ(pop)
-    # Only use adult cells (exclude child age bands) for BRFSS traits
-    adult_cells = cells_df[~cells_df["age_band"].apply(is_child_age_band)].copy()
-    
-    if adult_cells.empty:
-        raise ValueError(f"Trait {trait_key}: No adult cells found for prevalence calculation")
-    
-    total_pop = adult_cells["pop"].sum()
-    weighted_sum = sum(
-        adult_cells.loc[adult_cells["cell_id"] == cell_id, "pop"].iloc[0] * prob
-        for cell_id, prob in prob_by_cell.items()
-        if cell_id in adult_cells["cell_id"].values
+    grouped = frame.groupby(CELL_KEYS, observed=True)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    index = grouped.size().index
+    weight = frame["weight"].to_numpy(dtype="float64")
+    columns = []
+    for key in aggregates:
+        usable = matrix.usable(key)
+        columns.append(np.where(usable & (matrix.column(key) == 1), weight, 0.0))
+        columns.append(np.where(usable, weight, 0.0))
+    totals = pattern_replicate_totals(codes, len(index), np.column_stack(columns), multipliers)
+    for k, agg in enumerate(aggregates.values()):
+        agg.add_replicates(
+            pd.DataFrame(totals[:, 2 * k], index=index), pd.DataFrame(totals[:, 2 * k + 1], index=index)
+        )
+
+
+def pattern_design(keys: pd.DataFrame, spec: str = "main") -> pd.DataFrame:
+    """Intercept, drop-first dummies for the observed sex/age/region levels and the spec's interactions."""
+    return spec_design(keys, CELL_KEYS, spec)
+
+
+def pattern_index(aggregates: Dict[str, TraitAggregates]) -> pd.MultiIndex:
+    """Sorted union of the covariate patterns the traits observed."""
+    patterns = (
+        pd.concat([agg.cells.index.to_frame(index=False) for agg in aggregates.values()])
+        .drop_duplicates()
+        .sort_values(CELL_KEYS)
     )
-    
-    prevalence = weighted_sum / total_pop if total_pop > 0 else 0
-    
-    print(f"  Implied national prevalence: {prevalence:.2%}")
-    
-    if prevalence < min_prev or prevalence > max_prev:
-        raise ValueError(
-            f"Trait {trait_key}: Implied prevalence {prevalence:.2%} is outside plausible bounds "
-            f"[{min_prev:.0%}, {max_prev:.0%}]. "
-            f"This likely indicates label inversion or incorrect missing value handling. "
-            f"Check the derive function logic."
+    return pd.MultiIndex.from_frame(patterns)
+
+
+def pattern_totals(aggregates: Dict[str, TraitAggregates], index: pd.MultiIndex) -> Tuple[np.ndarray, np.ndarray]:
+    """Positive and total weight per pattern in `index`, one column per trait."""
+    pos = np.column_stack([agg.cells["pos_weight"].reindex(index, fill_value=0) for agg in aggregates.values()])
+    total = np.column_stack([agg.cells["total_weight"].reindex(index, fill_value=0) for agg in aggregates.values()])
+    return pos, total
+
+
+def trait_problem(
+    aggregates: Dict[str, TraitAggregates], spec: str = "main"
+) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Shared pattern design and per-trait positive/total weight over the union of patterns."""
+    index = pattern_index(aggregates)
+    pos, total = pattern_totals(aggregates, index)
+    return pattern_design(index.to_frame(index=False), spec), pos, total
+
+
+def fit_traits_batched(
+    aggregates: Dict[str, TraitAggregates],
+    cache: Optional[FitCache] = None,
+    spec: str = "main",
+    backend: str = DEFAULT_BACKEND,
+) -> BatchedFit:
+    """
+    Fit every trait's logit in one batched solve over the union of their covariate patterns.
+    A pattern a trait never observes carries zero weight for it. Using the weighted share as the
+    response and the total weight as freq_weights gives the same likelihood, and therefore
+    the same coefficients, as the row-level fit in `fit_logit`. With a `cache`, unchanged
+    traits reuse their stored fit and changed ones warm-start from it.
+    """
+    design, pos, total = trait_problem(aggregates, spec)
+    return fit_logit_cached(design.to_numpy(), pos, total, list(design.columns), list(aggregates), cache, backend)
+
+
+def cell_design(cells: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Design rows for arbitrary sex/age/region rows, aligned to a fit's columns."""
+    return expand_design(cells, CELL_KEYS, columns)
+
+
+def heldout_folds(
+    aggregates: Dict[str, TraitAggregates], index: pd.MultiIndex, n_folds: int = CV_FOLDS
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (folds, patterns, traits) positive and total weight with whole PSUs hashed into folds by
+    (stratum, psu), so each fold spans the strata. None without design totals.
+    """
+    if any(agg.fold_cells is None for agg in aggregates.values()):
+        return None
+    fold_pos = np.zeros((n_folds, len(index), len(aggregates)))
+    fold_total = np.zeros_like(fold_pos)
+    for k, agg in enumerate(aggregates.values()):
+        fold = agg.fold_cells.index.get_level_values("fold")
+        for v in range(n_folds):
+            sums = agg.fold_cells[fold == v].groupby(level=CELL_KEYS, observed=True).sum().reindex(index, fill_value=0)
+            fold_pos[v, :, k] = sums["pos_weight"]
+            fold_total[v, :, k] = sums["total_weight"]
+    return fold_pos, fold_total
+
+
+def effective_size(cells: pd.DataFrame) -> float:
+    """Kish effective sample size of a trait's weighted respondents."""
+    return float(cells["total_weight"].sum() ** 2 / cells["sq_weight"].sum())
+
+
+def choose_specs(
+    aggregates: Dict[str, TraitAggregates],
+    traits: List[TraitConfig],
+    spec_override: Optional[str] = None,
+    selection_override: Optional[str] = None,
+) -> Dict[str, dict]:
+    """
+    Each trait's meta["model"] entry. Traits set to "auto" have every candidate spec scored
+    on their pattern totals; "heldout" falls back to AIC when there are no PSU totals.
+    """
+    configs = {trait.key: trait for trait in traits}
+    choices: Dict[str, dict] = {}
+    auto: Dict[str, List[str]] = {}
+    for key in aggregates:
+        spec = spec_override or configs[key].model_spec
+        if spec == AUTO_SPEC:
+            auto.setdefault(selection_override or configs[key].model_selection, []).append(key)
+        else:
+            choices[key] = selection_meta(spec, None, None, 0)
+    for criterion, keys in auto.items():
+        group = {key: aggregates[key] for key in keys}
+        index = pattern_index(group)
+        pos, total = pattern_totals(group, index)
+        sizes = np.array([effective_size(agg.cells) for agg in group.values()])
+        folds = heldout_folds(group, index) if criterion == "heldout" else None
+        if criterion == "heldout" and folds is None:
+            print("No stratum/PSU totals for held-out selection; selecting model specs by AIC.")
+            criterion = "aic"
+        chosen, scores = select_specs(index.to_frame(index=False), CELL_KEYS, pos, total, sizes, criterion, folds)
+        for k, key in enumerate(keys):
+            choices[key] = selection_meta(chosen[k], criterion, scores, k)
+            print(f"Model spec for {key}: {chosen[k]} (by {criterion})")
+    return choices
+
+
+def design_intervals(fit: BatchedFit, k: int, agg: TraitAggregates, cells_matrix: np.ndarray):
+    """
+    Taylor-linearized covariance for trait `k` from its stratum (and clustered-PSU) moments,
+    with per-cell standard errors and 95% intervals. None when the source had no stratum/PSU.
+    """
+    if agg.stratum_cells is None:
+        return None
+    strata = agg.stratum_cells.index.droplevel("pattern")
+    stratum_ids, stratum_keys = pd.factorize(strata)
+    codes = [agg.stratum_cells.index.get_level_values("pattern").to_numpy()]
+    if agg.cluster_cells is not None:
+        codes.append(agg.cluster_cells.index.get_level_values("pattern").to_numpy())
+    patterns = np.unique(np.concatenate(codes))
+
+    def moments(cells: pd.DataFrame, stratum: np.ndarray, psu: Optional[np.ndarray] = None) -> DesignMoments:
+        pattern = np.searchsorted(patterns, cells.index.get_level_values("pattern").to_numpy())
+        columns = [cells[column].to_numpy(dtype="float64") for column in MOMENT_COLUMNS]
+        return DesignMoments(stratum, pattern, *columns, psu=psu)
+
+    clusters = None
+    if agg.cluster_cells is not None:
+        index = agg.cluster_cells.index
+        clusters = moments(
+            agg.cluster_cells,
+            stratum_keys.get_indexer(index.droplevel(["psu", "pattern"])),
+            pd.factorize(index.droplevel("pattern"))[0],
         )
-    
-    return prevalence
+    design_cov = moment_covariance(
+        fit.params[k],
+        fit.cov[k],
+        cell_design(pattern_keys(patterns), fit.columns),
+        moments(agg.stratum_cells, stratum_ids),
+        clusters,
+    )
+    return design_cov, cell_intervals(cells_matrix, fit.params[k], design_cov.cov)
 
 
-def log_trait_summary(trait_key: str, trait_df: pd.DataFrame, weight_col: str):
-    """Log weighted prevalence and data quality summary."""
-    valid_rows = len(trait_df)
-    weights = trait_df[weight_col]
-    labels = trait_df[trait_key]
-    
-    total_weight = weights.sum()
-    positive_weight = weights[labels == 1].sum()
-    weighted_prevalence = positive_weight / total_weight if total_weight > 0 else 0
-    
-    print(f"  Data summary for {trait_key}:")
+def bootstrap_intervals(fit: BatchedFit, aggregates: Dict[str, TraitAggregates], cells_matrix: np.ndarray):
+    """
+    Refit every trait's bootstrap replicates in one batched solve, warm-started from `fit`.
+    Returns per-cell (se, lower, upper) arrays of shape (cells, traits) and each trait's
+    converged replicate count.
+    """
+    index = pattern_index(aggregates)
+    pos = np.stack([agg.replicate_pos.reindex(index, fill_value=0).to_numpy() for agg in aggregates.values()], axis=1)
+    total = np.stack(
+        [agg.replicate_total.reindex(index, fill_value=0).to_numpy() for agg in aggregates.values()], axis=1
+    )
+    design = cell_design(index.to_frame(index=False), fit.columns)
+    replicate_fit = fit_replicates(design, pos, total, fit.columns, fit.params)
+    intervals = percentile_intervals(replicate_fit, cells_matrix, len(aggregates))
+    return intervals, converged_replicates(replicate_fit, len(aggregates))
+
+
+def load_state_cells(path: Path, state_regions: Dict[str, str]) -> pd.DataFrame:
+    """Adult state x sex x age cells of the ACS state backbone, keyed like the respondents."""
+    if not path.exists():
+        raise FileNotFoundError(f"--mrp needs the ACS state backbone {path}; run `npm run build:acs-cells` first.")
+    cells = pd.DataFrame(load_json(path)["cells"]).rename(columns={"state": "state_key", "sex": "sex_key"})
+    cells = cells[~child_rows(cells["age_band"]) & cells["state_key"].isin(state_regions)].copy()
+    cells["region_key"] = cells["state_key"].map(state_regions)
+    return cells.reset_index(drop=True)
+
+
+def fit_traits_mrp(aggregates: Dict[str, TraitAggregates], spec: str, state_cells: pd.DataFrame) -> MrpFit:
+    """
+    State random-intercept fit for every trait in one batched solve over the union of their
+    state x sex x age patterns; the fixed part is the spec's design over sex/age/region.
+    """
+    states = sorted(state_cells["state_key"].unique())
+    index = pd.MultiIndex.from_frame(
+        pd.concat([agg.state_cells.index.to_frame(index=False) for agg in aggregates.values()])
+        .drop_duplicates()
+        .sort_values(STATE_KEYS)
+    )
+    index = index[index.get_level_values("state_key").isin(states)]
+    pos = np.column_stack([agg.state_cells["pos_weight"].reindex(index, fill_value=0) for agg in aggregates.values()])
+    total = np.column_stack(
+        [agg.state_cells["total_weight"].reindex(index, fill_value=0) for agg in aggregates.values()]
+    )
+    patterns = index.to_frame(index=False)
+    regions = dict(zip(state_cells["state_key"], state_cells["region_key"]))
+    patterns["region_key"] = patterns["state_key"].astype(object).map(regions).astype(KEY_DTYPES["region_key"])
+    fixed_columns = list(pattern_design(patterns, spec).columns)
+    sizes = np.array([effective_size(agg.cells) for agg in aggregates.values()])
+    return fit_mrp(patterns, CELL_KEYS, fixed_columns, states, pos, total, sizes)
+
+
+def log_aggregate_summary(agg: TraitAggregates):
+    """Log weighted prevalence and data quality summary from the trait's aggregates."""
+    cells = agg.cells
+    total_weight = cells["total_weight"].sum()
+    weighted_prevalence = cells["pos_weight"].sum() / total_weight if total_weight > 0 else 0
+    valid_rows = int(cells["row_count"].sum())
+    positives = int(cells["pos_count"].sum())
+    negatives = valid_rows - positives
+
+    print(f"  Data summary for {agg.key}:")
     print(f"    Valid rows (non-missing label): {valid_rows:,}")
     print(f"    Total weight: {total_weight:,.0f}")
     print(f"    Weighted prevalence (survey): {weighted_prevalence:.2%}")
-    print(f"    Positive cases: {(labels == 1).sum():,} ({(labels == 1).mean():.1%} unweighted)")
-    print(f"    Negative cases: {(labels == 0).sum():,} ({(labels == 0).mean():.1%} unweighted)")
+    print(f"    Positive cases: {positives:,} ({positives / valid_rows:.1%} unweighted)")
+    print(f"    Negative cases: {negatives:,} ({negatives / valid_rows:.1%} unweighted)")
 
 
-def write_trait_output(trait_key: str, meta: dict, prob_by_cell: Dict[str, float]):
+def write_trait_output(
+    trait_key: str,
+    meta: dict,
+    prob_by_cell: Dict[str, float],
+    uncertainty: Optional[Dict[str, dict]] = None,
+):
     TRAIT_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     PUBLIC_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    payload = {"meta": meta, "prob_by_cell": prob_by_cell}
+    # se_by_cell / ci95_by_cell sit next to prob_by_cell when design variance is available
+    payload = {"meta": meta, "prob_by_cell": prob_by_cell, **(uncertainty or {})}
     out_path = TRAIT_OUTPUT_DIR / f"{trait_key}.json"
     pub_path = PUBLIC_OUTPUT_DIR / f"{trait_key}.json"
 
@@ -462,132 +1207,707 @@ def write_trait_output(trait_key: str, meta: dict, prob_by_cell: Dict[str, float
     print(f"Wrote trait probabilities: {out_path}")
 
 
-def main():
-    config_json = load_json(CONFIG_PATH)
-    state_regions = load_json(STATE_REGION_PATH)
-    acs_cells = load_json(ACS_CELLS_PATH)
+def finish_trait(
+    trait: TraitConfig,
+    agg: Optional[TraitAggregates],
+    fit_note: str,
+    preds: Optional[np.ndarray],
+    intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    layout: CellLayout,
+    meta: dict,
+) -> Optional[tuple]:
+    """
+    Log, validate and assemble one fitted trait.
+    Returns write_trait_output arguments, or None when the trait is skipped.
+    """
+    print(f"\n{'='*60}")
+    print(f"Modeling trait: {trait.label} ({trait.key})")
+    print(f"{'='*60}")
 
-    traits = [TraitConfig(**t) for t in config_json.get("traits", [])]
-    xpt_dir = ROOT / "data" / "raw" / "brfss" / "2024"
-    xpt_files = sorted(xpt_dir.glob("*.xpt")) + sorted(xpt_dir.glob("*.XPT"))
-    if not xpt_files:
-        raise FileNotFoundError(f"No BRFSS XPT files found in {xpt_dir}")
+    if agg is None:
+        print(f"WARNING: No coded_rule or derive function for trait {trait.key}, skipping.")
+        return None
+
+    missing_label = agg.rows_missing_label
+    print(f"  Excluded rows (missing/refused): {missing_label:,} ({missing_label/agg.rows_seen:.1%})")
+    if agg.cells is None:
+        raise RuntimeError(f"No usable records for trait {trait.key}")
+    log_aggregate_summary(agg)
+    if fit_note:
+        print(fit_note)
+
+    # Adult cells carry the model predictions; child cells (0_14, 15_17, or legacy 0_17) are 0 (ineligible)
+    rounded = np.round(preds, 6)
+    prob_by_cell = layout.prob_by_cell(rounded)
+    prevalence = validate_probabilities(rounded, layout, trait.key, trait.prevalence_bounds, PREVALENCE_HINT)
+    meta = {**meta, "implied_prevalence": round(prevalence, 4)}
+
+    uncertainty = None
+    if intervals is not None:
+        uncertainty = uncertainty_by_cell(layout.adult_ids, layout.child_ids, intervals)
+    return trait.key, meta, prob_by_cell, uncertainty
+
+
+def prepare_respondents(
+    df: pd.DataFrame,
+    weight_col: str,
+    sex_col: str,
+    age_col: str,
+    state_col: str,
+    state_regions: Dict[str, str],
+    design_cols: Optional[Tuple[str, str]] = None,
+    with_state: bool = False,
+) -> pd.DataFrame:
+    """
+    Attach weight/sex/age/region keys (plus stratum/psu when `design_cols` is given and the
+    two-digit state_key when `with_state`) and drop rows without a usable weight.
+    """
+    # Columns outside BRFSS_SCHEMA still need numeric codes before recoding
+    for col in df.select_dtypes(exclude="number").columns:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    xpt_files.sort(key=lambda p: p.stat().st_size, reverse=True)
-    xpt_path = xpt_files[0]
+    df["weight"] = df[weight_col].astype("float32")
+    df["sex_key"] = recode_sex(df[sex_col])
+    df["age_band"] = recode_brfss_age(df[age_col])
+    df["region_key"] = recode_state_region(df[state_col], state_region_table(state_regions))
+    if design_cols is not None:
+        df["stratum"] = df[design_cols[0]].astype("float64")
+        df["psu"] = df[design_cols[1]].astype("float64")
+    if with_state:
+        df["state_key"] = recode_state(df[state_col], state_regions)
+    return df[df["weight"].notna() & (df["weight"] > 0)]
 
-    df = load_brfss_dataframe(xpt_path)
+
+@dataclass
+class LabelMatrix:
+    """
+    Every trait's labels for a block of respondents: int8, one column per trait,
+    LABEL_MISSING where the respondent is excluded. `cells_valid` is the shared mask of rows
+    with a sex, age band and region, so a trait's usable rows are one comparison away.
+    """
+    keys: List[str]
+    labels: np.ndarray
+    sex_valid: np.ndarray
+    age_valid: np.ndarray
+    region_valid: np.ndarray
+    cells_valid: np.ndarray
+
+    def column(self, key: str) -> np.ndarray:
+        return self.labels[:, self.keys.index(key)]
+
+    def usable(self, key: str) -> np.ndarray:
+        return self.cells_valid & (self.column(key) != LABEL_MISSING)
+
+
+def build_label_matrix(df: pd.DataFrame, traits: List[TraitConfig], columns: Dict[str, str]) -> LabelMatrix:
+    """
+    Label every trait in one stage. coded_rule traits share a single column store, so each
+    source variable is converted once however many traits read it.
+    """
+    keys = [trait.key for trait in traits if has_label_rule(trait)]
+    # Column-major so each trait's column is a contiguous slice
+    labels = np.empty((len(df), len(keys)), dtype=np.int8, order="F")
+    store = ColumnStore(df, columns)
+    for j, trait in enumerate(t for t in traits if has_label_rule(t)):
+        if is_coded_rule(trait.label_rule):
+            values = compiled_rule(trait).evaluate_store(store)
+        else:
+            values = VECTORIZED_DERIVE_FUNCTIONS[trait.key](df, trait.label_rule, columns)
+        labels[:, j] = np.where(np.isnan(values), LABEL_MISSING, values)
+    sex_valid = df["sex_key"].notna().to_numpy()
+    age_valid = df["age_band"].notna().to_numpy()
+    region_valid = df["region_key"].notna().to_numpy()
+    return LabelMatrix(keys, labels, sex_valid, age_valid, region_valid, sex_valid & age_valid & region_valid)
+
+
+def stream_trait_aggregates(
+    xpt_path: Path,
+    traits: List[TraitConfig],
+    state_regions: Dict[str, str],
+    chunksize: int,
+    workers: int = 1,
+    variance: bool = True,
+    replicates: int = 0,
+    seed=0,
+    with_state: bool = False,
+) -> Dict[str, TraitAggregates]:
+    """
+    Recode, label and aggregate the XPT chunk by chunk; peak memory is one chunk plus a
+    respondent count per PSU shared by all traits. PSUs can span chunks, so those found to hold
+    several respondents get their per-PSU design totals from a second pass over the file (BRFSS
+    has one respondent per PSU and needs none). With `replicates`, Poisson-bootstrap totals are
+    folded in too, drawn from `seed`; with `with_state`, state-level totals for MRP.
+    """
+    needed = collect_needed_vars(traits)
+    columns = {col.upper(): col for col in resolve_columns(read_source_columns(xpt_path), needed)}
+    weight_col = select_column(columns, traits[0].weight_vars, "weight")
+    sex_col = select_column(columns, traits[0].sex_vars, "sex")
+    age_col = select_column(columns, traits[0].age_vars, "age")
+    state_col = select_column(columns, traits[0].state_vars, "state")
+    print(f"Using weight column: {weight_col}")
+    design_cols = select_design_columns(columns, traits) if variance else None
+
+    aggregates = {trait.key: TraitAggregates(trait.key) for trait in traits if has_label_rule(trait)}
+    multipliers = PoissonMultipliers(replicates, seed) if replicates > 0 else None
+    tally = PsuTally() if design_cols is not None else None
+    initial_rows = 0
+    kept_rows = 0
+    for chunk in iter_brfss_chunks(xpt_path, needed, chunksize, workers):
+        initial_rows += len(chunk)
+        chunk = prepare_respondents(
+            chunk, weight_col, sex_col, age_col, state_col, state_regions, design_cols, with_state
+        )
+        kept_rows += len(chunk)
+        matrix = build_label_matrix(chunk, traits, columns)
+        # Shared PSUs are only known once the whole file is tallied
+        clustered = np.zeros(len(chunk), dtype=bool) if tally is not None else None
+        for agg in aggregates.values():
+            agg.fold(chunk, matrix, clustered)
+        if tally is not None:
+            tally.add(chunk)
+        if multipliers is not None:
+            fold_replicates(aggregates, chunk, matrix, multipliers)
+    print(f"Rows with valid weights: {kept_rows:,} / {initial_rows:,}")
+
+    shared = tally.shared() if tally is not None else None
+    if shared is not None and len(shared):
+        print(f"{len(shared):,} PSUs hold several respondents; reading their rows again for per-PSU totals")
+        for chunk in iter_brfss_chunks(xpt_path, needed, chunksize, workers):
+            chunk = prepare_respondents(
+                chunk, weight_col, sex_col, age_col, state_col, state_regions, design_cols, with_state
+            )
+            chunk = chunk[rows_in_psus(chunk, shared)]
+            if len(chunk):
+                matrix = build_label_matrix(chunk, traits, columns)
+                for agg in aggregates.values():
+                    agg.fold_clusters(chunk, matrix, np.ones(len(chunk), dtype=bool))
+    return aggregates
+
+
+def load_trait_aggregates(
+    xpt_path: Path,
+    traits: List[TraitConfig],
+    state_regions: Dict[str, str],
+    workers: int = 1,
+    variance: bool = True,
+    replicates: int = 0,
+    seed=0,
+    with_state: bool = False,
+) -> Dict[str, TraitAggregates]:
+    """In-memory counterpart of stream_trait_aggregates: the whole file is recoded and folded at once."""
+    df = load_brfss_dataframe(xpt_path, usecols=collect_needed_vars(traits), workers=workers)
     columns = normalize_columns(df)
-    
-    # Log available columns for debugging
-    print(f"Total columns in BRFSS: {len(df.columns)}")
-    
-    # Identify relevant columns for debugging
-    relevant_prefixes = ['SMOKE', '_SMOKE', '_RFSMOK', 'ALCDAY', '_DRNK', '_BMI', 'DIABETE', 
-                         'ASTHMA', 'CHCCOPD', 'CVDCRHD', 'CVDSTRK', 'CHCKDNY', 'CHCOCNCR', 
-                         'HAVARTH', '_TOTIND', '_LLCPWT', 'SEXVAR', '_AGEG5YR', '_STATE']
-    found_cols = [c for c in columns.keys() if any(c.startswith(p) for p in relevant_prefixes)]
-    print(f"Relevant columns found: {found_cols[:30]}...")
+    print(f"Columns loaded from BRFSS: {sorted(columns.keys())}")
 
     weight_col = select_column(columns, traits[0].weight_vars, "weight")
     sex_col = select_column(columns, traits[0].sex_vars, "sex")
     age_col = select_column(columns, traits[0].age_vars, "age")
     state_col = select_column(columns, traits[0].state_vars, "state")
-    
     print(f"Using weight column: {weight_col}")
+    design_cols = select_design_columns(columns, traits) if variance else None
 
-    # Gather all needed columns
-    base_cols = {weight_col, sex_col, age_col, state_col}
-    needed_trait_vars = set()
-    
-    # Always include these smoking columns for fallback
-    needed_trait_vars.update(["_SMOKER3", "_RFSMOK3", "SMOKE100", "SMOKDAY2"])
-    
+    initial_rows = len(df)
+    df = prepare_respondents(df, weight_col, sex_col, age_col, state_col, state_regions, design_cols, with_state)
+    print(f"Rows with valid weights: {len(df):,} / {initial_rows:,}")
+    matrix = build_label_matrix(df, traits, columns)
+    aggregates = {trait.key: TraitAggregates(trait.key) for trait in traits if has_label_rule(trait)}
+    clustered = shared_psu_rows(df) if design_cols is not None else None
+    for agg in aggregates.values():
+        agg.fold(df, matrix, clustered)
+    if replicates > 0:
+        fold_replicates(aggregates, df, matrix, PoissonMultipliers(replicates, seed))
+    return aggregates
+
+
+def find_xpt_sources(xpt_dir: Path) -> List[Path]:
+    """XPT files and zipped XPTs in `xpt_dir`, largest first."""
+    xpt_files = sorted(xpt_dir.glob("*.xpt")) + sorted(xpt_dir.glob("*.XPT"))
+    # Distributed archives (e.g. LLCP2024XPT.zip) are read in place
+    xpt_files += [p for p in sorted(xpt_dir.glob("*.zip")) if find_member(p, XPT_MEMBER_PATTERNS)]
+    xpt_files.sort(key=source_size, reverse=True)
+    return xpt_files
+
+
+def resolve_brfss_sources(years: List[int], inputs: List[Path]) -> List[Path]:
+    """
+    Explicit --inputs win; otherwise take the largest source from each year directory
+    under data/raw/brfss/ (default: 2024 only).
+    """
+    if inputs:
+        missing = [str(p) for p in inputs if not p.exists()]
+        if missing:
+            raise FileNotFoundError(f"BRFSS inputs not found: {', '.join(missing)}")
+        return inputs
+    sources = []
+    for year in years or [DEFAULT_YEAR]:
+        xpt_dir = BRFSS_RAW_DIR / str(year)
+        xpt_files = find_xpt_sources(xpt_dir)
+        if not xpt_files:
+            raise FileNotFoundError(f"No BRFSS XPT files found in {xpt_dir}")
+        sources.append(xpt_files[0])
+    return sources
+
+
+def year_from_path(path: Path) -> Optional[int]:
+    """Survey year from the file name (LLCP2023.XPT) or its year directory."""
+    for text in (path.name, path.parent.name):
+        match = re.search(r"(?:19|20)\d{2}", text)
+        if match:
+            return int(match.group(0))
+    return None
+
+
+def aggregate_source(
+    path: Path,
+    traits: List[TraitConfig],
+    state_regions: Dict[str, str],
+    chunksize: int,
+    use_cache: bool,
+    variance: bool = True,
+    replicates: int = 0,
+    seed=0,
+    with_state: bool = False,
+    workers: int = 1,
+) -> Dict[str, TraitAggregates]:
+    """
+    Stream one BRFSS source into per-trait aggregates; runs inside a pool worker when pooling.
+    `workers` decode the file (cache conversion and direct reads) by row range.
+    """
+    if use_cache:
+        try:
+            path = ensure_parquet(path, workers=workers)
+        except Exception as cache_err:
+            print(f"Parquet cache unavailable for {path.name} ({cache_err}); reading the XPT directly.")
+    return stream_trait_aggregates(
+        path,
+        traits,
+        state_regions,
+        chunksize,
+        workers,
+        variance=variance,
+        replicates=replicates,
+        seed=seed,
+        with_state=with_state,
+    )
+
+
+def pool_brfss_sources(
+    paths: List[Path],
+    traits: List[TraitConfig],
+    state_regions: Dict[str, str],
+    chunksize: int,
+    use_cache: bool,
+    workers: int,
+    variance: bool = True,
+    replicates: int = 0,
+    seed: int = 0,
+    with_state: bool = False,
+) -> Dict[str, TraitAggregates]:
+    """
+    Aggregate several BRFSS files (typically years) and combine them. Each file is resolved
+    against its own header, so renamed variables (_SMOKER3/_RFSMOK3, DRNKANY6, ...) are
+    harmonized through the usual candidate lists.
+
+    Weights are year-adjusted: each file's weights are scaled by its share of the pooled
+    respondents, so the pooled totals still describe one average year. Strata are kept
+    distinct per file for the design-based variance, and each file draws its bootstrap
+    multipliers from its own stream ([seed, file index]). `workers` are split between the
+    files aggregated at once and each file's decode.
+    """
+    concurrent = min(workers, len(paths)) if workers > 1 else 1
+    args = (
+        paths,
+        repeat(traits),
+        repeat(state_regions),
+        repeat(chunksize),
+        repeat(use_cache),
+        repeat(variance),
+        repeat(replicates),
+        [[seed, source] for source in range(len(paths))],
+        repeat(with_state),
+        repeat(max(1, workers // concurrent)),
+    )
+    if concurrent > 1:
+        with ProcessPoolExecutor(max_workers=concurrent) as pool:
+            per_source = list(pool.map(aggregate_source, *args))
+    else:
+        per_source = list(map(aggregate_source, *args))
+
+    source_rows = [max((agg.rows_seen for agg in aggs.values()), default=0) for aggs in per_source]
+    total_rows = sum(source_rows)
+    if total_rows == 0:
+        raise RuntimeError("No BRFSS respondents with valid weights in the pooled sources")
+
+    pooled = {trait.key: TraitAggregates(trait.key) for trait in traits if has_label_rule(trait)}
+    for source, (path, rows, aggs) in enumerate(zip(paths, source_rows, per_source)):
+        factor = rows / total_rows
+        print(f"Pooling {path.name}: {rows:,} respondents, weight factor {factor:.4f}")
+        for key, agg in aggs.items():
+            pooled[key].merge(agg.scaled(factor).with_source(source))
+    return pooled
+
+
+def preflight_brfss(path: Path, traits: List[TraitConfig]) -> PreflightReport:
+    """Resolve every configured variable against the source header only."""
+    report = PreflightReport(path.name)
+    columns = normalize_names(read_source_columns(path))
+    report.require("weight", columns, traits[0].weight_vars)
+    report.require("sex", columns, traits[0].sex_vars)
+    report.require("age", columns, traits[0].age_vars)
+    report.require("state", columns, traits[0].state_vars)
     for trait in traits:
-        needed_trait_vars.update(trait.label_rule.get("preferred_vars", []))
-        needed_trait_vars.update(trait.label_rule.get("fallback", []))
-        needed_trait_vars.update(trait.label_rule.get("condition_vars", []))
+        if not has_label_rule(trait):
+            report.warnings.append(f"{trait.key}: no coded_rule or derive function, trait will be skipped")
+            continue
+        report.require_any(f"{trait.key} label_rule", columns, label_rule_vars(trait))
+    return report
 
-    selected_cols = [columns[c.upper()] for c in needed_trait_vars if c.upper() in columns] + list(base_cols)
-    df = df[list(set(selected_cols))].copy()
 
-    # Coerce numeric codes before recoding
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build modeled trait probabilities from BRFSS microdata.")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=0,
+        help="Stream the XPT in chunks of this many rows and fit from per-cell aggregates (bounded memory).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Read the XPT directly instead of through the Parquet cache in data/cache/xpt/.",
+    )
+    parser.add_argument(
+        "--decode-workers",
+        type=int,
+        default=1,
+        help="Decode the XPT on this many processes by row range (0 = all cores).",
+    )
+    parser.add_argument(
+        "--years",
+        type=int,
+        nargs="+",
+        default=[],
+        help="Pool the BRFSS file from each data/raw/brfss/<year>/ directory.",
+    )
+    parser.add_argument(
+        "--inputs",
+        type=Path,
+        nargs="+",
+        default=[],
+        help="Pool these BRFSS files (XPT or zipped XPT) instead of discovering them.",
+    )
+    parser.add_argument(
+        "--no-fit-cache",
+        action="store_true",
+        help="Refit every trait from scratch instead of reusing or warm-starting from data/cache/fits/.",
+    )
+    parser.add_argument(
+        "--no-variance",
+        action="store_true",
+        help="Skip design-based (stratum/PSU) standard errors and intervals.",
+    )
+    parser.add_argument(
+        "--model-spec",
+        choices=MODEL_SPECS + (AUTO_SPEC,),
+        help="Model every trait with this spec instead of its configured model_spec.",
+    )
+    parser.add_argument(
+        "--model-selection",
+        choices=SELECTION_CRITERIA,
+        help="Criterion for auto specs instead of each trait's model_selection.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND,
+        help="Solver for the trait logits (selection, bootstrap and MRP always use the batched NumPy IRLS).",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Fit every trait with each backend, report time, peak memory and prediction differences, and exit.",
+    )
+    parser.add_argument(
+        "--benchmark-tol",
+        type=float,
+        default=BENCHMARK_TOL,
+        help="Largest prediction difference from statsmodels a backend may show to be recommended.",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        metavar="B",
+        help="Report Poisson-bootstrap percentile intervals from B replicates instead of the design-based ones.",
+    )
+    parser.add_argument(
+        "--bootstrap-seed",
+        type=int,
+        default=0,
+        help="Seed for the bootstrap weight multipliers.",
+    )
+    parser.add_argument(
+        "--mrp",
+        action="store_true",
+        help="Fit a state random intercept and poststratify to ACS state cells (adds state-level estimates).",
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Rake cell probabilities on the logit scale to the survey's weighted sex, age and region margins.",
+    )
+    parser.add_argument(
+        "--diagnostics",
+        action="store_true",
+        help="Write per-trait fit diagnostics (JSON + HTML) to data/diagnostics/ (or set TRAIT_DIAGNOSTICS=1).",
+    )
+    parser.add_argument(
+        "--preflight-only",
+        action="store_true",
+        help="Check the configured variables against the file headers and exit.",
+    )
+    args = parser.parse_args(argv)
+    if args.mrp and args.bootstrap > 0:
+        parser.error("--mrp reports its own intervals and cannot be combined with --bootstrap")
+    if args.mrp and args.calibrate:
+        parser.error("--calibrate adjusts region cells only and cannot be combined with --mrp's state estimates")
+    return args
 
-    df["weight"] = df[weight_col].apply(lambda x: float(x) if pd.notna(x) else np.nan)
-    df["sex_key"] = df[sex_col].apply(to_sex)
-    df["age_band"] = df[age_col].apply(to_age_band)
-    df["region_key"] = df[state_col].apply(lambda x: state_regions.get(str(int(x)).zfill(2)) if pd.notna(x) else None)
-    
-    # Filter to valid weights
-    initial_rows = len(df)
-    df = df[df["weight"].notna() & (df["weight"] > 0)]
-    print(f"Rows with valid weights: {len(df):,} / {initial_rows:,}")
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    decode_workers = args.decode_workers if args.decode_workers > 0 else default_workers()
+    config_json = load_json(CONFIG_PATH)
+    state_regions = load_json(STATE_REGION_PATH)
+    acs_cells = load_json(ACS_CELLS_PATH)
+    state_cells = load_state_cells(ACS_STATE_CELLS_PATH, state_regions) if args.mrp else None
+
+    traits = [TraitConfig(**t) for t in config_json.get("traits", [])]
+    for trait in traits:
+        check_spec(trait.model_spec, trait.model_selection, trait.key)
+    sources = resolve_brfss_sources(args.years, args.inputs)
+    source_years = sorted({y for y in map(year_from_path, sources) if y is not None})
+    raise_if_failed([preflight_brfss(path, traits) for path in sources])
+    if args.preflight_only:
+        return 0
+
+    xpt_path = sources[0]
+    if len(sources) == 1 and not args.no_cache:
+        try:
+            xpt_path = ensure_parquet(xpt_path, workers=decode_workers)
+        except Exception as cache_err:
+            print(f"Parquet cache unavailable ({cache_err}); reading the XPT directly.")
+
+    # Every path collapses respondents into per-pattern sufficient statistics before fitting
+    aggregates: Dict[str, TraitAggregates] = {}
+    if len(sources) > 1:
+        # Pooling always aggregates so memory does not grow with the number of files
+        chunksize = args.chunksize if args.chunksize > 0 else POOL_CHUNK_ROWS
+        aggregates = pool_brfss_sources(
+            sources,
+            traits,
+            state_regions,
+            chunksize,
+            not args.no_cache,
+            decode_workers,
+            not args.no_variance,
+            args.bootstrap,
+            args.bootstrap_seed,
+            args.mrp,
+        )
+    elif args.chunksize > 0:
+        aggregates = stream_trait_aggregates(
+            xpt_path,
+            traits,
+            state_regions,
+            args.chunksize,
+            decode_workers,
+            not args.no_variance,
+            args.bootstrap,
+            args.bootstrap_seed,
+            args.mrp,
+        )
+    else:
+        aggregates = load_trait_aggregates(
+            xpt_path,
+            traits,
+            state_regions,
+            decode_workers,
+            not args.no_variance,
+            args.bootstrap,
+            args.bootstrap_seed,
+            args.mrp,
+        )
 
     # Build cells dataframe for predictions
     cells_df = pd.DataFrame(acs_cells["cells"])
     cells_df = cells_df.rename(columns={"sex": "sex_key", "region": "region_key"})
 
-    for trait in traits:
-        print(f"\n{'='*60}")
-        print(f"Modeling trait: {trait.label} ({trait.key})")
-        print(f"{'='*60}")
-        
-        derive_fn = DERIVE_FUNCTIONS.get(trait.key)
-        if derive_fn is None:
-            print(f"WARNING: No derive function for trait {trait.key}, skipping.")
+    # Only predict for adult cells (BRFSS is 18+)
+    layout = CellLayout.from_cells(cells_df)
+    adult_cells_df = cells_df[~child_rows(cells_df["age_band"])].copy()
+
+    # One batched solve per model spec, covering every trait with usable records that uses it
+    fitted = {key: agg for key, agg in aggregates.items() if agg.cells is not None}
+    models = choose_specs(fitted, traits, args.model_spec, args.model_selection)
+    cell_encoder = CellEncoder(adult_cells_df, CELL_KEYS)
+    if args.benchmark:
+        groups = []
+        for spec in MODEL_SPECS:
+            group = {key: agg for key, agg in fitted.items() if models[key]["spec"] == spec}
+            if group:
+                design, pos, total = trait_problem(group, spec)
+                adult_matrix = cell_encoder.design(design.columns)
+                groups.append(benchmark_backends(design.to_numpy(), pos, total, list(design.columns), adult_matrix))
+        report_benchmark(combine_benchmarks(groups), args.benchmark_tol)
+        return 0
+
+    fit_cache = None if args.no_fit_cache else FitCache(cache_namespace("brfss", args.backend))
+    fit_index: Dict[str, Tuple[BatchedFit, int, np.ndarray]] = {}
+    replicate_intervals: Dict[str, tuple] = {}
+    mrp_preds: Dict[str, np.ndarray] = {}
+    mrp_results: Dict[str, tuple] = {}
+    mrp_index: Dict[str, Tuple[MrpFit, int]] = {}
+    if args.mrp:
+        states = sorted(state_cells["state_key"].unique())
+        region_weights = poststratification_weights(state_cells, adult_cells_df, CELL_KEYS)
+        state_weights = poststratification_weights(state_cells, pd.DataFrame({"state_key": states}), ["state_key"])
+    for spec in MODEL_SPECS:
+        group = {key: agg for key, agg in fitted.items() if models[key]["spec"] == spec}
+        if not group:
             continue
-        
-        df[trait.key] = df.apply(lambda row: derive_fn(row, trait.label_rule, columns), axis=1)
-
-        # Count excluded rows (missing labels)
-        total_with_weight = len(df)
-        missing_label = df[trait.key].isna().sum()
-        print(f"  Excluded rows (missing/refused): {missing_label:,} ({missing_label/total_with_weight:.1%})")
-
-        trait_df = df.dropna(subset=[trait.key, "sex_key", "age_band", "region_key"]).copy()
-        trait_df[trait.key] = pd.to_numeric(trait_df[trait.key], errors="coerce")
-        trait_df["weight"] = pd.to_numeric(trait_df["weight"], errors="coerce")
-        if trait_df.empty:
-            raise RuntimeError(f"No usable records for trait {trait.key}")
-
-        # Log summary before modeling
-        log_trait_summary(trait.key, trait_df, "weight")
-
-        model_df = trait_df[["sex_key", "age_band", "region_key", "weight", trait.key]].copy()
-        result, design_columns = fit_logit(model_df, trait.key, "weight")
-        print(result.summary())
-
-        # Only predict for adult cells (BRFSS is 18+)
-        adult_cells_df = cells_df[~cells_df["age_band"].apply(is_child_age_band)].copy()
-        
-        preds = predict_for_cells(result, design_columns, adult_cells_df[["sex_key", "age_band", "region_key"]])
-
-        # Create prob_by_cell with adult cells having model predictions
-        prob_by_cell = {cell_id: float(round(prob, 6)) for cell_id, prob in zip(adult_cells_df["cell_id"], preds)}
-        
-        # Add child cells (0_14, 15_17, or legacy 0_17) with probability 0 (ineligible)
-        child_cells = cells_df[cells_df["age_band"].apply(is_child_age_band)]
-        for _, row in child_cells.iterrows():
-            prob_by_cell[row["cell_id"]] = 0.0
-        
-        # Validate probabilities and prevalence
-        prevalence = validate_probabilities(prob_by_cell, cells_df, trait.key, trait.prevalence_bounds)
-        
+        fit = fit_traits_batched(group, fit_cache, spec, args.backend)
+        adult_matrix = cell_encoder.design(fit.columns)
+        if args.bootstrap > 0:
+            intervals, converged = bootstrap_intervals(fit, group, adult_matrix)
+        for k, key in enumerate(group):
+            fit_index[key] = (fit, k, adult_matrix)
+            if args.bootstrap > 0:
+                replicate_intervals[key] = (tuple(values[:, k] for values in intervals), int(converged[k]))
+        if args.mrp:
+            # Region cells become population-weighted means of their states' cells
+            mrp_fit = fit_traits_mrp(group, spec, state_cells)
+            state_matrix = mrp_fit.design(state_cells, CELL_KEYS)
+            state_probs = mrp_fit.predict(state_matrix)
+            for k, key in enumerate(group):
+                region_probs, region_intervals = poststratify(
+                    mrp_fit.params[k], mrp_fit.cov[k], state_matrix, region_weights
+                )
+                state_prevalence, _ = poststratify(mrp_fit.params[k], mrp_fit.cov[k], state_matrix, state_weights)
+                mrp_index[key] = (mrp_fit, k)
+                mrp_preds[key] = np.clip(region_probs, 0, 1)
+                mrp_results[key] = (
+                    region_intervals,
+                    {
+                        "prob_by_state_cell": {
+                            cell_id: float(round(p, 6)) for cell_id, p in zip(state_cells["cell_id"], state_probs[:, k])
+                        },
+                        "prevalence_by_state": {
+                            state: float(round(p, 6)) for state, p in zip(states, state_prevalence)
+                        },
+                    },
+                    {
+                        "random_effects": ["state"],
+                        "sigma_state": round(float(mrp_fit.sigma[k]), 4),
+                        "states": len(states),
+                        "solver": "penalized_irls_laplace",
+                        "converged": bool(mrp_fit.converged[k]),
+                        "backbone": ACS_STATE_CELLS_PATH.name,
+                    },
+                )
+
+    # Every trait predicts in one product over the union of the specs' columns
+    keys = list(fit_index)
+    preds = np.clip(predict_cells(cell_encoder, [fit_index[key][:2] for key in keys]), 0, 1)
+    all_preds = {key: mrp_preds.get(key, preds[:, k]) for k, key in enumerate(keys)}
+
+    calibrated: Dict[str, tuple] = {}
+    if args.calibrate and all_preds:
+        patterns = {key: fitted[key].cells.reset_index() for key in all_preds}
+        calibrated = calibrate_cells(all_preds, adult_cells_df, CELL_KEYS, patterns)
+        for key, (prob, _, _) in calibrated.items():
+            all_preds[key] = np.clip(prob, 0, 1)
+
+    generated_at = build_timestamp()
+    if diagnostics_enabled(args.diagnostics):
+        for key, (fit, k, _) in fit_index.items():
+            agg = fitted[key]
+            data = {
+                "rows_seen": agg.rows_seen,
+                "rows_missing_label": agg.rows_missing_label,
+                "rows_used": int(agg.cells["row_count"].sum()),
+                "total_weight": float(agg.cells["total_weight"].sum()),
+                "sources": [p.name for p in sources],
+            }
+            if key in mrp_index:
+                # The trait reports the MRP estimates, so its diagnostics describe that fit
+                write_diagnostics(mrp_diagnostics(*mrp_index[key], key, data, generated_at))
+            else:
+                write_diagnostics(fit_diagnostics(fit, k, key, data, generated_at, args.backend))
+
+    for trait in traits:
+        fit, k, adult_matrix = fit_index.get(trait.key, (None, None, None))
+        fit_note = ""
+        if k is not None and not fit.converged[k]:
+            fit_note = f"  WARNING: logit for {trait.key} did not converge in {fit.iterations[k]} iterations"
         meta = {
             "source": trait.source,
-            "year": 2024,
+            "year": max(source_years, default=DEFAULT_YEAR),
             "method": "weighted_logit",
+            "backend": args.backend,
             "features": ["sex", "age_band", "region"],
+            "model": models.get(trait.key),
             "minAge": trait.minAge,
             "universeLabel": trait.universeLabel,
             "regionSupport": trait.regionSupport,
-            "generatedAt": pd.Timestamp.utcnow().isoformat(),
+            "generatedAt": generated_at,
             "definition": trait.definition_notes,
-            "implied_prevalence": round(prevalence, 4),
+            "implied_prevalence": None,
         }
-        write_trait_output(trait.key, meta, prob_by_cell)
+        if len(sources) > 1:
+            meta["pooled_years"] = source_years
+            meta["pooled_sources"] = [p.name for p in sources]
+        preds = all_preds.get(trait.key)
+        intervals = None
+        variance = None
+        if trait.key in mrp_results:
+            mrp_intervals, _, meta["mrp"] = mrp_results[trait.key]
+            meta["method"] = "mrp"
+            if not args.no_variance:
+                intervals = mrp_intervals
+                meta["variance"] = {"method": "laplace_delta", "ci_level": 0.95, "ci_scale": "logit"}
+        elif trait.key in replicate_intervals:
+            intervals, replicates_converged = replicate_intervals[trait.key]
+            meta["variance"] = {
+                "method": "poisson_bootstrap",
+                "replicates": args.bootstrap,
+                "replicates_converged": replicates_converged,
+                "seed": args.bootstrap_seed,
+                "ci_level": 0.95,
+                "ci_method": "percentile",
+            }
+        elif k is not None:
+            variance = design_intervals(fit, k, fitted[trait.key], adult_matrix)
+        if variance is not None:
+            design_cov, intervals = variance
+            meta["variance"] = {
+                "method": "taylor_linearization",
+                "strata": design_cov.strata,
+                "psus": design_cov.psus,
+                "lonely_psu": "certainty",
+                "ci_level": 0.95,
+                "ci_scale": "logit",
+            }
+        if trait.key in calibrated:
+            _, shift, meta["calibration"] = calibrated[trait.key]
+            if intervals is not None:
+                intervals = shift_intervals(intervals, preds, shift)
+        output = finish_trait(trait, aggregates.get(trait.key), fit_note, preds, intervals, layout, meta)
+        if output is not None:
+            trait_key, meta, prob_by_cell, uncertainty = output
+            if trait_key in mrp_results:
+                uncertainty = {**(uncertainty or {}), **mrp_results[trait_key][1]}
+            write_trait_output(trait_key, meta, prob_by_cell, uncertainty)
 
     print(f"\n{'='*60}")
     print("All BRFSS traits built successfully!")
@@ -0,0 +1,189 @@
+"""
+Calibration of modeled cell probabilities to the survey's direct weighted margins.
+
+The model's cell probabilities, weighted by ACS population, need not reproduce the survey's
+own weighted prevalence by region, sex or age band: the fit weights cells by survey weight,
+the app by census population, and a non-saturated spec smooths between cells. Calibration
+adds one logit offset per margin level,
+
+    logit p'_c = logit p_c + sum_m a_m[level_m(c)],
+
+and rakes the offsets margin by margin (iterative proportional fitting on the logit scale)
+until every population-weighted level mean matches the survey's. Each margin update is one
+Newton step per level, computed for all levels and traits at once with a (cells, levels)
+share matrix, so a full calibration is a few dozen small matrix products.
+
+Each margin's direct estimates average, over the ACS population, to a slightly different
+overall prevalence (the survey's weighted composition is not the ACS's), and no offsets can
+meet margins that disagree on the total. Every margin's targets are therefore scaled to the
+survey's overall weighted prevalence first, keeping the ratios between levels. The offsets are
+identified only up to constants traded between margins; they are reported with every margin
+but the first centred at a population-weighted mean of zero.
+
+Levels the survey never observed have no target and get no offset of their own. Intervals are moved
+with their cell: bounds by the same logit shift and standard errors by the ratio of the
+logistic derivative.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit, logit
+
+CALIBRATION_TOL = 1e-10
+MAX_SWEEPS = 100
+
+
+@dataclass
+class Raking:
+    """Calibrated (cells, traits) probabilities with each margin's (traits, levels) offsets."""
+    prob: np.ndarray
+    shift: np.ndarray
+    offsets: List[np.ndarray]
+    sweeps: int
+    max_gap: np.ndarray
+    converged: np.ndarray
+
+
+def margin_codes(cells: pd.DataFrame, margins: List[str]) -> Tuple[List[np.ndarray], List[List[str]]]:
+    """Each cell's level index per margin, and the levels in index order."""
+    codes, levels = [], []
+    for margin in margins:
+        values = cells[margin].astype(object)
+        names = sorted(values.unique())
+        codes.append(pd.Categorical(values, categories=names).codes.astype(np.int64))
+        levels.append(names)
+    return codes, levels
+
+
+def direct_margins(patterns: pd.DataFrame, margins: List[str], levels: List[List[str]]) -> List[np.ndarray]:
+    """
+    Weighted prevalence per level of each margin from per-pattern `pos_weight` and
+    `total_weight`; NaN for levels without survey weight.
+    """
+    targets = []
+    for margin, names in zip(margins, levels):
+        sums = patterns.groupby(patterns[margin].astype(object))[["pos_weight", "total_weight"]].sum().reindex(names)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = (sums["pos_weight"] / sums["total_weight"]).to_numpy(dtype="float64")
+        targets.append(np.where(sums["total_weight"].to_numpy(dtype="float64") > 0, share, np.nan))
+    return targets
+
+
+def level_shares(codes: List[np.ndarray], pop: np.ndarray, n_levels: List[int]) -> List[np.ndarray]:
+    """(cells, levels) matrices whose columns average cells over a level by population."""
+    shares = []
+    for code, size in zip(codes, n_levels):
+        onehot = np.eye(size)[code] * pop[:, None]
+        shares.append(onehot / np.maximum(onehot.sum(axis=0), 1e-300))
+    return shares
+
+
+def common_total(targets: List[np.ndarray], codes: List[np.ndarray], pop: np.ndarray, overall: np.ndarray) -> List[np.ndarray]:
+    """Scale each margin's (K, levels) targets so their population-weighted mean is `overall` (K,)."""
+    scaled = []
+    for code, target in zip(codes, targets):
+        level_pop = np.bincount(code, weights=pop, minlength=target.shape[1])
+        observed = np.isfinite(target)
+        mean = (np.where(observed, target, 0) @ level_pop) / (observed @ level_pop)
+        scaled.append(np.clip(target * (overall / mean)[:, None], 1e-12, 1 - 1e-12))
+    return scaled
+
+
+def rake_logit(
+    prob: np.ndarray,
+    pop: np.ndarray,
+    codes: List[np.ndarray],
+    targets: List[np.ndarray],
+    tol: float = CALIBRATION_TOL,
+    max_sweeps: int = MAX_SWEEPS,
+) -> Raking:
+    """
+    Rake (cells, K) probabilities to `targets`, one (K, levels) array per margin whose
+    cells are coded by `codes`. Stops once every level mean is within `tol` of its target.
+    """
+    eta = logit(np.clip(prob, 1e-12, 1 - 1e-12))
+    shares = level_shares(codes, pop, [target.shape[1] for target in targets])
+    offsets = [np.zeros(target.shape) for target in targets]
+    shift = np.zeros_like(eta)
+
+    sweeps = 0
+    max_gap = _max_gap(shares, targets, expit(eta))
+    while sweeps < max_sweeps and max_gap.max() >= tol:
+        for m, (code, share, target) in enumerate(zip(codes, shares, targets)):
+            p = expit(eta + shift)
+            slope = (share.T @ (p * (1 - p))).T
+            step = np.where(np.isfinite(target), ((share.T @ p).T - target) / np.maximum(slope, 1e-300), 0.0)
+            offsets[m] -= step
+            shift -= step[:, code].T
+        sweeps += 1
+        max_gap = _max_gap(shares, targets, expit(eta + shift))
+    # Move each later margin's population-weighted mean offset into the first margin
+    for m in range(1, len(offsets)):
+        centre = offsets[m] @ np.bincount(codes[m], weights=pop, minlength=offsets[m].shape[1]) / pop.sum()
+        offsets[m] -= centre[:, None]
+        offsets[0] += centre[:, None]
+    return Raking(expit(eta + shift), shift, offsets, sweeps, max_gap, max_gap < tol)
+
+
+def _max_gap(shares: List[np.ndarray], targets: List[np.ndarray], prob: np.ndarray) -> np.ndarray:
+    """Largest |level mean - target| per trait over every margin with a target."""
+    gaps = [np.nan_to_num((share.T @ prob).T - target) for share, target in zip(shares, targets)]
+    return np.abs(np.column_stack(gaps)).max(axis=1)
+
+
+def shift_intervals(
+    intervals: Tuple[np.ndarray, np.ndarray, np.ndarray], prob: np.ndarray, shift: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Move per-cell (se, lower, upper) with calibrated probabilities `prob` by their logit `shift`."""
+    se, lower, upper = intervals
+    before = expit(logit(np.clip(prob, 1e-12, 1 - 1e-12)) - shift)
+    ratio = prob * (1 - prob) / np.maximum(before * (1 - before), 1e-300)
+    lower = expit(logit(np.clip(lower, 1e-12, 1 - 1e-12)) + shift)
+    upper = expit(logit(np.clip(upper, 1e-12, 1 - 1e-12)) + shift)
+    return se * ratio, lower, upper
+
+
+def calibration_meta(raking: Raking, k: int, margins: List[str], levels: List[List[str]]) -> Dict[str, object]:
+    """meta["calibration"] for trait `k`: odds factors exp(offset) per margin level and convergence."""
+    return {
+        "method": "logit_raking",
+        "margins": list(margins),
+        "factors": {
+            margin: {level: round(float(np.exp(offset)), 6) for level, offset in zip(names, raking.offsets[m][k])}
+            for m, (margin, names) in enumerate(zip(margins, levels))
+        },
+        "sweeps": raking.sweeps,
+        "max_gap": float(raking.max_gap[k]),
+        "converged": bool(raking.converged[k]),
+    }
+
+
+def calibrate_cells(
+    preds: Dict[str, np.ndarray], cells: pd.DataFrame, margins: List[str], patterns: Dict[str, pd.DataFrame]
+) -> Dict[str, Tuple[np.ndarray, np.ndarray, dict]]:
+    """
+    Rake every trait's cell probabilities (aligned with `cells`, which carry `pop`) to the
+    direct margins of its survey `patterns`, all traits together. Returns each trait's
+    calibrated probabilities, logit shift and meta["calibration"] entry.
+    """
+    keys = list(preds)
+    codes, levels = margin_codes(cells, margins)
+    pop = cells["pop"].to_numpy(dtype="float64")
+    direct = [direct_margins(patterns[key], margins, levels) for key in keys]
+    targets = [np.stack([trait_targets[m] for trait_targets in direct]) for m in range(len(margins))]
+    overall = np.array([patterns[key]["pos_weight"].sum() / patterns[key]["total_weight"].sum() for key in keys])
+    raking = rake_logit(np.column_stack([preds[key] for key in keys]), pop, codes, common_total(targets, codes, pop, overall))
+    if not raking.converged.all():
+        print(f"WARNING: calibration stopped after {raking.sweeps} sweeps; largest margin gap {raking.max_gap.max():.2e}")
+    return {
+        key: (
+            raking.prob[:, k],
+            raking.shift[:, k],
+            {**calibration_meta(raking, k, margins, levels), "overall_target": round(float(overall[k]), 6)},
+        )
+        for k, key in enumerate(keys)
+    }
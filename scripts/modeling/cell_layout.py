@@ -0,0 +1,86 @@
+"""
+The run's ACS cells split once into the adult cells the models predict and the child cells
+that are ineligible (probability 0), plus validation of a trait's cell probabilities.
+
+The split is made once per run, not per trait. The adult population vector is aligned with
+the prediction order, so a trait's implied prevalence is one dot product and the child fill
+one dict update. Both are linear in the number of cells, whether cells are regions, states
+or finer geographies.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+CHILD_AGE_BANDS = ("0_17", "0_14", "15_17")
+
+
+def is_child_age_band(age_band: str) -> bool:
+    """Check if an age band is for children (under 18)."""
+    return age_band in CHILD_AGE_BANDS
+
+
+def child_rows(age_bands: pd.Series) -> np.ndarray:
+    """Mask of rows in a child age band (0_14, 15_17, or legacy 0_17)."""
+    return age_bands.isin(CHILD_AGE_BANDS).to_numpy()
+
+
+@dataclass
+class CellLayout:
+    """Adult and child cell ids in output order, with the adult population aligned to predictions."""
+    adult_ids: List[str]
+    child_ids: List[str]
+    adult_pop: np.ndarray
+
+    @classmethod
+    def from_cells(cls, cells: pd.DataFrame) -> "CellLayout":
+        child = child_rows(cells["age_band"])
+        return cls(
+            cells.loc[~child, "cell_id"].tolist(),
+            cells.loc[child, "cell_id"].tolist(),
+            cells.loc[~child, "pop"].to_numpy(dtype="float64"),
+        )
+
+    def prob_by_cell(self, probs: np.ndarray) -> Dict[str, float]:
+        """Adult cell probabilities in prediction order, then every child cell at 0."""
+        prob_by_cell = dict(zip(self.adult_ids, probs.tolist()))
+        prob_by_cell.update(dict.fromkeys(self.child_ids, 0.0))
+        return prob_by_cell
+
+
+def validate_probabilities(
+    probs: np.ndarray, layout: CellLayout, trait_key: str, bounds: List[float], hint: str
+) -> float:
+    """
+    Check the adult cell probabilities are finite and within [0,1] and that the implied
+    national prevalence, sum(pop * prob) / sum(pop) over adult cells, is within `bounds`.
+    `hint` ends the out-of-bounds message. Returns the prevalence.
+    """
+    min_prev, max_prev = bounds
+    probs = np.asarray(probs, dtype="float64")
+
+    bad = np.flatnonzero(~np.isfinite(probs))
+    if bad.size:
+        i = bad[0]
+        raise ValueError(f"Trait {trait_key}: probability for {layout.adult_ids[i]} is not finite: {probs[i]}")
+    bad = np.flatnonzero((probs < 0) | (probs > 1))
+    if bad.size:
+        i = bad[0]
+        raise ValueError(f"Trait {trait_key}: probability for {layout.adult_ids[i]} out of bounds [0,1]: {probs[i]}")
+
+    if not layout.adult_ids:
+        raise ValueError(f"Trait {trait_key}: No adult cells found for prevalence calculation")
+    total_pop = layout.adult_pop.sum()
+    prevalence = float(layout.adult_pop @ probs / total_pop) if total_pop > 0 else 0
+
+    print(f"  Implied national prevalence: {prevalence:.2%}")
+
+    if prevalence < min_prev or prevalence > max_prev:
+        raise ValueError(
+            f"Trait {trait_key}: Implied prevalence {prevalence:.2%} is outside plausible bounds "
+            f"[{min_prev:.0%}, {max_prev:.0%}]. {hint}"
+        )
+    return prevalence
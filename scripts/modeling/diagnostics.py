@@ -0,0 +1,108 @@
+"""
+On-demand model diagnostics for the trait builders.
+
+Default builds skip diagnostics entirely. With `--diagnostics` (or TRAIT_DIAGNOSTICS=1)
+each fitted trait gets data/diagnostics/<trait>.json and a matching .html page
+with coefficients, standard errors, Wald tests, deviance, iterations and convergence.
+Under --mrp a trait's page describes the state random-intercept fit its estimates come from.
+"""
+from __future__ import annotations
+
+import html
+import json
+import math
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from scipy.stats import norm
+
+from batched_logit import BatchedFit
+from mrp import MrpFit
+
+ROOT = Path(__file__).resolve().parents[2]
+DIAGNOSTICS_DIR = ROOT / "data" / "diagnostics"
+DIAGNOSTICS_ENV = "TRAIT_DIAGNOSTICS"
+
+
+def diagnostics_enabled(flag: bool) -> bool:
+    return flag or os.environ.get(DIAGNOSTICS_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _finite(value: float) -> Optional[float]:
+    return value if math.isfinite(value) else None
+
+
+def _coefficient_rows(rows: List[dict]) -> List[dict]:
+    for row in rows:
+        row["p_value"] = float(2 * norm.sf(abs(row["z"])))
+    return [{key: _finite(value) if isinstance(value, float) else value for key, value in row.items()} for row in rows]
+
+
+def fit_diagnostics(fit: BatchedFit, k: int, trait_key: str, data: dict, generated_at: str, backend: str) -> dict:
+    """JSON-ready diagnostics for trait `k` of a fit made with logit `backend`; `data` describes its input rows."""
+    return {
+        "trait": trait_key,
+        "generatedAt": generated_at,
+        "model": {
+            "method": "weighted_logit",
+            "solver": backend,
+            "patterns": fit.patterns,
+            "deviance": _finite(float(fit.deviance[k])),
+            "iterations": int(fit.iterations[k]),
+            "converged": bool(fit.converged[k]),
+        },
+        "data": data,
+        "coefficients": _coefficient_rows(fit.coefficients(k)),
+    }
+
+
+def mrp_diagnostics(fit: MrpFit, k: int, trait_key: str, data: dict, generated_at: str) -> dict:
+    """The same payload for trait `k` of an MRP fit, whose estimates the trait's output reports."""
+    return {
+        "trait": trait_key,
+        "generatedAt": generated_at,
+        "model": {
+            "method": "mrp",
+            "solver": "penalized_irls_laplace",
+            "random_effects": ["state"],
+            "sigma_state": _finite(float(fit.sigma[k])),
+            "states": len(fit.states),
+            "converged": bool(fit.converged[k]),
+        },
+        "data": data,
+        "coefficients": _coefficient_rows(fit.coefficients(k)),
+    }
+
+
+def render_html(payload: dict) -> str:
+    def cell(value) -> str:
+        if isinstance(value, float):
+            return f"{value:.6g}"
+        return html.escape("n/a" if value is None else str(value))
+
+    model_rows = "".join(f"<tr><th>{cell(k)}</th><td>{cell(v)}</td></tr>" for k, v in payload["model"].items())
+    data_rows = "".join(f"<tr><th>{cell(k)}</th><td>{cell(v)}</td></tr>" for k, v in payload["data"].items())
+    columns = ["term", "coef", "std_err", "z", "p_value"]
+    coef_rows = "".join(
+        "<tr>" + "".join(f"<td>{cell(row[c])}</td>" for c in columns) + "</tr>" for row in payload["coefficients"]
+    )
+    title = html.escape(payload["trait"])
+    return (
+        f"<!doctype html>\n<html><head><meta charset=\"utf-8\"><title>{title} diagnostics</title></head><body>\n"
+        f"<h1>{title}</h1>\n<p>Generated {cell(payload['generatedAt'])}</p>\n"
+        f"<h2>Model</h2>\n<table>{model_rows}</table>\n"
+        f"<h2>Data</h2>\n<table>{data_rows}</table>\n"
+        f"<h2>Coefficients</h2>\n<table><tr>{''.join(f'<th>{c}</th>' for c in columns)}</tr>{coef_rows}</table>\n"
+        "</body></html>\n"
+    )
+
+
+def write_diagnostics(payload: dict, out_dir: Path = DIAGNOSTICS_DIR) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    json_path = out_dir / f"{payload['trait']}.json"
+    with json_path.open("w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    (out_dir / f"{payload['trait']}.html").write_text(render_html(payload), encoding="utf-8")
+    print(f"Wrote diagnostics: {json_path}")
+    return json_path
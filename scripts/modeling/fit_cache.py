@@ -0,0 +1,142 @@
+"""
+Persisted trait fits under data/cache/fits/.
+
+Each fitted trait stores its coefficients, covariance, design column order, deviance and an
+input fingerprint: a SHA-256 of the design and the trait's per-pattern positive and total
+weight, which are everything the logit sees. On the next build:
+
+- a matching fingerprint reuses the stored fit without running IRLS;
+- otherwise, if the design columns still line up, IRLS warm-starts from the stored
+  coefficients (a new data release usually moves them only slightly);
+- anything else fits from the default start.
+
+Stored floats round-trip exactly through JSON, so a reused fit predicts bit for bit what
+the original fit did. Fits from a non-default backend are kept in their own namespace.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from batched_logit import BatchedFit
+from logit_backends import DEFAULT_BACKEND, get_backend
+
+ROOT = Path(__file__).resolve().parents[2]
+FIT_CACHE_DIR = ROOT / "data" / "cache" / "fits"
+# Bump when the solver or the stored layout changes so old entries are refitted
+FIT_CACHE_VERSION = 1
+
+
+def fit_fingerprint(columns: List[str], design: np.ndarray, pos: np.ndarray, total: np.ndarray) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps([FIT_CACHE_VERSION, list(columns), design.shape]).encode("utf-8"))
+    for array in (design, pos, total):
+        digest.update(np.ascontiguousarray(array, dtype="float64").tobytes())
+    return digest.hexdigest()
+
+
+def cache_namespace(builder: str, backend: str = DEFAULT_BACKEND) -> str:
+    return builder if backend == DEFAULT_BACKEND else f"{builder}-{backend}"
+
+
+class FitCache:
+    """One JSON entry per trait, namespaced by builder ("brfss", "atus")."""
+
+    def __init__(self, namespace: str, cache_dir: Path = FIT_CACHE_DIR):
+        self.namespace = namespace
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{self.namespace}-{key}.json"
+
+    def load(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save(self, key: str, entry: dict) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._path(key).open("w", encoding="utf-8") as f:
+            json.dump(entry, f)
+
+
+def fit_logit_cached(
+    design: np.ndarray,
+    pos: np.ndarray,
+    total: np.ndarray,
+    columns: List[str],
+    keys: List[str],
+    cache: Optional[FitCache],
+    backend: str = DEFAULT_BACKEND,
+) -> BatchedFit:
+    """
+    Fit traits `keys` (one per column of `pos`/`total`) with the named backend, reusing or
+    warm-starting from cached fits. Without a cache every trait is fitted from scratch.
+    Reused traits report 0 iterations.
+    """
+    fit_backend = get_backend(backend)
+    design = np.asarray(design, dtype="float64")
+    pos = np.asarray(pos, dtype="float64")
+    total = np.asarray(total, dtype="float64")
+    if cache is None:
+        return fit_backend(design, pos, total, columns)
+
+    n_traits, n_params = len(keys), design.shape[1]
+    fingerprints = [fit_fingerprint(columns, design, pos[:, k], total[:, k]) for k in range(n_traits)]
+    entries = [cache.load(key) for key in keys]
+    reused = [entry is not None and entry.get("fingerprint") == fp for entry, fp in zip(entries, fingerprints)]
+    refit = [k for k in range(n_traits) if not reused[k]]
+
+    params = np.zeros((n_traits, n_params))
+    cov = np.zeros((n_traits, n_params, n_params))
+    deviance = np.zeros(n_traits)
+    iterations = np.zeros(n_traits, dtype=int)
+    converged = np.ones(n_traits, dtype=bool)
+    for k in range(n_traits):
+        if reused[k]:
+            entry = entries[k]
+            params[k] = entry["params"]
+            cov[k] = entry["cov"]
+            deviance[k] = entry["deviance"]
+            converged[k] = entry["converged"]
+
+    warm = 0
+    if refit:
+        start = np.full((len(refit), n_params), np.nan)
+        for i, k in enumerate(refit):
+            entry = entries[k]
+            if entry is not None and entry.get("columns") == list(columns):
+                start[i] = entry["params"]
+                warm += 1
+        fit = fit_backend(design, pos[:, refit], total[:, refit], columns, start=start)
+        params[refit] = fit.params
+        cov[refit] = fit.cov
+        deviance[refit] = fit.deviance
+        iterations[refit] = fit.iterations
+        converged[refit] = fit.converged
+        for i, k in enumerate(refit):
+            cache.save(
+                keys[k],
+                {
+                    "fingerprint": fingerprints[k],
+                    "columns": list(columns),
+                    "params": fit.params[i].tolist(),
+                    "cov": fit.cov[i].tolist(),
+                    "deviance": float(fit.deviance[i]),
+                    "iterations": int(fit.iterations[i]),
+                    "converged": bool(fit.converged[i]),
+                },
+            )
+    print(f"Trait fits: {n_traits - len(refit)} reused from cache, {len(refit)} fitted ({warm} warm-started)")
+
+    bse = np.sqrt(np.clip(np.diagonal(cov, axis1=1, axis2=2), 0, None))
+    return BatchedFit(list(columns), design.shape[0], params, cov, bse, deviance, iterations, converged)
@@ -0,0 +1,248 @@
+"""
+Declarative label rules for binary survey traits.
+
+A trait whose label_rule has "kind": "coded_rule" is defined entirely in config. The rule is
+compiled once into a list of (condition, label) steps; evaluation is one vectorized pass
+per step over the column store, and the first step that matches a row decides its label.
+
+Rule format:
+
+    {
+      "kind": "coded_rule",
+      "sources": [<source>, ...],   ordered; the first source that decides a row wins
+      "default": null               label for rows no source decides
+    }
+
+Labels are 1, 0 or null (exclude the respondent from the model).
+
+A variable source reads one variable:
+
+    {"var": "_SMOKER3", "missing": [9], "codes": {"1": 1, "2": 1, "3": 0, "4": 0},
+     "ranges": [{"gte": 3000, "label": 1}], "otherwise": null}
+
+A NaN value or an absent column never decides. For a present value the checks run in
+order: "missing" codes (exclude), "codes", "ranges" (in listed order), then "otherwise":
+0, 1 or null decides the row, "next" (the default) falls through to the next source.
+"missing" and "codes" match the integer-truncated code; ranges compare the raw value with
+any of gt/gte/lt/lte.
+
+A condition source decides the rows where its condition holds:
+
+    {"when": <condition>, "label": 1}
+
+Conditions:
+
+    {"var": "X", "in": [1, 2]}           code membership
+    {"var": ["A", "B"], "in": [1]}       any of several variables
+    {"var": "X", "gte": 0, "lt": 10}     raw value range
+    {"present": "X"}, {"missing": "X"}   missing also covers an absent column
+    {"any": [...]}, {"all": [...]}, {"not": {...}}
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+RULE_KIND = "coded_rule"
+RANGE_OPS = {
+    "gt": np.greater,
+    "gte": np.greater_equal,
+    "lt": np.less,
+    "lte": np.less_equal,
+}
+
+
+class LabelRuleError(ValueError):
+    pass
+
+
+class ColumnStore:
+    """Float64 views of the frame's columns, converted at most once per evaluation."""
+
+    def __init__(self, df: pd.DataFrame, columns: Dict[str, str]):
+        self.df = df
+        self.columns = columns
+        self.n = len(df)
+        self._values: Dict[str, Optional[np.ndarray]] = {}
+        self._codes: Dict[str, Optional[np.ndarray]] = {}
+
+    def values(self, name: str) -> Optional[np.ndarray]:
+        key = name.upper()
+        if key not in self._values:
+            col = self.columns.get(key)
+            self._values[key] = (
+                None
+                if col is None
+                else pd.to_numeric(self.df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            )
+        return self._values[key]
+
+    def codes(self, name: str) -> Optional[np.ndarray]:
+        key = name.upper()
+        if key not in self._codes:
+            values = self.values(key)
+            self._codes[key] = None if values is None else np.trunc(values)
+        return self._codes[key]
+
+
+Condition = Callable[[ColumnStore], np.ndarray]
+
+
+def _label(value, where: str) -> float:
+    if value is None:
+        return np.nan
+    if value in (0, 1) and not isinstance(value, bool):
+        return float(value)
+    raise LabelRuleError(f"{where}: label must be 0, 1 or null, got {value!r}")
+
+
+def _false(store: ColumnStore) -> np.ndarray:
+    return np.zeros(store.n, dtype=bool)
+
+
+def _in_codes(name: str, codes: List[float]) -> Condition:
+    def condition(store: ColumnStore) -> np.ndarray:
+        values = store.codes(name)
+        return _false(store) if values is None else np.isin(values, codes)
+    return condition
+
+
+def _in_range(name: str, bounds: Dict[str, float]) -> Condition:
+    def condition(store: ColumnStore) -> np.ndarray:
+        values = store.values(name)
+        if values is None:
+            return _false(store)
+        mask = ~np.isnan(values)
+        for op, bound in bounds.items():
+            mask &= RANGE_OPS[op](values, bound)
+        return mask
+    return condition
+
+
+def _present(name: str) -> Condition:
+    def condition(store: ColumnStore) -> np.ndarray:
+        values = store.values(name)
+        return _false(store) if values is None else ~np.isnan(values)
+    return condition
+
+
+def _range_bounds(spec: dict, where: str) -> Dict[str, float]:
+    bounds = {op: float(spec[op]) for op in RANGE_OPS if op in spec}
+    if not bounds:
+        raise LabelRuleError(f"{where}: range needs at least one of {', '.join(RANGE_OPS)}")
+    return bounds
+
+
+def compile_condition(spec: dict, where: str, variables: Set[str]) -> Condition:
+    if not isinstance(spec, dict):
+        raise LabelRuleError(f"{where}: condition must be an object, got {spec!r}")
+    if "any" in spec or "all" in spec:
+        mode = "any" if "any" in spec else "all"
+        parts = [compile_condition(s, f"{where}.{mode}[{i}]", variables) for i, s in enumerate(spec[mode])]
+        if not parts:
+            raise LabelRuleError(f"{where}: '{mode}' needs at least one condition")
+        combine = np.logical_or if mode == "any" else np.logical_and
+        return lambda store: combine.reduce([part(store) for part in parts])
+    if "not" in spec:
+        inner = compile_condition(spec["not"], f"{where}.not", variables)
+        return lambda store: ~inner(store)
+    if "present" in spec:
+        variables.add(spec["present"].upper())
+        return _present(spec["present"])
+    if "missing" in spec:
+        variables.add(spec["missing"].upper())
+        present = _present(spec["missing"])
+        return lambda store: ~present(store)
+    if "var" in spec:
+        names = spec["var"] if isinstance(spec["var"], list) else [spec["var"]]
+        variables.update(name.upper() for name in names)
+        if "in" in spec:
+            codes = [float(code) for code in spec["in"]]
+            parts = [_in_codes(name, codes) for name in names]
+        else:
+            bounds = _range_bounds(spec, where)
+            parts = [_in_range(name, bounds) for name in names]
+        return lambda store: np.logical_or.reduce([part(store) for part in parts])
+    raise LabelRuleError(f"{where}: unrecognized condition {spec!r}")
+
+
+@dataclass
+class Step:
+    condition: Condition
+    label: float
+
+
+@dataclass
+class CompiledRule:
+    steps: List[Step]
+    default: float = np.nan
+    variables: Set[str] = field(default_factory=set)
+
+    def evaluate(self, df: pd.DataFrame, columns: Dict[str, str]) -> np.ndarray:
+        """Labels for every row: 1.0/0.0, or NaN where the respondent is excluded."""
+        return self.evaluate_store(ColumnStore(df, columns))
+
+    def evaluate_store(self, store: ColumnStore) -> np.ndarray:
+        """`evaluate` over an existing store, so several rules share converted columns."""
+        out = np.full(store.n, self.default)
+        undecided = np.ones(store.n, dtype=bool)
+        for step in self.steps:
+            if not undecided.any():
+                break
+            take = undecided & step.condition(store)
+            out[take] = step.label
+            undecided &= ~take
+        return out
+
+
+def _compile_variable_source(spec: dict, where: str, variables: Set[str]) -> List[Step]:
+    name = spec["var"]
+    if not isinstance(name, str):
+        raise LabelRuleError(f"{where}: a variable source reads a single variable")
+    variables.add(name.upper())
+    steps = []
+    if spec.get("missing"):
+        steps.append(Step(_in_codes(name, [float(c) for c in spec["missing"]]), np.nan))
+    by_label: Dict[float, List[float]] = {}
+    for code, label in spec.get("codes", {}).items():
+        by_label.setdefault(_label(label, f"{where}.codes[{code}]"), []).append(float(code))
+    for label, codes in by_label.items():
+        steps.append(Step(_in_codes(name, codes), label))
+    for i, range_spec in enumerate(spec.get("ranges", [])):
+        if "label" not in range_spec:
+            raise LabelRuleError(f"{where}.ranges[{i}]: missing 'label'")
+        bounds = _range_bounds(range_spec, f"{where}.ranges[{i}]")
+        steps.append(Step(_in_range(name, bounds), _label(range_spec["label"], f"{where}.ranges[{i}]")))
+    otherwise = spec.get("otherwise", "next")
+    if otherwise != "next":
+        steps.append(Step(_present(name), _label(otherwise, f"{where}.otherwise")))
+    return steps
+
+
+def compile_label_rule(rule: dict, trait_key: str = "rule") -> CompiledRule:
+    """Compile a coded_rule label_rule; raises LabelRuleError on malformed rules."""
+    if rule.get("kind") != RULE_KIND:
+        raise LabelRuleError(f"{trait_key}: label_rule kind must be '{RULE_KIND}'")
+    sources = rule.get("sources")
+    if not sources:
+        raise LabelRuleError(f"{trait_key}: coded_rule needs a non-empty 'sources' list")
+    variables: Set[str] = set()
+    steps: List[Step] = []
+    for i, spec in enumerate(sources):
+        where = f"{trait_key}.sources[{i}]"
+        if "when" in spec:
+            if "label" not in spec:
+                raise LabelRuleError(f"{where}: condition source needs a 'label'")
+            steps.append(Step(compile_condition(spec["when"], f"{where}.when", variables), _label(spec["label"], where)))
+        elif "var" in spec:
+            steps.extend(_compile_variable_source(spec, where, variables))
+        else:
+            raise LabelRuleError(f"{where}: source needs 'var' or 'when'")
+    return CompiledRule(steps, _label(rule.get("default"), f"{trait_key}.default"), variables)
+
+
+def is_coded_rule(rule: dict) -> bool:
+    return rule.get("kind") == RULE_KIND
@@ -0,0 +1,178 @@
+"""
+Interchangeable solvers for the trait logits.
+
+Every backend fits K traits from per-pattern positive and total weight over one shared
+design (the `fit_logit_batch` signature) and returns a BatchedFit whose covariance and
+deviance are evaluated at its coefficients by `summarize_fit`, so nothing downstream depends
+on which solver ran:
+
+- "numpy" (default): the batched IRLS in batched_logit, all traits in each iteration;
+- "statsmodels": one binomial GLM per trait with the weighted share as the response and the
+  total weight as freq_weights, the builders' original model;
+- "sklearn": one unpenalized LogisticRegression per trait, each pattern entered as a positive
+  and a negative row carrying its positive and negative weight as sample_weight.
+
+statsmodels and scikit-learn are imported on first use; scikit-learn alone adds about a
+second to start-up. `benchmark_backends` fits the same problem with each backend and reports
+wall time, peak traced memory and the largest prediction difference from statsmodels.
+"""
+from __future__ import annotations
+
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from batched_logit import MAX_ITER, STEP_TOL, BatchedFit, fit_logit_batch, summarize_fit
+
+BACKENDS = ("numpy", "statsmodels", "sklearn")
+DEFAULT_BACKEND = "numpy"
+REFERENCE_BACKEND = "statsmodels"
+BENCHMARK_TOL = 1e-6
+
+
+def unpinned_columns(design: np.ndarray, total: np.ndarray) -> np.ndarray:
+    """Columns the trait has weight on; the rest would make the Hessian singular and stay at zero."""
+    return np.flatnonzero(total @ (design != 0) > 0)
+
+
+def fit_statsmodels(
+    design: np.ndarray, pos: np.ndarray, total: np.ndarray, columns: List[str], start: Optional[np.ndarray] = None
+) -> BatchedFit:
+    import statsmodels.api as sm
+
+    n_traits, n_params = pos.shape[1], design.shape[1]
+    params = np.zeros((n_traits, n_params))
+    iterations = np.zeros(n_traits, dtype=int)
+    converged = np.zeros(n_traits, dtype=bool)
+    for k in range(n_traits):
+        rows = total[:, k] > 0
+        observed = unpinned_columns(design, total[:, k])
+        # As for sklearn, rescaled weights give the same coefficients and a better-behaved deviance check
+        weight = total[rows, k] / total[rows, k].mean()
+        kwargs = {}
+        if start is not None and np.isfinite(start[k]).all():
+            kwargs["start_params"] = start[k, observed]
+        result = sm.GLM(
+            pos[rows, k] / total[rows, k],
+            design[rows][:, observed],
+            family=sm.families.Binomial(),
+            freq_weights=weight,
+        ).fit(maxiter=MAX_ITER, **kwargs)
+        params[k, observed] = result.params
+        iterations[k] = result.fit_history["iteration"]
+        converged[k] = result.converged
+    return summarize_fit(design, pos, total, columns, params, iterations, converged)
+
+
+def fit_sklearn(
+    design: np.ndarray, pos: np.ndarray, total: np.ndarray, columns: List[str], start: Optional[np.ndarray] = None
+) -> BatchedFit:
+    """`start` is ignored; newton-cholesky needs few iterations from scratch."""
+    from sklearn.linear_model import LogisticRegression
+
+    n_traits, n_params = pos.shape[1], design.shape[1]
+    params = np.zeros((n_traits, n_params))
+    iterations = np.zeros(n_traits, dtype=int)
+    converged = np.zeros(n_traits, dtype=bool)
+    labels = np.repeat([1.0, 0.0], len(design))
+    for k in range(n_traits):
+        weight = np.concatenate([pos[:, k], total[:, k] - pos[:, k]])
+        rows = weight > 0
+        observed = unpinned_columns(design, total[:, k])
+        model = LogisticRegression(
+            C=np.inf, fit_intercept=False, solver="newton-cholesky", tol=STEP_TOL, max_iter=MAX_ITER
+        )
+        # Rescaling the weights leaves the unpenalized fit unchanged and keeps the solver well scaled
+        model.fit(
+            np.vstack([design, design])[rows][:, observed], labels[rows], sample_weight=weight[rows] / weight[rows].mean()
+        )
+        params[k, observed] = model.coef_[0]
+        iterations[k] = int(model.n_iter_[0])
+        converged[k] = iterations[k] < MAX_ITER
+    return summarize_fit(design, pos, total, columns, params, iterations, converged)
+
+
+BACKEND_FITS: Dict[str, Callable[..., BatchedFit]] = {
+    "numpy": fit_logit_batch,
+    "statsmodels": fit_statsmodels,
+    "sklearn": fit_sklearn,
+}
+
+
+def get_backend(name: str) -> Callable[..., BatchedFit]:
+    if name not in BACKEND_FITS:
+        raise ValueError(f"Unknown logit backend {name!r} (expected one of {BACKENDS})")
+    return BACKEND_FITS[name]
+
+
+def benchmark_backends(
+    design: np.ndarray,
+    pos: np.ndarray,
+    total: np.ndarray,
+    columns: List[str],
+    cell_design: np.ndarray,
+    backends: Sequence[str] = BACKENDS,
+) -> List[dict]:
+    """
+    Fit every trait with each backend: one untimed warm-up (imports), one run under
+    tracemalloc for peak memory and one timed run. Prediction differences are over
+    `cell_design` rows, against statsmodels when it is among `backends`.
+    """
+    rows, preds = [], {}
+    for name in backends:
+        fit_backend = get_backend(name)
+        fit_backend(design, pos[:, :1], total[:, :1], columns)
+        tracemalloc.start()
+        fit_backend(design, pos, total, columns)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        started = time.perf_counter()
+        fit = fit_backend(design, pos, total, columns)
+        seconds = time.perf_counter() - started
+        preds[name] = fit.predict(cell_design)
+        rows.append(
+            {
+                "backend": name,
+                "seconds": seconds,
+                "peak_mb": peak / 2**20,
+                "converged": int(fit.converged.sum()),
+                "traits": pos.shape[1],
+            }
+        )
+    reference = preds[REFERENCE_BACKEND if REFERENCE_BACKEND in preds else backends[0]]
+    for row in rows:
+        row["max_abs_diff"] = float(np.abs(preds[row["backend"]] - reference).max())
+    return rows
+
+
+def combine_benchmarks(groups: List[List[dict]]) -> List[dict]:
+    """Sum times and traits over spec groups; memory and prediction difference take the max."""
+    combined: Dict[str, dict] = {}
+    for group in groups:
+        for row in group:
+            total = combined.setdefault(row["backend"], {**row, "seconds": 0.0, "converged": 0, "traits": 0})
+            total["seconds"] += row["seconds"]
+            total["converged"] += row["converged"]
+            total["traits"] += row["traits"]
+            total["peak_mb"] = max(total["peak_mb"], row["peak_mb"])
+            total["max_abs_diff"] = max(total["max_abs_diff"], row["max_abs_diff"])
+    return list(combined.values())
+
+
+def report_benchmark(rows: List[dict], tol: float = BENCHMARK_TOL) -> Optional[str]:
+    """Print the comparison and return the fastest backend within `tol` of the reference."""
+    print(f"{'backend':<12} {'seconds':>9} {'peak MB':>9} {'max |dp|':>10} {'converged':>10}")
+    for row in rows:
+        print(
+            f"{row['backend']:<12} {row['seconds']:>9.4f} {row['peak_mb']:>9.2f} "
+            f"{row['max_abs_diff']:>10.2e} {row['converged']:>5}/{row['traits']}"
+        )
+    within = [row for row in rows if row["max_abs_diff"] <= tol and row["converged"] == row["traits"]]
+    if not within:
+        print(f"No backend stays within {tol:g} of {REFERENCE_BACKEND}.")
+        return None
+    best = min(within, key=lambda row: row["seconds"])["backend"]
+    print(f"Fastest backend within {tol:g} of {REFERENCE_BACKEND}: {best}")
+    return best
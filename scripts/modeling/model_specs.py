@@ -0,0 +1,197 @@
+"""
+Model specifications for the trait logits and selection between them.
+
+A spec names which terms enter the design over the builder's features:
+
+- "main": intercept plus drop-first dummies per feature (the historical model);
+- "pairwise": main effects plus every two-way interaction of those dummies;
+- "saturated": every interaction up to all features, one free parameter per observed cell.
+
+"auto" chooses per trait among those candidates. Selection only needs the per-pattern
+weighted totals, so every candidate is one batched fit over a few dozen patterns:
+
+- "aic": deviance + 2p, with each trait's weights rescaled to its Kish effective sample size
+  so the penalty is on the sample's scale rather than the population's;
+- "heldout": V-fold deviance, fitting on all but one fold's totals and scoring the held-out
+  fold (on the same effective-sample scale). Folds are whatever the builder can aggregate
+  cheaply: whole PSUs for BRFSS, rows for ATUS.
+
+Ties go to the simpler spec.
+"""
+from __future__ import annotations
+
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from batched_logit import BatchedFit, binomial_deviance, fit_logit_batch, stack_coefficients
+from survey_schema import KEY_DTYPES, observed_levels
+
+MODEL_SPECS = ("main", "pairwise", "saturated")
+AUTO_SPEC = "auto"
+SELECTION_CRITERIA = ("aic", "heldout")
+CV_FOLDS = 5
+INTERACTION_SEP = ":"
+
+
+def check_spec(spec: str, selection: str, trait_key: str) -> None:
+    if spec not in MODEL_SPECS + (AUTO_SPEC,):
+        raise ValueError(f"Trait {trait_key}: unknown model_spec {spec!r} (expected one of {MODEL_SPECS + (AUTO_SPEC,)})")
+    if selection not in SELECTION_CRITERIA:
+        raise ValueError(f"Trait {trait_key}: unknown model_selection {selection!r} (expected one of {SELECTION_CRITERIA})")
+
+
+def spec_order(spec: str, n_features: int) -> int:
+    """Highest interaction order a spec includes."""
+    return {"main": 1, "pairwise": min(2, n_features), "saturated": n_features}[spec]
+
+
+def spec_design(patterns: pd.DataFrame, features: List[str], spec: str) -> pd.DataFrame:
+    """
+    Design over observed patterns: intercept, drop-first dummies and, per the spec, their
+    products named "a:b". Interaction columns without any pattern are left out.
+    """
+    dummies = pd.get_dummies(observed_levels(patterns[features]), drop_first=True).astype(float)
+    design = pd.concat([pd.Series(1.0, index=patterns.index, name="const"), dummies], axis=1)
+    by_feature = {f: [c for c in dummies.columns if feature_of(c, features) == f] for f in features}
+    for order in range(2, spec_order(spec, len(features)) + 1):
+        for group in combinations(features, order):
+            for names in _products([by_feature[f] for f in group]):
+                column = dummies[list(names)].prod(axis=1)
+                if column.any():
+                    design[INTERACTION_SEP.join(names)] = column
+    return design
+
+
+def _products(levels: List[List[str]]) -> List[Tuple[str, ...]]:
+    out: List[Tuple[str, ...]] = [()]
+    for names in levels:
+        out = [prefix + (name,) for prefix in out for name in names]
+    return out
+
+
+def feature_of(column: str, features: Sequence[str]) -> Optional[str]:
+    """The feature a dummy column ("<feature>_<level>") was built from."""
+    for feature in sorted(features, key=len, reverse=True):
+        if column.startswith(f"{feature}_"):
+            return feature
+    return None
+
+
+class CellEncoder:
+    """
+    Rows (typically the run's ACS cells) coded once per feature against the category
+    registry, survey_schema.KEY_DTYPES, which the recoders and therefore every fitted
+    column name draw their levels from. Values outside the registry get codes after its
+    levels. `design(columns)` evaluates a fit's named columns (const, dummies, interactions)
+    by integer comparison and keeps the result, so the cells are encoded once however many
+    fits predict on them. Rows with a level a column does not name get 0 there, as with
+    get_dummies.
+    """
+
+    def __init__(self, rows: pd.DataFrame, features: List[str], registry: Dict[str, pd.CategoricalDtype] = KEY_DTYPES):
+        self.features = list(features)
+        self.n_rows = len(rows)
+        self.levels: Dict[str, Dict[str, int]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for feature in self.features:
+            values = rows[feature].astype(object)
+            known = list(registry[feature].categories) if feature in registry else []
+            categories = known + sorted(set(values.dropna()) - set(known))
+            self.levels[feature] = {level: code for code, level in enumerate(categories)}
+            self.codes[feature] = pd.Categorical(values, categories=categories).codes
+        self._designs: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        values = np.ones(self.n_rows)
+        if name == "const":
+            return values
+        for part in name.split(INTERACTION_SEP):
+            feature = feature_of(part, self.features)
+            values *= self.codes[feature] == self.levels[feature].get(part[len(feature) + 1 :], -2)
+        return values
+
+    def design(self, columns: Sequence[str]) -> np.ndarray:
+        """(rows, columns) design, computed once per column list and returned read-only."""
+        key = tuple(columns)
+        if key not in self._designs:
+            design = np.ones((self.n_rows, len(key)))
+            for j, name in enumerate(key):
+                design[:, j] = self.column(name)
+            design.setflags(write=False)
+            self._designs[key] = design
+        return self._designs[key]
+
+
+def expand_design(frame: pd.DataFrame, features: List[str], columns: List[str]) -> np.ndarray:
+    """Evaluate a fit's named design columns (const, dummies, interactions) on any rows."""
+    return CellEncoder(frame, features).design(columns)
+
+
+def predict_cells(encoder: CellEncoder, fits: List[Tuple[BatchedFit, int]]) -> np.ndarray:
+    """
+    (cells, traits) probabilities for trait `k` of each (fit, k), whatever their specs, as one
+    expit(X @ B.T) over the union of their columns.
+    """
+    columns, coefficients = stack_coefficients(fits)
+    return expit(encoder.design(columns) @ coefficients.T)
+
+
+def aic_scores(design: np.ndarray, columns: List[str], pos: np.ndarray, total: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """Per-trait AIC with weights rescaled to `sizes`, each trait's effective sample size."""
+    fit = fit_logit_batch(design, pos, total, columns)
+    scale = sizes / total.sum(axis=0)
+    return fit.deviance * scale + 2 * np.isfinite(fit.bse).sum(axis=1)
+
+
+def heldout_scores(
+    design: np.ndarray, columns: List[str], fold_pos: np.ndarray, fold_total: np.ndarray, sizes: np.ndarray
+) -> np.ndarray:
+    """
+    Per-trait held-out deviance from (folds, patterns, traits) totals: each fold is scored by
+    a fit to the others, all folds and traits in one batched solve.
+    """
+    n_folds, n_patterns, n_traits = fold_pos.shape
+    train_pos = (fold_pos.sum(axis=0) - fold_pos).transpose(1, 0, 2).reshape(n_patterns, n_folds * n_traits)
+    train_total = (fold_total.sum(axis=0) - fold_total).transpose(1, 0, 2).reshape(n_patterns, n_folds * n_traits)
+    fit = fit_logit_batch(design, train_pos, train_total, columns)
+    mu = np.clip(expit(design @ fit.params.T), 1e-12, 1 - 1e-12).reshape(n_patterns, n_folds, n_traits)
+    deviance = sum(binomial_deviance(fold_pos[v], fold_total[v], mu[:, v]) for v in range(n_folds))
+    return deviance * sizes / fold_total.sum(axis=(0, 1))
+
+
+def select_specs(
+    patterns: pd.DataFrame,
+    features: List[str],
+    pos: np.ndarray,
+    total: np.ndarray,
+    sizes: np.ndarray,
+    criterion: str,
+    folds: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Score every candidate spec for each trait (columns of `pos`/`total`) and pick the lowest.
+    `folds` is the (fold_pos, fold_total) pair that "heldout" needs.
+    Returns the chosen spec per trait and the scores per spec.
+    """
+    scores: Dict[str, np.ndarray] = {}
+    for spec in MODEL_SPECS:
+        design = spec_design(patterns, features, spec)
+        if criterion == "heldout":
+            scores[spec] = heldout_scores(design.to_numpy(), list(design.columns), *folds, sizes)
+        else:
+            scores[spec] = aic_scores(design.to_numpy(), list(design.columns), pos, total, sizes)
+    table = np.column_stack([scores[spec] for spec in MODEL_SPECS])
+    chosen = [MODEL_SPECS[i] for i in np.argmin(table, axis=1)]
+    return chosen, scores
+
+
+def selection_meta(spec: str, criterion: Optional[str], scores: Optional[Dict[str, np.ndarray]], k: int) -> dict:
+    """meta["model"] entry: the spec used and, for auto, how it was chosen."""
+    meta = {"spec": spec, "selection": criterion}
+    if scores is not None:
+        meta["scores"] = {name: round(float(values[k]), 4) for name, values in scores.items()}
+    return meta
@@ -0,0 +1,153 @@
+"""
+Multilevel regression and poststratification (MRP) for state-level trait estimates.
+
+The model adds a random intercept per state to the trait's fixed sex/age/region design:
+
+    logit p_sc = x_c'b + u_s,    u_s ~ N(0, sigma^2)
+
+It is fitted on aggregated state x sex x age totals (at most 51 x 2 x 6 patterns; the region
+follows from the state). For a given sigma this is penalized IRLS: the batched solver with a
+1/sigma^2 ridge on the state columns. sigma is chosen per trait on a log grid by the Laplace
+approximation to the marginal likelihood. The state block of the Hessian is diagonal, so
+
+    log L(sigma) ~ -D/2 - |u|^2 / (2 sigma^2) - 1/2 sum_s log(1 + sigma^2 h_s)
+
+with D the deviance at the penalized mode and h_s the state's weighted information. Every
+trait and grid point goes into one batched solve, so fitting all traits takes well under a
+second, with no row-level sampling.
+
+Survey weights are rescaled per trait to its Kish effective sample size, so the likelihood
+carries the sample's information rather than the population's. The inverse penalized Hessian
+at the mode is the approximate posterior covariance.
+
+State-cell predictions are poststratified with ACS state populations: a region cell is the
+population-weighted mean of its states' cells and a state's prevalence the mean over its
+adult cells. Delta-method standard errors use the same weights.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit, logit
+
+from batched_logit import fit_logit_batch
+from model_specs import expand_design
+from survey_variance import Z_95
+
+SIGMA_GRID = np.geomspace(0.01, 2.0, 31)
+STATE_PREFIX = "state_"
+
+
+@dataclass
+class MrpFit:
+    """Per-trait modes; `params`/`cov` columns are the fixed columns, then one per state."""
+    fixed_columns: List[str]
+    states: List[str]
+    params: np.ndarray
+    cov: np.ndarray
+    sigma: np.ndarray
+    converged: np.ndarray
+
+    @property
+    def columns(self) -> List[str]:
+        return self.fixed_columns + [f"{STATE_PREFIX}{state}" for state in self.states]
+
+    def design(self, rows: pd.DataFrame, features: List[str]) -> np.ndarray:
+        """Fixed design plus state indicators for rows carrying `features` and state_key."""
+        fixed = expand_design(rows, features, self.fixed_columns)
+        return np.hstack([fixed, state_indicators(rows["state_key"], self.states)])
+
+    def predict(self, design: np.ndarray) -> np.ndarray:
+        """Probabilities for each design row and trait, shape (rows, traits)."""
+        return expit(design @ self.params.T)
+
+    def coefficients(self, k: int) -> List[dict]:
+        """Coefficient rows for trait `k` (fixed effects, then state intercepts) at the posterior mode."""
+        bse = np.sqrt(np.diagonal(self.cov[k]))
+        return [
+            {"term": name, "coef": float(coef), "std_err": float(se), "z": float(coef / se)}
+            for name, coef, se in zip(self.columns, self.params[k], bse)
+        ]
+
+
+def state_indicators(values: pd.Series, states: List[str]) -> np.ndarray:
+    return (values.astype(object).to_numpy()[:, None] == np.array(states, dtype=object)[None, :]).astype(float)
+
+
+def fit_mrp(
+    patterns: pd.DataFrame,
+    features: List[str],
+    fixed_columns: List[str],
+    states: List[str],
+    pos: np.ndarray,
+    total: np.ndarray,
+    sizes: np.ndarray,
+    sigma_grid: np.ndarray = SIGMA_GRID,
+) -> MrpFit:
+    """
+    Fit K traits (columns of `pos`/`total`, one row per state x sex x age pattern in
+    `patterns`) for every sigma in the grid at once and keep each trait's best sigma.
+    """
+    fixed = expand_design(patterns, features, fixed_columns)
+    z = state_indicators(patterns["state_key"], states)
+    design = np.hstack([fixed, z])
+    n_traits, n_grid, n_fixed = pos.shape[1], len(sigma_grid), fixed.shape[1]
+
+    scale = sizes / total.sum(axis=0)
+    grid_pos = np.repeat(pos * scale, n_grid, axis=1)
+    grid_total = np.repeat(total * scale, n_grid, axis=1)
+    variance = np.tile(sigma_grid**2, n_traits)
+    penalty = np.zeros((n_traits * n_grid, design.shape[1]))
+    penalty[:, n_fixed:] = (1 / variance)[:, None]
+    columns = list(fixed_columns) + [f"{STATE_PREFIX}{state}" for state in states]
+    fit = fit_logit_batch(design, grid_pos, grid_total, columns, penalty=penalty)
+
+    mu = fit.predict(design)
+    info = z.T @ (grid_total * mu * (1 - mu))
+    u = fit.params[:, n_fixed:]
+    log_marginal = (
+        -fit.deviance / 2 - (u**2).sum(axis=1) / (2 * variance) - 0.5 * np.log1p(variance * info).sum(axis=0)
+    )
+    best = log_marginal.reshape(n_traits, n_grid).argmax(axis=1)
+    chosen = np.arange(n_traits) * n_grid + best
+    return MrpFit(
+        list(fixed_columns), list(states), fit.params[chosen], fit.cov[chosen], sigma_grid[best], fit.converged[chosen]
+    )
+
+
+def poststratification_weights(state_cells: pd.DataFrame, targets: pd.DataFrame, keys: List[str]) -> np.ndarray:
+    """
+    (targets, state cells) matrix of population shares: each target row averages the state
+    cells that match it on `keys`.
+    """
+    members = targets[keys].reset_index(drop=True).reset_index().merge(
+        state_cells[keys + ["pop"]].reset_index(drop=True).reset_index(), on=keys, suffixes=("_target", "_cell")
+    )
+    weights = np.zeros((len(targets), len(state_cells)))
+    weights[members["index_target"], members["index_cell"]] = members["pop"]
+    sums = weights.sum(axis=1, keepdims=True)
+    if (sums == 0).any():
+        missing = targets[keys].iloc[np.flatnonzero(sums[:, 0] == 0)].to_dict("records")
+        raise ValueError(f"State backbone has no population for {missing[:3]}")
+    return weights / sums
+
+
+def poststratify(
+    params: np.ndarray, cov: np.ndarray, cell_design: np.ndarray, weights: np.ndarray
+) -> Tuple[np.ndarray, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Population-weighted probabilities for each row of `weights` with delta-method standard
+    errors and logit-scale 95% intervals.
+    """
+    p = expit(cell_design @ params)
+    prob = weights @ p
+    grad = weights @ (cell_design * (p * (1 - p))[:, None])
+    cov = np.where(np.isfinite(cov), cov, 0.0)
+    se = np.sqrt(np.clip(np.einsum("ti,ij,tj->t", grad, cov, grad), 0, None))
+    clipped = np.clip(prob, 1e-12, 1 - 1e-12)
+    logit_se = se / (clipped * (1 - clipped))
+    centre = logit(clipped)
+    return prob, (se, expit(centre - Z_95 * logit_se), expit(centre + Z_95 * logit_se))
@@ -0,0 +1,94 @@
+"""
+Header-only preflight checks for the trait builders.
+
+Each builder reads just the column names of its inputs (XPT header, Parquet footer or
+CSV header row) and resolves every configured candidate list against them before any
+data is decoded. A misconfigured trait JSON then fails in well under a second instead
+of after the full survey file has been read.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+
+class PreflightError(RuntimeError):
+    pass
+
+
+@dataclass
+class PreflightReport:
+    source: str
+    resolved: Dict[str, str] = field(default_factory=dict)
+    warnings: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    def require(self, label: str, columns: Dict[str, str], candidates: Iterable[str]) -> Optional[str]:
+        """Resolve the first present candidate; record an error if none is present."""
+        candidates = list(candidates)
+        found = resolve_first(columns, candidates)
+        if found is None:
+            self.errors.append(f"{label}: none of {', '.join(candidates) or '(no candidates)'} present")
+        else:
+            self.resolved[label] = found
+        return found
+
+    def prefer(self, label: str, columns: Dict[str, str], candidates: Iterable[str]) -> Optional[str]:
+        """Like `require`, but a miss is only a warning."""
+        candidates = list(candidates)
+        found = resolve_first(columns, candidates)
+        if found is None:
+            self.warnings.append(f"{label}: none of {', '.join(candidates) or '(no candidates)'} present")
+        else:
+            self.resolved[label] = found
+        return found
+
+    def require_any(self, label: str, columns: Dict[str, str], candidates: Iterable[str]) -> List[str]:
+        """Resolve every present candidate; error if none, warn about the absent ones."""
+        candidates = list(candidates)
+        present = [columns[c.upper()] for c in candidates if c.upper() in columns]
+        absent = [c for c in candidates if c.upper() not in columns]
+        if not present:
+            self.errors.append(f"{label}: none of {', '.join(candidates) or '(no candidates)'} present")
+        else:
+            self.resolved[label] = ", ".join(present)
+            if absent:
+                self.warnings.append(f"{label}: not in file (fallbacks only): {', '.join(absent)}")
+        return present
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def print(self) -> None:
+        status = "OK" if self.ok else "FAILED"
+        print(f"Preflight [{status}] {self.source}")
+        for label, col in self.resolved.items():
+            print(f"  ✓ {label}: {col}")
+        for msg in self.warnings:
+            print(f"  ! {msg}")
+        for msg in self.errors:
+            print(f"  ✗ {msg}")
+
+
+def normalize_names(names: Iterable[str]) -> Dict[str, str]:
+    """Map uppercase column names to their original case for easy lookup."""
+    return {str(name).upper(): str(name) for name in names}
+
+
+def resolve_first(columns: Dict[str, str], candidates: Iterable[str]) -> Optional[str]:
+    for name in candidates:
+        found = columns.get(name.upper())
+        if found:
+            return found
+    return None
+
+
+def raise_if_failed(reports: List[PreflightReport]) -> None:
+    for report in reports:
+        report.print()
+    failed = [r.source for r in reports if not r.ok]
+    if failed:
+        raise PreflightError(
+            f"Preflight failed for {', '.join(failed)}. Fix the trait config or the raw files before building."
+        )
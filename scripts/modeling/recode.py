@@ -0,0 +1,132 @@
+"""
+Vectorized recoding of survey codes into cell keys.
+
+Each recode is an integer lookup table indexed by the raw survey code; an entry holds the
+category index of the target level in survey_schema.KEY_DTYPES, or -1 for "no key".
+A whole column is recoded with one fancy-indexing pass and comes back as a categorical,
+replacing per-row Python calls.
+
+Semantics match the original row-wise helpers: codes are truncated to integers, NaN maps
+to missing, and codes past the end of a table either map to missing or, for the age
+tables whose last band is open-ended, to that last band.
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from survey_schema import KEY_DTYPES
+
+MISSING_CODE = -1
+
+SEX_CODES: Dict[int, str] = {1: "male", 2: "female"}
+
+# BRFSS _AGEG5YR: 1 = 18-24, then 5-year groups; 10+ collapse into 65_plus
+BRFSS_AGEG5YR_BANDS: Dict[int, str] = {
+    1: "18_24",
+    2: "25_34",
+    3: "25_34",
+    4: "35_44",
+    5: "35_44",
+    6: "45_54",
+    7: "45_54",
+    8: "55_64",
+    9: "55_64",
+    10: "65_plus",
+}
+
+# ATUS TEAGE is age in years (15+); respondents under 18 get no band
+ATUS_AGE_BANDS: Dict[int, str] = {
+    **{age: "18_24" for age in range(18, 25)},
+    **{age: "25_34" for age in range(25, 35)},
+    **{age: "35_44" for age in range(35, 45)},
+    **{age: "45_54" for age in range(45, 55)},
+    **{age: "55_64" for age in range(55, 65)},
+    65: "65_plus",
+}
+
+# CPS/ATUS GEREG census region codes
+CENSUS_REGION_CODES: Dict[int, str] = {1: "northeast", 2: "midwest", 3: "south", 4: "west"}
+
+
+def lookup_table(mapping: Dict[int, str], key: str, size: int = 0) -> np.ndarray:
+    """Build an int8 table mapping code -> category index of `key`'s categorical dtype."""
+    categories = list(KEY_DTYPES[key].categories)
+    table = np.full(max(size, max(mapping) + 1), MISSING_CODE, dtype=np.int8)
+    for code, level in mapping.items():
+        table[code] = categories.index(level)
+    return table
+
+
+def recode(
+    values: pd.Series,
+    table: np.ndarray,
+    key: str,
+    open_ended: bool = False,
+    dtype: Optional[pd.CategoricalDtype] = None,
+) -> pd.Series:
+    """
+    Recode a numeric code column through `table` into a categorical Series.
+    With `open_ended`, codes beyond the table take its last entry (e.g. _AGEG5YR >= 10).
+    `dtype` replaces KEY_DTYPES[key] for keys whose levels come from config (states).
+    """
+    codes = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    valid = np.isfinite(codes) & (codes >= 0)
+    index = np.trunc(np.where(valid, codes, 0))
+    if open_ended:
+        index = np.minimum(index, len(table) - 1)
+    else:
+        valid &= index < len(table)
+        index = np.where(valid, index, 0)
+    out = np.where(valid, table[index.astype(np.int64)], MISSING_CODE)
+    return pd.Series(pd.Categorical.from_codes(out, dtype=dtype or KEY_DTYPES[key]), index=values.index)
+
+
+SEX_TABLE = lookup_table(SEX_CODES, "sex_key")
+BRFSS_AGE_TABLE = lookup_table(BRFSS_AGEG5YR_BANDS, "age_band")
+ATUS_AGE_TABLE = lookup_table(ATUS_AGE_BANDS, "age_band")
+CENSUS_REGION_TABLE = lookup_table(CENSUS_REGION_CODES, "region_key")
+
+
+def state_region_table(state_regions: Dict[str, str]) -> np.ndarray:
+    """FIPS -> region table from config/traits/state_regions.json ({"01": "south", ...})."""
+    return lookup_table({int(fips): region for fips, region in state_regions.items()}, "region_key", size=100)
+
+
+def state_dtype(state_regions: Dict[str, str]) -> pd.CategoricalDtype:
+    """Two-digit FIPS state keys ("01", ...) for the states in config/traits/state_regions.json."""
+    return pd.CategoricalDtype(sorted(state_regions))
+
+
+def state_key_table(state_regions: Dict[str, str]) -> np.ndarray:
+    """FIPS -> category index of `state_dtype`."""
+    table = np.full(100, MISSING_CODE, dtype=np.int8)
+    for index, fips in enumerate(state_dtype(state_regions).categories):
+        table[int(fips)] = index
+    return table
+
+
+def recode_sex(values: pd.Series) -> pd.Series:
+    return recode(values, SEX_TABLE, "sex_key")
+
+
+def recode_brfss_age(values: pd.Series) -> pd.Series:
+    return recode(values, BRFSS_AGE_TABLE, "age_band", open_ended=True)
+
+
+def recode_atus_age(values: pd.Series) -> pd.Series:
+    return recode(values, ATUS_AGE_TABLE, "age_band", open_ended=True)
+
+
+def recode_state_region(values: pd.Series, table: np.ndarray) -> pd.Series:
+    return recode(values, table, "region_key")
+
+
+def recode_state(values: pd.Series, state_regions: Dict[str, str]) -> pd.Series:
+    return recode(values, state_key_table(state_regions), "state_key", dtype=state_dtype(state_regions))
+
+
+def recode_census_region(values: pd.Series) -> pd.Series:
+    return recode(values, CENSUS_REGION_TABLE, "region_key")
@@ -0,0 +1,86 @@
+"""
+Read survey microdata straight out of the distributed zip archives.
+
+CDC ships BRFSS as LLCP2024XPT.zip and BLS ships each ATUS extract as a zip that also holds
+SAS/SPSS/Stata scripts. Members are opened as decompressing streams, so nothing has to be
+extracted into data/raw first.
+"""
+from __future__ import annotations
+
+import fnmatch
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, Optional, Sequence
+
+import pandas as pd
+
+XPT_MEMBER_PATTERNS = ["*.xpt"]
+# pandas' XPORT reader decodes an IBM-float zero as 2**-260 (~5.4e-79) instead of 0.0
+XPORT_ZERO_EPSILON = 1e-70
+
+
+def is_zip(path: Path) -> bool:
+    return path.suffix.lower() == ".zip"
+
+
+def find_member(zip_path: Path, patterns: Sequence[str]) -> Optional[str]:
+    """
+    Return the largest member whose base name matches one of the glob patterns
+    (case-insensitive). CDC member names carry trailing spaces ("LLCP2024.XPT "),
+    so names are stripped before matching.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        matches = [
+            info
+            for info in archive.infolist()
+            if not info.is_dir()
+            and any(
+                fnmatch.fnmatch(Path(info.filename.strip()).name.lower(), pattern.lower())
+                for pattern in patterns
+            )
+        ]
+    if not matches:
+        return None
+    return max(matches, key=lambda info: info.file_size).filename
+
+
+def require_member(zip_path: Path, patterns: Sequence[str]) -> str:
+    member = find_member(zip_path, patterns)
+    if member is None:
+        raise FileNotFoundError(f"No member matching {', '.join(patterns)} in {zip_path}")
+    return member
+
+
+def member_size(zip_path: Path, member: str) -> int:
+    """Uncompressed size, so archives sort alongside extracted files."""
+    with zipfile.ZipFile(zip_path) as archive:
+        return archive.getinfo(member).file_size
+
+
+@contextmanager
+def open_member(zip_path: Path, member: str) -> Iterator[IO[bytes]]:
+    """Open an archive member as a decompressing binary stream."""
+    with zipfile.ZipFile(zip_path) as archive:
+        with archive.open(member) as stream:
+            yield stream
+
+
+def iter_zipped_xpt(zip_path: Path, chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Stream an XPT member in row chunks with pandas' sequential XPORT reader; seeking inside a
+    deflate stream would mean re-decompressing from the start, so row offsets are not used.
+    """
+    member = require_member(zip_path, XPT_MEMBER_PATTERNS)
+    with open_member(zip_path, member) as stream:
+        reader = pd.read_sas(stream, format="xport", encoding="latin-1", chunksize=chunksize)
+        for chunk in reader:
+            yield clean_xport_zeros(chunk)
+
+
+def clean_xport_zeros(df: pd.DataFrame) -> pd.DataFrame:
+    """Snap pandas' near-zero XPORT artifacts back to 0.0 so codes like _DRNKWK3 == 0 compare correctly."""
+    for col in df.select_dtypes(include="number").columns:
+        values = df[col]
+        df[col] = values.mask(values.abs() < XPORT_ZERO_EPSILON, 0.0)
+    return df
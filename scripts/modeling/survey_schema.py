@@ -0,0 +1,123 @@
+"""
+Typed variable schema for BRFSS and ATUS microdata.
+
+Survey files decode every variable as float64, although almost all of them are small
+integer codes. The registries below declare the intended storage type for each variable
+the builders read; `apply_schema` casts a freshly loaded frame once, at read time.
+
+- Codes use pandas' nullable unsigned integers ("UInt8"/"UInt16"/...) so missing stays NA.
+- Survey weights are float32; aggregations upcast to float64 before summing.
+- Derived cell keys (sex_key, age_band, region_key) are categoricals with fixed levels.
+
+A column whose values do not fit the declared type (non-integer or out of range) keeps a
+float type instead of failing the build.
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+SEX_LEVELS = ["female", "male"]
+AGE_BAND_LEVELS = ["18_24", "25_34", "35_44", "45_54", "55_64", "65_plus"]
+REGION_LEVELS = ["midwest", "northeast", "south", "west"]
+
+# Levels are listed in sorted order so drop_first keeps the same reference level as
+# get_dummies on plain strings.
+KEY_DTYPES: Dict[str, pd.CategoricalDtype] = {
+    "sex_key": pd.CategoricalDtype(SEX_LEVELS),
+    "age_band": pd.CategoricalDtype(AGE_BAND_LEVELS),
+    "region_key": pd.CategoricalDtype(REGION_LEVELS),
+}
+
+BRFSS_SCHEMA: Dict[str, str] = {
+    # Design and weights
+    "_LLCPWT": "float32",
+    "LLCPWT": "float32",
+    "_STSTR": "UInt32",
+    "_PSU": "float64",
+    # Demographics
+    "SEXVAR": "UInt8",
+    "SEX": "UInt8",
+    "_AGEG5YR": "UInt8",
+    "_STATE": "UInt8",
+    "STATE": "UInt8",
+    # Smoking
+    "_SMOKER3": "UInt8",
+    "_RFSMOK3": "UInt8",
+    "SMOKE100": "UInt8",
+    "SMOKDAY2": "UInt8",
+    # Activity
+    "_TOTINDA": "UInt8",
+    # Alcohol
+    "DRNKANY6": "UInt8",
+    "_DRNKWK3": "float32",
+    "ALCDAY4": "UInt16",
+    # Body mass
+    "_BMI5CAT": "UInt8",
+    "_BMI5": "UInt16",
+    "WEIGHT2": "UInt16",
+    "HEIGHT3": "UInt16",
+    # Chronic conditions
+    "DIABETE4": "UInt8",
+    "ASTHMA3": "UInt8",
+    "CHCCOPD3": "UInt8",
+    "CVDCRHD4": "UInt8",
+    "CVDSTRK3": "UInt8",
+    "CHCKDNY2": "UInt8",
+    "CHCOCNCR": "UInt8",
+    "HAVARTH4": "UInt8",
+    "HAVARTH5": "UInt8",
+}
+
+ATUS_SCHEMA: Dict[str, str] = {
+    "TUCASEID": "UInt64",
+    "TUFINLWGT": "float32",
+    "TESEX": "UInt8",
+    "TEAGE": "UInt8",
+    "GEREG": "UInt8",
+}
+
+# Activity-summary minutes (t010101 ... t509989): at most 1440 per day
+ATUS_PATTERN_SCHEMA: List[Tuple[str, str]] = [
+    (r"^t\d{6}$", "UInt16"),
+]
+
+
+def _declared_dtype(name: str, schema: Dict[str, str], patterns: List[Tuple[str, str]]):
+    dtype = schema.get(name.upper())
+    if dtype is not None:
+        return dtype
+    for pattern, pattern_dtype in patterns:
+        if re.match(pattern, name, re.IGNORECASE):
+            return pattern_dtype
+    return None
+
+
+def apply_schema(
+    df: pd.DataFrame,
+    schema: Dict[str, str],
+    patterns: List[Tuple[str, str]] = (),
+) -> pd.DataFrame:
+    """Cast declared columns in place; undeclared columns are left untouched."""
+    for col in df.columns:
+        dtype = _declared_dtype(str(col), schema, list(patterns))
+        if dtype is None:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce")
+        try:
+            df[col] = values.astype(dtype)
+        except (TypeError, ValueError, OverflowError):
+            print(f"  Schema: {col} does not fit {dtype}; keeping float64")
+            df[col] = values.astype("float64")
+    return df
+
+
+def observed_levels(frame: pd.DataFrame) -> pd.DataFrame:
+    """Drop categorical levels with no rows so get_dummies never emits an all-zero column."""
+    frame = frame.copy()
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].cat.remove_unused_categories()
+    return frame
@@ -0,0 +1,173 @@
+"""
+Design-based (Taylor-linearized) variance for the weighted trait logits.
+
+The weighted logit solves U(b) = sum_i w_i x_i (y_i - mu_i) = 0. Its linearized variance is
+the sandwich H^-1 V_U H^-1, where H is the weighted Hessian (the fit's model-based
+covariance is H^-1) and V_U is the between-PSU variance of the score totals within strata,
+treating PSUs as sampled with replacement:
+
+    V_U = sum_h n_h / (n_h - 1) * [sum_j z_hj z_hj' - z_h z_h' / n_h],    z_h = sum_j z_hj
+
+Covariates are constant within a covariate pattern c, so a PSU's score total is
+z_hj = sum_c x_c (P_hjc - T_hjc mu_c), with P and T the PSU's positive and total weight in
+pattern c. z_h only needs those totals per (stratum, pattern). So does sum_j z_hj z_hj'
+when every PSU holds one respondent, as in BRFSS: z_hj z_hj' = x_c x_c' w^2 (y - mu_c)^2,
+and with 0/1 labels its sum over a pattern is x_c x_c' [(1 - 2 mu_c) sum w^2 y + mu_c^2 sum w^2].
+`moment_covariance` therefore works from per-(stratum, pattern) moments, whose size does not
+grow with the sample. PSUs with several respondents are handled exactly from their own
+per-(PSU, pattern) totals. Strata with a single PSU contribute nothing ("certainty" handling
+of lonely PSUs).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+Z_95 = 1.959963984540054
+PSU_LEVELS = ["source", "stratum", "psu"]
+
+
+@dataclass
+class DesignCovariance:
+    cov: np.ndarray
+    strata: int
+    psus: int
+
+
+@dataclass
+class DesignMoments:
+    """
+    One trait's weighted moments per design group: respondents, sum w y, sum w, sum w^2 y and
+    sum w^2. `stratum` numbers each group's stratum and `pattern` its design row; `psu`
+    numbers the PSU for per-PSU groups.
+    """
+    stratum: np.ndarray
+    pattern: np.ndarray
+    count: np.ndarray
+    pos: np.ndarray
+    total: np.ndarray
+    pos_sq: np.ndarray
+    total_sq: np.ndarray
+    psu: Optional[np.ndarray] = None
+
+
+def moment_covariance(
+    params: np.ndarray,
+    bread: np.ndarray,
+    design: np.ndarray,
+    moments: DesignMoments,
+    clusters: Optional[DesignMoments] = None,
+) -> DesignCovariance:
+    """
+    Linearized covariance of `params` from per-(stratum, pattern) `moments`, taking each
+    respondent as its own PSU. `clusters` holds the per-(PSU, pattern) moments of the PSUs
+    with several respondents, whose respondent-level squares are swapped for their PSU
+    totals'. `design` has one row per pattern; `bread` is the model-based covariance H^-1
+    (NaN rows/columns are unidentified).
+    """
+    mu = expit(design @ params)
+    n_strata = int(moments.stratum.max()) + 1
+    n_h = np.bincount(moments.stratum, weights=moments.count, minlength=n_strata)
+    if clusters is not None and len(clusters.stratum):
+        n_psus = int(clusters.psu.max()) + 1
+        psu_stratum = np.zeros(n_psus, dtype=np.int64)
+        psu_stratum[clusters.psu] = clusters.stratum
+        n_h += np.bincount(psu_stratum, minlength=n_strata)
+        n_h -= np.bincount(clusters.stratum, weights=clusters.count, minlength=n_strata)
+    factor = np.where(n_h > 1, n_h / np.maximum(n_h - 1, 1), 0.0)
+
+    def squares(group: DesignMoments, sign: float) -> np.ndarray:
+        """sign * sum over groups of x x' times the group's sum of w^2 (y - mu)^2."""
+        group_mu = mu[group.pattern]
+        square = group.pos_sq * (1 - 2 * group_mu) + group.total_sq * group_mu**2
+        x = design[group.pattern]
+        return (x * (sign * factor[group.stratum] * square)[:, None]).T @ x
+
+    resid = moments.pos - moments.total * mu[moments.pattern]
+    stratum_scores = np.column_stack(
+        [
+            np.bincount(moments.stratum, weights=column[moments.pattern] * resid, minlength=n_strata)
+            for column in design.T
+        ]
+    )
+    meat = squares(moments, 1.0)
+    meat -= (stratum_scores * (factor / np.maximum(n_h, 1))[:, None]).T @ stratum_scores
+    if clusters is not None and len(clusters.stratum):
+        meat += squares(clusters, -1.0)
+        cluster_resid = clusters.pos - clusters.total * mu[clusters.pattern]
+        psu_scores = np.column_stack(
+            [
+                np.bincount(clusters.psu, weights=column[clusters.pattern] * cluster_resid, minlength=n_psus)
+                for column in design.T
+            ]
+        )
+        meat += (psu_scores * factor[psu_stratum][:, None]).T @ psu_scores
+    return DesignCovariance(sandwich(bread, meat), strata=n_strata, psus=int(round(n_h.sum())))
+
+
+def taylor_covariance(
+    params: np.ndarray,
+    bread: np.ndarray,
+    design: np.ndarray,
+    pos: np.ndarray,
+    total: np.ndarray,
+    psu_keys: pd.DataFrame,
+) -> DesignCovariance:
+    """
+    Linearized covariance of `params` from per-PSU totals. `design`, `pos` and `total` have
+    one row per (source, stratum, PSU, pattern) group (or per respondent); `psu_keys` holds
+    those rows' source, stratum and psu. `bread` is the model-based covariance H^-1 (NaN
+    rows/columns are unidentified).
+    """
+    resid = pos - total * expit(design @ params)
+    scores = pd.DataFrame(design * resid[:, None]).groupby(
+        [psu_keys[level].to_numpy() for level in PSU_LEVELS], sort=False
+    ).sum()
+    psu_stratum = scores.index.droplevel(2)
+    n_h = pd.Series(1, index=psu_stratum).groupby(level=[0, 1]).transform("size").to_numpy()
+    centered = scores.to_numpy() - scores.groupby(level=[0, 1]).transform("mean").to_numpy()
+    factor = np.where(n_h > 1, n_h / np.maximum(n_h - 1, 1), 0.0)
+    meat = (centered * factor[:, None]).T @ centered
+    strata = psu_stratum.unique()
+    return DesignCovariance(sandwich(bread, meat), strata=len(strata), psus=len(scores))
+
+
+def sandwich(bread: np.ndarray, meat: np.ndarray) -> np.ndarray:
+    """bread @ meat @ bread, with unidentified (NaN) coefficients kept NaN."""
+    identified = np.isfinite(np.diagonal(bread))
+    bread = np.where(np.isfinite(bread), bread, 0.0)
+    cov = bread @ meat @ bread
+    cov[~(identified[:, None] & identified[None, :])] = np.nan
+    return cov
+
+
+def cell_intervals(cell_design: np.ndarray, params: np.ndarray, cov: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Delta-method standard errors and logit-scale 95% intervals for each cell's probability.
+    Unidentified coefficients (NaN covariance) are fixed at zero and add no variance.
+    """
+    cov = np.where(np.isfinite(cov), cov, 0.0)
+    eta = cell_design @ params
+    eta_se = np.sqrt(np.clip(np.einsum("ci,ij,cj->c", cell_design, cov, cell_design), 0, None))
+    prob = expit(eta)
+    se = prob * (1 - prob) * eta_se
+    return se, expit(eta - Z_95 * eta_se), expit(eta + Z_95 * eta_se)
+
+
+def uncertainty_by_cell(
+    adult_cell_ids: List[str], child_cell_ids: List[str], intervals: Tuple[np.ndarray, np.ndarray, np.ndarray]
+) -> Dict[str, dict]:
+    """se_by_cell / ci95_by_cell payload entries; child cells are ineligible (0, [0, 0])."""
+    se, lower, upper = intervals
+    se_by_cell = {cell_id: float(round(v, 6)) for cell_id, v in zip(adult_cell_ids, se)}
+    ci95_by_cell = {
+        cell_id: [float(round(lo, 6)), float(round(hi, 6))] for cell_id, lo, hi in zip(adult_cell_ids, lower, upper)
+    }
+    for cell_id in child_cell_ids:
+        se_by_cell[cell_id] = 0.0
+        ci95_by_cell[cell_id] = [0.0, 0.0]
+    return {"se_by_cell": se_by_cell, "ci95_by_cell": ci95_by_cell}
@@ -0,0 +1,49 @@
+import numpy as np
+import statsmodels.api as sm
+
+from batched_logit import fit_logit_batch
+
+
+def make_problem(seed: int, n_patterns: int = 48, n_params: int = 10, n_traits: int = 5):
+    rng = np.random.default_rng(seed)
+    design = np.column_stack([np.ones(n_patterns), rng.integers(0, 2, (n_patterns, n_params - 1))]).astype(float)
+    total = rng.gamma(2.0, 1e5, (n_patterns, n_traits))
+    pos = total * rng.uniform(0.05, 0.6, (n_patterns, n_traits))
+    return design, pos, total
+
+
+def test_batch_matches_statsmodels_per_trait():
+    design, pos, total = make_problem(seed=0)
+    fit = fit_logit_batch(design, pos, total, [f"x{j}" for j in range(design.shape[1])])
+
+    assert fit.converged.all()
+    for k in range(pos.shape[1]):
+        result = sm.GLM(
+            pos[:, k] / total[:, k], design, family=sm.families.Binomial(), freq_weights=total[:, k]
+        ).fit()
+        np.testing.assert_allclose(fit.params[k], result.params, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(fit.bse[k], result.bse, rtol=1e-8)
+        np.testing.assert_allclose(fit.deviance[k], result.deviance, rtol=1e-9)
+
+
+def test_column_without_weight_is_pinned_to_zero():
+    design, pos, total = make_problem(seed=1)
+    # Trait 2 never observes the level behind column 3
+    unseen = design[:, 3] == 1
+    total[unseen, 2] = 0
+    pos[unseen, 2] = 0
+
+    fit = fit_logit_batch(design, pos, total, [f"x{j}" for j in range(design.shape[1])])
+
+    keep = [j for j in range(design.shape[1]) if j != 3]
+    result = sm.GLM(
+        pos[~unseen, 2] / total[~unseen, 2],
+        design[~unseen][:, keep],
+        family=sm.families.Binomial(),
+        freq_weights=total[~unseen, 2],
+    ).fit()
+    assert fit.params[2, 3] == 0.0
+    assert np.isnan(fit.bse[2, 3])
+    np.testing.assert_allclose(fit.params[2, keep], result.params, rtol=1e-9, atol=1e-12)
+    # The other traits are unaffected by trait 2's missing level
+    assert np.isfinite(fit.bse[[0, 1, 3, 4]]).all()
@@ -0,0 +1,44 @@
+import numpy as np
+from scipy.stats import poisson
+
+from batched_logit import fit_logit_batch
+from bootstrap import PoissonMultipliers, fit_replicates, pattern_replicate_totals, poisson_table
+from test_batched_logit import make_problem
+
+
+def test_table_matches_poisson_one():
+    table = poisson_table()
+    for k in range(6):
+        assert abs((table == k).mean() - poisson.pmf(k, 1.0)) < 2 ** -16
+
+
+def test_replicate_totals_match_explicit_multipliers_and_ignore_chunking():
+    rng = np.random.default_rng(3)
+    n = 20_000
+    codes = rng.integers(-1, 6, n)
+    weights = rng.gamma(2.0, 50.0, (n, 3))
+
+    whole = pattern_replicate_totals(codes, 6, weights, PoissonMultipliers(37, seed=9))
+    streamed = PoissonMultipliers(37, seed=9)
+    split = pattern_replicate_totals(codes[:7001], 6, weights[:7001], streamed) + pattern_replicate_totals(
+        codes[7001:], 6, weights[7001:], streamed
+    )
+    np.testing.assert_allclose(split, whole, rtol=1e-12)
+
+    m = PoissonMultipliers(37, seed=9).draw(n)
+    expected = np.stack([weights[codes == c].T @ m[codes == c] for c in range(6)])
+    np.testing.assert_allclose(whole, expected, rtol=1e-12)
+
+
+def test_batched_replicates_match_individual_fits():
+    design, pos, total = make_problem(seed=4, n_traits=2)
+    point = fit_logit_batch(design, pos, total, [f"x{j}" for j in range(design.shape[1])])
+    rng = np.random.default_rng(5)
+    factors = rng.poisson(1.0, (design.shape[0], 1, 4)) + 0.5
+    rep_pos, rep_total = pos[:, :, None] * factors, total[:, :, None] * factors
+
+    fit = fit_replicates(design, rep_pos, rep_total, point.columns, point.params)
+    for k in range(2):
+        for b in range(4):
+            single = fit_logit_batch(design, rep_pos[:, k, b : b + 1], rep_total[:, k, b : b + 1], point.columns)
+            np.testing.assert_allclose(fit.params[k * 4 + b], single.params[0], rtol=1e-8, atol=1e-10)
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from build_brfss_traits import (
+    CONFIG_PATH,
+    DERIVE_FUNCTIONS,
+    LABEL_MISSING,
+    VECTORIZED_DERIVE_FUNCTIONS,
+    TraitConfig,
+    build_label_matrix,
+    load_json,
+)
+
+# Each variable gets its documented codes plus off-book values (0, 7/9, out of range, NaN)
+# so every branch of the row functions is exercised.
+CODE_POOLS = {
+    "_SMOKER3": [1, 2, 3, 4, 9, 0],
+    "_RFSMOK3": [1, 2, 9, 7],
+    "SMOKE100": [1, 2, 7, 9],
+    "SMOKDAY2": [1, 2, 3, 7, 9],
+    "_TOTINDA": [1, 2, 9],
+    "DRNKANY6": [1, 2, 7, 9],
+    "_DRNKWK3": [0, 0.5, 14, 87000, 88888, 90000, 99999, -3],
+    "ALCDAY4": [101, 107, 150, 199, 201, 230, 299, 300, 555, 777, 888, 999],
+    "_BMI5CAT": [1, 2, 3, 4, 9],
+    "_BMI5": [500, 999.5, 1000, 2500, 2999.99, 3000, 4500, 9900, 9901],
+    "WEIGHT2": [150, 7777],
+    "HEIGHT3": [507, 9999],
+    "DIABETE4": [1, 2, 3, 4, 7, 9],
+    "ASTHMA3": [1, 2, 7, 9],
+    "CHCCOPD3": [1, 2, 7, 9],
+    "CVDCRHD4": [1, 2, 7, 9],
+    "CVDSTRK3": [1, 2, 7, 9],
+    "CHCKDNY2": [1, 2, 7, 9],
+    "HAVARTH4": [1, 2, 7, 9],
+}
+
+
+def make_frame(n: int, seed: int, drop=()) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {}
+    for name, pool in CODE_POOLS.items():
+        if name in drop:
+            continue
+        values = rng.choice(np.array(pool, dtype="float64"), size=n)
+        values[rng.random(n) < 0.3] = np.nan
+        data[name] = values
+    return pd.DataFrame(data)
+
+
+def row_labels(df: pd.DataFrame, key: str, rule: dict, columns: dict) -> np.ndarray:
+    derive_fn = DERIVE_FUNCTIONS[key]
+    labels = df.apply(lambda row: derive_fn(row, rule, columns), axis=1)
+    return pd.to_numeric(labels, errors="coerce").to_numpy(dtype="float64")
+
+
+TRAITS = [TraitConfig(**t) for t in load_json(CONFIG_PATH)["traits"]]
+TRAIT_RULES = {t.key: t.label_rule for t in TRAITS}
+
+
+@pytest.mark.parametrize("key", sorted(VECTORIZED_DERIVE_FUNCTIONS))
+@pytest.mark.parametrize(
+    "drop",
+    [(), ("_SMOKER3",), ("_SMOKER3", "_RFSMOK3"), ("DRNKANY6",), ("DRNKANY6", "_DRNKWK3"), ("_BMI5CAT",), ("DIABETE4", "ASTHMA3")],
+)
+def test_vectorized_labels_match_row_functions(key, drop):
+    df = make_frame(3000, seed=len(drop) * 7 + len(key), drop=drop)
+    columns = {col.upper(): col for col in df.columns}
+    rule = TRAIT_RULES[key]
+
+    expected = row_labels(df, key, rule, columns)
+    actual = VECTORIZED_DERIVE_FUNCTIONS[key](df, rule, columns)
+
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_nullable_integer_columns_match_row_functions():
+    df = make_frame(2000, seed=11)
+    for col in ["_SMOKER3", "_RFSMOK3", "SMOKE100", "SMOKDAY2", "_TOTINDA", "DRNKANY6", "_BMI5CAT", "DIABETE4"]:
+        df[col] = df[col].astype("UInt8")
+    columns = {col.upper(): col for col in df.columns}
+    for key, rule in TRAIT_RULES.items():
+        np.testing.assert_array_equal(
+            VECTORIZED_DERIVE_FUNCTIONS[key](df, rule, columns), row_labels(df, key, rule, columns)
+        )
+
+
+def test_label_matrix_holds_every_trait_with_shared_cell_masks():
+    df = make_frame(2000, seed=5)
+    rng = np.random.default_rng(5)
+    for key, levels in [("sex_key", ["female", "male"]), ("age_band", ["18_24", "65_plus"]), ("region_key", ["west"])]:
+        values = pd.Series(rng.choice(levels, size=len(df)), dtype="category")
+        df[key] = values.where(rng.random(len(df)) > 0.1)
+    columns = {col.upper(): col for col in df.columns}
+
+    matrix = build_label_matrix(df, TRAITS, columns)
+
+    assert matrix.labels.dtype == np.int8
+    assert matrix.keys == [t.key for t in TRAITS]
+    np.testing.assert_array_equal(
+        matrix.cells_valid, df[["sex_key", "age_band", "region_key"]].notna().all(axis=1).to_numpy()
+    )
+    for key, rule in TRAIT_RULES.items():
+        expected = VECTORIZED_DERIVE_FUNCTIONS[key](df, rule, columns)
+        column = matrix.column(key)
+        np.testing.assert_array_equal(column == LABEL_MISSING, np.isnan(expected))
+        np.testing.assert_array_equal(column[~np.isnan(expected)], expected[~np.isnan(expected)])
+        np.testing.assert_array_equal(matrix.usable(key), matrix.cells_valid & ~np.isnan(expected))
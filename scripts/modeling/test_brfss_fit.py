@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from build_brfss_traits import (
+    CELL_KEYS,
+    LABEL_MISSING,
+    LabelMatrix,
+    TraitAggregates,
+    TraitConfig,
+    choose_specs,
+    effective_size,
+    fit_logit,
+    fit_traits_batched,
+)
+from survey_schema import KEY_DTYPES
+
+
+def make_respondents(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {key: pd.Categorical(rng.choice(list(dtype.categories), size=n), dtype=dtype) for key, dtype in KEY_DTYPES.items()}
+    )
+    frame["weight"] = rng.gamma(2.0, 300.0, size=n).astype("float32")
+    return frame
+
+
+def label_matrix(frame: pd.DataFrame, labels: np.ndarray) -> LabelMatrix:
+    valid = np.ones(len(frame), dtype=bool)
+    return LabelMatrix(["trait"], labels.astype(np.int8).reshape(-1, 1), valid, valid, valid, valid)
+
+
+def test_aggregated_fit_matches_row_level_fit():
+    frame = make_respondents(20_000, seed=3)
+    rng = np.random.default_rng(4)
+    logit = -1.2 + 0.4 * (frame["sex_key"] == "male") + 0.15 * frame["age_band"].cat.codes
+    labels = (rng.random(len(frame)) < 1 / (1 + np.exp(-logit))).to_numpy().astype(np.int8)
+    labels[rng.random(len(frame)) < 0.05] = LABEL_MISSING
+
+    agg = TraitAggregates("trait")
+    # Two folds, as in streaming, must add up to the one-shot statistics
+    half = len(frame) // 2
+    agg.fold(frame.iloc[:half], label_matrix(frame.iloc[:half], labels[:half]))
+    agg.fold(frame.iloc[half:], label_matrix(frame.iloc[half:], labels[half:]))
+
+    usable = labels != LABEL_MISSING
+    row_result, row_columns = fit_logit(frame[usable], labels[usable], "weight")
+    fit = fit_traits_batched({"trait": agg})
+
+    assert len(agg.cells) == 2 * 6 * 4
+    assert agg.rows_missing_label == int((~usable).sum())
+    assert list(row_columns) == fit.columns
+    assert fit.converged[0]
+    np.testing.assert_allclose(fit.params[0], row_result.params.to_numpy(), rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(fit.bse[0], row_result.bse.to_numpy(), rtol=1e-6)
+
+
+def test_scaled_aggregates_keep_counts_and_scale_weights():
+    frame = make_respondents(500, seed=9)
+    labels = np.tile(np.array([1, 0], dtype=np.int8), 250)
+    agg = TraitAggregates("trait")
+    agg.fold(frame, label_matrix(frame, labels))
+
+    scaled = agg.scaled(0.25)
+
+    np.testing.assert_allclose(scaled.cells["total_weight"], agg.cells["total_weight"] * 0.25)
+    assert effective_size(scaled.cells) == effective_size(agg.cells)
+    assert scaled.cells["row_count"].sum() == 500
+    assert list(scaled.cells.index.names) == CELL_KEYS
+
+
+def test_auto_spec_picks_the_sex_by_age_interaction():
+    frame = make_respondents(40_000, seed=12)
+    frame["stratum"] = 1.0
+    frame["psu"] = np.arange(len(frame)) % 50.0
+    rng = np.random.default_rng(13)
+    young_men = (frame["sex_key"] == "male") & (frame["age_band"] == frame["age_band"].cat.categories[0])
+    logit = -1.5 + 1.5 * young_men
+    labels = (rng.random(len(frame)) < 1 / (1 + np.exp(-logit))).to_numpy().astype(np.int8)
+    agg = TraitAggregates("trait")
+    agg.fold(frame, label_matrix(frame, labels))
+    trait = TraitConfig(
+        "trait", "Trait", "Health", "BRFSS", "adults", "modeled", "", "", {}, [], [], [], [], model_spec="auto"
+    )
+
+    for criterion in ("aic", "heldout"):
+        model = choose_specs({"trait": agg}, [trait], selection_override=criterion)["trait"]
+        assert model["spec"] == "pairwise", model
+        assert model["selection"] == criterion
+        assert set(model["scores"]) == {"main", "pairwise", "saturated"}
+        fit = fit_traits_batched({"trait": agg}, spec=model["spec"])
+        assert any(":" in column for column in fit.columns)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import build_brfss_traits
+from batched_logit import fit_logit_batch
+from build_brfss_traits import (
+    CONFIG_PATH,
+    STATE_REGION_PATH,
+    TraitConfig,
+    aggregate_source,
+    cell_design,
+    design_intervals,
+    load_json,
+    pool_brfss_sources,
+    prepare_respondents,
+    trait_problem,
+)
+from survey_variance import taylor_covariance
+from test_xpt_cache import write_xpt
+
+TRAIT = next(TraitConfig(**t) for t in load_json(CONFIG_PATH)["traits"] if t["key"] == "physically_active")
+STATE_REGIONS = load_json(STATE_REGION_PATH)
+
+
+def make_source(rows, seed):
+    """One year's respondents: two strata coded 1 and 2, two PSUs each, as in every year's file."""
+    rng = np.random.default_rng(seed)
+    stratum = rng.integers(1, 3, rows).astype(float)
+    return pd.DataFrame(
+        {
+            "_STATE": rng.choice([6.0, 36.0, 48.0], rows),
+            "SEXVAR": rng.integers(1, 3, rows).astype(float),
+            "_AGEG5YR": rng.integers(1, 14, rows).astype(float),
+            "_LLCPWT": rng.uniform(50, 500, rows).round(2),
+            "_STSTR": stratum,
+            "_PSU": stratum * 10 + rng.integers(1, 3, rows),
+            "_TOTINDA": rng.choice([1.0, 2.0, 9.0], rows, p=[0.6, 0.35, 0.05]),
+        }
+    )
+
+
+@pytest.fixture
+def pooled(tmp_path):
+    frames = [make_source(120, seed=1), make_source(80, seed=2)]
+    paths = [write_xpt(tmp_path / str(year) / "LLCP.XPT", df) for year, df in zip([2023, 2024], frames)]
+    aggregates = pool_brfss_sources(paths, [TRAIT], STATE_REGIONS, chunksize=50, use_cache=False, workers=1)
+    return frames, aggregates[TRAIT.key]
+
+
+def respondent_rows(frames):
+    """Respondent-level rows with cell keys, labels and each file's year-adjusted weight."""
+    rows = []
+    for source, df in enumerate(frames):
+        df = prepare_respondents(df.copy(), "_LLCPWT", "SEXVAR", "_AGEG5YR", "_STATE", STATE_REGIONS, ("_STSTR", "_PSU"))
+        df["source"] = source
+        rows.append(df)
+    factors = np.array([len(df) for df in rows]) / sum(len(df) for df in rows)
+    for df, factor in zip(rows, factors):
+        df["pooled_weight"] = df["weight"].astype("float64") * factor
+    rows = pd.concat(rows, ignore_index=True)
+    return rows[rows["_TOTINDA"].isin([1, 2]) & rows["region_key"].notna()].reset_index(drop=True)
+
+
+def test_pooled_totals_are_rescaled_by_each_files_share_of_respondents(pooled):
+    frames, agg = pooled
+    rows = respondent_rows(frames)
+    rows["pos_weight"] = np.where(rows["_TOTINDA"] == 1, rows["pooled_weight"], 0.0)
+    expected = rows.groupby(["sex_key", "age_band", "region_key"], observed=True)[["pos_weight", "pooled_weight"]].sum()
+
+    assert agg.rows_seen == 200
+    pd.testing.assert_series_equal(agg.cells["pos_weight"], expected["pos_weight"], check_names=False, rtol=1e-6)
+    pd.testing.assert_series_equal(agg.cells["total_weight"], expected["pooled_weight"], check_names=False, rtol=1e-6)
+
+
+def test_matching_stratum_codes_in_different_years_stay_separate_strata(pooled):
+    frames, agg = pooled
+    design, pos, total = trait_problem({TRAIT.key: agg})
+    fit = fit_logit_batch(design.to_numpy(), pos, total, list(design.columns))
+    design_cov, _ = design_intervals(fit, 0, agg, cell_design(agg.cells.index.to_frame(index=False), fit.columns))
+
+    rows = respondent_rows(frames)
+    row_design = cell_design(rows, fit.columns)
+    row_pos = np.where(rows["_TOTINDA"] == 1, rows["pooled_weight"], 0.0)
+    separate = taylor_covariance(
+        fit.params[0], fit.cov[0], row_design, row_pos, rows["pooled_weight"].to_numpy(), rows[["source", "stratum", "psu"]]
+    )
+    merged = taylor_covariance(
+        fit.params[0],
+        fit.cov[0],
+        row_design,
+        row_pos,
+        rows["pooled_weight"].to_numpy(),
+        rows[["source", "stratum", "psu"]].assign(source=0),
+    )
+
+    assert (design_cov.strata, design_cov.psus) == (4, 8)
+    assert (merged.strata, merged.psus) == (2, 4)
+    np.testing.assert_allclose(design_cov.cov, separate.cov, rtol=1e-6, atol=1e-12)
+    assert not np.allclose(design_cov.cov, merged.cov, rtol=1e-3)
+
+
+def test_each_pooled_source_converts_with_the_decode_workers(tmp_path, monkeypatch):
+    xpt = write_xpt(tmp_path / "2024" / "LLCP.XPT", make_source(60, seed=3))
+    calls = []
+
+    def record(path, workers=1):
+        calls.append(workers)
+        return path
+
+    monkeypatch.setattr(build_brfss_traits, "ensure_parquet", record)
+    aggregates = aggregate_source(xpt, [TRAIT], STATE_REGIONS, 25, use_cache=True, workers=3)
+
+    assert calls == [3]
+    assert aggregates[TRAIT.key].rows_seen == 60
@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import build_brfss_traits
+from build_brfss_traits import CONFIG_PATH, load_json, main
+from test_xpt_cache import write_xpt
+
+TRAIT_KEYS = ["smokes", "physically_active"]
+
+
+def make_brfss(rows, seed):
+    """Respondents in file order; PSUs hold several respondents each, so they span chunks."""
+    rng = np.random.default_rng(seed)
+    stratum = rng.integers(1, 6, rows).astype(float)
+    return pd.DataFrame(
+        {
+            "_STATE": rng.choice([6.0, 17.0, 36.0, 48.0], rows),
+            "SEXVAR": rng.integers(1, 3, rows).astype(float),
+            "_AGEG5YR": rng.integers(1, 15, rows).astype(float),
+            "_LLCPWT": rng.uniform(50, 900, rows).round(2),
+            "_STSTR": stratum,
+            "_PSU": stratum * 100 + rng.integers(1, 9, rows),
+            "_SMOKER3": rng.choice([1.0, 2.0, 3.0, 4.0, 9.0], rows, p=[0.1, 0.05, 0.25, 0.55, 0.05]),
+            "_TOTINDA": rng.choice([1.0, 2.0, 9.0], rows, p=[0.7, 0.25, 0.05]),
+        }
+    )
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    config = {"traits": [t for t in load_json(CONFIG_PATH)["traits"] if t["key"] in TRAIT_KEYS]}
+    (tmp_path / "config.json").write_text(json.dumps(config))
+    monkeypatch.setattr(build_brfss_traits, "CONFIG_PATH", tmp_path / "config.json")
+    xpt = write_xpt(tmp_path / "LLCP2024.XPT", make_brfss(1500, seed=5))
+
+    def run(name, *args):
+        out_dir = tmp_path / name
+        monkeypatch.setattr(build_brfss_traits, "TRAIT_OUTPUT_DIR", out_dir)
+        monkeypatch.setattr(build_brfss_traits, "PUBLIC_OUTPUT_DIR", out_dir / "public")
+        assert main(["--inputs", str(xpt), "--no-cache", "--no-fit-cache", *args]) == 0
+        return {key: json.loads((out_dir / f"{key}.json").read_text()) for key in TRAIT_KEYS}
+
+    return run
+
+
+def test_streamed_build_matches_the_in_memory_build(build):
+    loaded = build("loaded", "--chunksize", "0")
+    streamed = build("streamed", "--chunksize", "97")
+
+    for key in TRAIT_KEYS:
+        assert streamed[key]["prob_by_cell"] == loaded[key]["prob_by_cell"]
+        assert streamed[key]["se_by_cell"] == loaded[key]["se_by_cell"]
+        assert streamed[key]["meta"]["variance"] == loaded[key]["meta"]["variance"]
+        assert loaded[key]["meta"]["variance"]["strata"] == 5
+        assert loaded[key]["meta"]["backend"] == "numpy"
+
+
+def test_streamed_build_without_variance_matches_too(build):
+    loaded = build("loaded", "--chunksize", "0", "--no-variance")
+    streamed = build("streamed", "--chunksize", "211", "--no-variance")
+
+    for key in TRAIT_KEYS:
+        assert streamed[key]["prob_by_cell"] == loaded[key]["prob_by_cell"]
+        assert "se_by_cell" not in streamed[key] and "se_by_cell" not in loaded[key]
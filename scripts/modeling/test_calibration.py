@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from calibration import common_total, direct_margins, margin_codes, rake_logit, shift_intervals
+
+MARGINS = ["sex_key", "age_band", "region_key"]
+
+
+def make_cells(seed: int):
+    rng = np.random.default_rng(seed)
+    cells = pd.MultiIndex.from_product(
+        [["female", "male"], ["18_24", "25_44", "45_64", "65_plus"], ["midwest", "northeast", "south", "west"]],
+        names=MARGINS,
+    ).to_frame(index=False)
+    cells["pop"] = rng.uniform(1e5, 1e6, len(cells))
+    return cells, rng
+
+
+def population_margins(cells, codes, levels, prob):
+    pop = cells["pop"].to_numpy()
+    out = []
+    for code, names in zip(codes, levels):
+        weights = np.eye(len(names))[code] * pop[:, None]
+        out.append((weights.T @ prob / weights.sum(axis=0)[:, None]).T)
+    return out
+
+
+def test_raking_reproduces_margins_of_a_reachable_table():
+    cells, rng = make_cells(0)
+    codes, levels = margin_codes(cells, MARGINS)
+    truth = rng.uniform(0.1, 0.6, (len(cells), 3))
+    targets = population_margins(cells, codes, levels, truth)
+
+    raking = rake_logit(rng.uniform(0.1, 0.6, (len(cells), 3)), cells["pop"].to_numpy(), codes, targets)
+    assert raking.converged.all() and raking.sweeps < 50
+    for got, want in zip(population_margins(cells, codes, levels, raking.prob), targets):
+        np.testing.assert_allclose(got, want, atol=1e-9)
+    # Later margins are centred, so their population-weighted mean offset is zero
+    for code, offsets in zip(codes[1:], raking.offsets[1:]):
+        level_pop = np.bincount(code, weights=cells["pop"])
+        np.testing.assert_allclose(offsets @ level_pop, 0, atol=1e-6)
+
+    again = rake_logit(raking.prob, cells["pop"].to_numpy(), codes, targets)
+    assert again.sweeps == 0 and not again.shift.any()
+
+
+def test_survey_margins_are_brought_to_a_common_total():
+    cells, rng = make_cells(1)
+    codes, levels = margin_codes(cells, MARGINS)
+    # Survey weights that do not match the ACS composition give margins that disagree on the total
+    survey = cells.assign(total_weight=cells["pop"] * rng.uniform(0.5, 1.5, len(cells)))
+    survey["pos_weight"] = survey["total_weight"] * rng.uniform(0.1, 0.6, len(cells))
+    survey = survey[survey["region_key"] != "west"]
+    direct = direct_margins(survey, MARGINS, levels)
+    assert np.isnan(direct[2][levels[2].index("west")])
+
+    targets = [target[None, :] for target in direct]
+    overall = np.array([survey["pos_weight"].sum() / survey["total_weight"].sum()])
+    pop = cells["pop"].to_numpy()
+    raking = rake_logit(np.full((len(cells), 1), 0.3), pop, codes, common_total(targets, codes, pop, overall))
+    assert raking.converged.all()
+    assert np.isclose(raking.prob[:, 0] @ pop / pop.sum(), overall[0])
+
+
+def test_intervals_move_with_their_cell():
+    prob = np.array([0.2, 0.5, 0.9])
+    intervals = (np.array([0.01, 0.02, 0.01]), prob - 0.05, prob + 0.05)
+    assert all(np.allclose(a, b) for a, b in zip(shift_intervals(intervals, prob, np.zeros(3)), intervals))
+
+    shift = np.array([0.3, -0.2, 0.1])
+    moved = 1 / (1 + np.exp(-(np.log(prob / (1 - prob)) + shift)))
+    se, lower, upper = shift_intervals(intervals, moved, shift)
+    assert ((lower < moved) & (moved < upper)).all()
+    np.testing.assert_allclose(se, intervals[0] * moved * (1 - moved) / (prob * (1 - prob)))
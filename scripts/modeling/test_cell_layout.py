@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cell_layout import CellLayout, validate_probabilities
+
+
+def make_cells():
+    return pd.DataFrame(
+        {
+            "cell_id": ["F|0_14|west", "F|18_24|west", "M|15_17|south", "M|25_34|south", "M|65_plus|west"],
+            "age_band": ["0_14", "18_24", "15_17", "25_34", "65_plus"],
+            "pop": [50.0, 100.0, 30.0, 300.0, 600.0],
+        }
+    )
+
+
+def test_layout_fills_children_and_weights_prevalence_by_adult_population(capsys):
+    layout = CellLayout.from_cells(make_cells())
+    assert layout.adult_ids == ["F|18_24|west", "M|25_34|south", "M|65_plus|west"]
+    assert layout.child_ids == ["F|0_14|west", "M|15_17|south"]
+
+    probs = np.array([0.2, 0.5, 0.1])
+    prob_by_cell = layout.prob_by_cell(probs)
+    assert list(prob_by_cell) == layout.adult_ids + layout.child_ids
+    assert prob_by_cell["F|0_14|west"] == 0.0 and prob_by_cell["M|25_34|south"] == 0.5
+
+    prevalence = validate_probabilities(probs, layout, "trait", [0.0, 1.0], "hint")
+    assert prevalence == pytest.approx((100 * 0.2 + 300 * 0.5 + 600 * 0.1) / 1000)
+    assert "Implied national prevalence: 23.00%" in capsys.readouterr().out
+
+
+def test_validation_names_the_offending_cell_and_appends_the_hint():
+    layout = CellLayout.from_cells(make_cells())
+    with pytest.raises(ValueError, match=r"M\|25_34\|south is not finite"):
+        validate_probabilities(np.array([0.2, np.nan, 0.1]), layout, "trait", [0.0, 1.0], "hint")
+    with pytest.raises(ValueError, match=r"M\|65_plus\|west out of bounds"):
+        validate_probabilities(np.array([0.2, 0.5, 1.5]), layout, "trait", [0.0, 1.0], "hint")
+    with pytest.raises(ValueError, match=r"outside plausible bounds \[50%, 90%\]\. Check the rule\."):
+        validate_probabilities(np.array([0.2, 0.5, 0.1]), layout, "trait", [0.5, 0.9], "Check the rule.")
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+
+from batched_logit import fit_logit_batch
+from diagnostics import DIAGNOSTICS_DIR, ROOT, diagnostics_enabled, fit_diagnostics, mrp_diagnostics, write_diagnostics
+from test_mrp import fit, make_patterns, state_totals
+
+
+def test_diagnostics_are_strict_json_with_html_page(tmp_path):
+    design = np.array([[1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [1.0, 0.0, 1.0], [1.0, 1.0, 1.0]])
+    total = np.array([[100.0], [120.0], [0.0], [0.0]])  # column 2 has no weight: NaN SE
+    pos = total * 0.3
+    fit = fit_logit_batch(design, pos, total, ["const", "a", "b"])
+
+    payload = fit_diagnostics(fit, 0, "demo", {"rows_used": 4}, "2024-01-01T00:00:00+00:00", "statsmodels")
+    path = write_diagnostics(payload, tmp_path)
+
+    loaded = json.loads(path.read_text(), parse_constant=lambda c: (_ for _ in ()).throw(ValueError(c)))
+    assert loaded["model"]["converged"] is True
+    assert loaded["model"]["solver"] == "statsmodels"
+    assert [row["term"] for row in loaded["coefficients"]] == ["const", "a", "b"]
+    assert loaded["coefficients"][2]["std_err"] is None
+    assert "<h1>demo</h1>" in (tmp_path / "demo.html").read_text()
+
+
+def test_diagnostics_flag_or_env(monkeypatch):
+    monkeypatch.delenv("TRAIT_DIAGNOSTICS", raising=False)
+    assert not diagnostics_enabled(False)
+    assert diagnostics_enabled(True)
+    monkeypatch.setenv("TRAIT_DIAGNOSTICS", "1")
+    assert diagnostics_enabled(False)
+
+
+def test_mrp_diagnostics_describe_the_state_intercept_fit(tmp_path):
+    patterns = make_patterns()
+    mrp_fit = fit(patterns, *state_totals(patterns, 0.6, seed=3))
+
+    payload = mrp_diagnostics(mrp_fit, 0, "demo", {"rows_used": len(patterns)}, "2024-01-01T00:00:00+00:00")
+    loaded = json.loads(write_diagnostics(payload, tmp_path).read_text())
+
+    assert loaded["model"]["method"] == "mrp"
+    assert loaded["model"]["sigma_state"] == float(mrp_fit.sigma[0])
+    assert [row["term"] for row in loaded["coefficients"]] == mrp_fit.columns
+    assert loaded["coefficients"][-1]["term"] == "state_53"
+    np.testing.assert_allclose([row["coef"] for row in loaded["coefficients"]], mrp_fit.params[0])
+
+
+def test_diagnostics_are_not_synced_into_public():
+    # package.json's sync:derived copies data/derived/* into public/
+    assert not DIAGNOSTICS_DIR.is_relative_to(ROOT / "data" / "derived")
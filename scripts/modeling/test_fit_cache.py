@@ -0,0 +1,37 @@
+import numpy as np
+
+from batched_logit import fit_logit_batch
+from fit_cache import FitCache, fit_logit_cached
+from test_batched_logit import make_problem
+
+COLUMNS = [f"x{j}" for j in range(10)]
+KEYS = ["a", "b", "c", "d", "e"]
+
+
+def test_unchanged_inputs_reuse_stored_fit(tmp_path):
+    design, pos, total = make_problem(seed=2)
+    cache = FitCache("test", tmp_path)
+
+    first = fit_logit_cached(design, pos, total, COLUMNS, KEYS, cache)
+    second = fit_logit_cached(design, pos, total, COLUMNS, KEYS, cache)
+
+    assert (first.iterations > 0).all()
+    assert (second.iterations == 0).all()
+    np.testing.assert_array_equal(second.params, first.params)
+    np.testing.assert_array_equal(second.bse, first.bse)
+    np.testing.assert_array_equal(second.deviance, first.deviance)
+
+
+def test_changed_inputs_warm_start_to_the_cold_solution(tmp_path):
+    design, pos, total = make_problem(seed=3)
+    cache = FitCache("test", tmp_path)
+    fit_logit_cached(design, pos, total, COLUMNS, KEYS, cache)
+
+    # A new release: trait "c" moves slightly, the others are untouched
+    pos[:, 2] *= 1.01
+    warm = fit_logit_cached(design, pos, total, COLUMNS, KEYS, cache)
+    cold = fit_logit_batch(design, pos, total, COLUMNS)
+
+    assert list(warm.iterations == 0) == [True, True, False, True, True]
+    assert warm.iterations[2] < cold.iterations[2]
+    np.testing.assert_allclose(warm.params, cold.params, rtol=1e-9, atol=1e-12)
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from label_rules import LabelRuleError, compile_label_rule
+from test_brfss_derive import TRAIT_RULES, make_frame, row_labels
+
+CHRONIC_VARS = TRAIT_RULES["any_chronic_condition"]["condition_vars"]
+
+# coded_rule equivalents of the built-in derive_* functions
+CODED_RULES = {
+    "smokes": {
+        "kind": "coded_rule",
+        "sources": [
+            {"var": "_SMOKER3", "codes": {"1": 1, "2": 1, "3": 0, "4": 0}, "otherwise": None},
+            {"var": "_RFSMOK3", "codes": {"2": 1, "1": 0}, "otherwise": None},
+            {"when": {"any": [{"missing": "SMOKE100"}, {"missing": "SMOKDAY2"}]}, "label": None},
+            {"when": {"all": [{"var": "SMOKE100", "in": [1]}, {"var": "SMOKDAY2", "in": [1, 2]}]}, "label": 1},
+            {"when": {"var": "SMOKE100", "in": [2]}, "label": 0},
+            {"when": {"all": [{"var": "SMOKE100", "in": [1]}, {"var": "SMOKDAY2", "in": [3]}]}, "label": 0},
+        ],
+    },
+    "physically_active": {
+        "kind": "coded_rule",
+        "sources": [{"var": "_TOTINDA", "codes": {"1": 1, "2": 0}}],
+    },
+    "any_alcohol_use": {
+        "kind": "coded_rule",
+        "sources": [
+            {"var": "DRNKANY6", "codes": {"1": 1, "2": 0}, "otherwise": None},
+            {
+                "var": "_DRNKWK3",
+                "ranges": [{"gte": 99999, "lte": 99999, "label": None}, {"gt": 0, "lt": 88888, "label": 1}],
+                "otherwise": 0,
+            },
+            {
+                "var": "ALCDAY4",
+                "missing": [777, 999],
+                "codes": {"888": 0},
+                "ranges": [{"gte": 101, "lt": 200, "label": 1}, {"gte": 201, "lt": 300, "label": 1}],
+            },
+        ],
+    },
+    "obese": {
+        "kind": "coded_rule",
+        "sources": [
+            {"var": "_BMI5CAT", "codes": {"4": 1, "1": 0, "2": 0, "3": 0}, "otherwise": None},
+            {
+                "var": "_BMI5",
+                "ranges": [{"lt": 1000, "label": None}, {"gt": 9900, "label": None}, {"gte": 3000, "label": 1}],
+                "otherwise": 0,
+            },
+        ],
+    },
+    "any_chronic_condition": {
+        "kind": "coded_rule",
+        "sources": [
+            {"when": {"var": CHRONIC_VARS, "in": [1]}, "label": 1},
+            {"when": {"var": CHRONIC_VARS, "in": [2]}, "label": 0},
+        ],
+    },
+}
+
+
+@pytest.mark.parametrize("key", sorted(CODED_RULES))
+@pytest.mark.parametrize("drop", [(), ("_SMOKER3", "_RFSMOK3"), ("DRNKANY6",), ("_BMI5CAT",), ("DIABETE4", "ASTHMA3")])
+def test_coded_rules_match_row_functions(key, drop):
+    df = make_frame(3000, seed=len(drop) * 5 + len(key), drop=drop)
+    columns = {col.upper(): col for col in df.columns}
+
+    expected = row_labels(df, key, TRAIT_RULES[key], columns)
+    actual = compile_label_rule(CODED_RULES[key], key).evaluate(df, columns)
+
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_compiled_rule_lists_every_variable_it_reads():
+    rule = compile_label_rule(CODED_RULES["smokes"])
+    assert rule.variables == {"_SMOKER3", "_RFSMOK3", "SMOKE100", "SMOKDAY2"}
+
+
+def test_default_labels_undecided_rows_and_not_inverts():
+    df = pd.DataFrame({"X": [1.0, 2.0, 5.0, np.nan]})
+    rule = compile_label_rule(
+        {"kind": "coded_rule", "sources": [{"when": {"not": {"var": "X", "in": [1, 2]}}, "label": 1}], "default": 0}
+    )
+    np.testing.assert_array_equal(rule.evaluate(df, {"X": "X"}), [0.0, 0.0, 1.0, 1.0])
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        {"kind": "brfss_variable", "sources": [{"var": "X"}]},
+        {"kind": "coded_rule", "sources": []},
+        {"kind": "coded_rule", "sources": [{"var": "X", "codes": {"1": 2}}]},
+        {"kind": "coded_rule", "sources": [{"var": "X", "ranges": [{"label": 1}]}]},
+        {"kind": "coded_rule", "sources": [{"when": {"var": "X", "in": [1]}}]},
+        {"kind": "coded_rule", "sources": [{"when": {"between": "X"}, "label": 1}]},
+    ],
+)
+def test_malformed_rules_fail_at_compile_time(rule):
+    with pytest.raises(LabelRuleError):
+        compile_label_rule(rule)
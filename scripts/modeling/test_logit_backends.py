@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from batched_logit import fit_logit_batch
+from logit_backends import BACKENDS, benchmark_backends, get_backend, report_benchmark
+from test_batched_logit import make_problem
+
+COLUMNS = [f"x{j}" for j in range(10)]
+
+
+def test_every_backend_matches_the_batched_fit():
+    design, pos, total = make_problem(seed=3)
+    # Trait 1 never observes the level behind column 4
+    unseen = design[:, 4] == 1
+    total[unseen, 1] = 0
+    pos[unseen, 1] = 0
+    reference = fit_logit_batch(design, pos, total, COLUMNS)
+
+    for name in BACKENDS:
+        fit = get_backend(name)(design, pos, total, COLUMNS)
+        assert fit.converged.all(), name
+        np.testing.assert_allclose(fit.params, reference.params, rtol=1e-7, atol=1e-9, err_msg=name)
+        np.testing.assert_allclose(fit.bse, reference.bse, rtol=1e-6, err_msg=name)
+        assert fit.params[1, 4] == 0.0 and np.isnan(fit.bse[1, 4])
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown logit backend"):
+        get_backend("glmnet")
+
+
+def test_benchmark_recommends_the_fastest_backend_within_tolerance(capsys):
+    design, pos, total = make_problem(seed=4)
+    rows = benchmark_backends(design, pos, total, COLUMNS, design)
+    assert [row["backend"] for row in rows] == list(BACKENDS)
+    assert all(row["max_abs_diff"] < 1e-8 and row["peak_mb"] > 0 for row in rows)
+
+    rows[0]["seconds"], rows[1]["seconds"], rows[2]["seconds"] = 3.0, 2.0, 1.0
+    rows[2]["max_abs_diff"] = 1e-3
+    assert report_benchmark(rows, tol=1e-6) == "statsmodels"
+    assert "statsmodels" in capsys.readouterr().out
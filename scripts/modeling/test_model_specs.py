@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from scipy.special import expit
+
+from batched_logit import fit_logit_batch
+from model_specs import CellEncoder, expand_design, heldout_scores, predict_cells, select_specs, spec_design
+
+FEATURES = ["sex_key", "age_band", "region_key"]
+
+
+def make_patterns() -> pd.DataFrame:
+    index = pd.MultiIndex.from_product(
+        [["female", "male"], ["18_24", "25_34", "35_44"], ["mw", "ne", "so", "we"]], names=FEATURES
+    )
+    return index.to_frame(index=False)
+
+
+def interaction_totals(patterns: pd.DataFrame, strength: float, seed: int):
+    """Totals whose log-odds carry a sex x age interaction of size `strength`, plus V folds."""
+    rng = np.random.default_rng(seed)
+    eta = -1.0 + 0.4 * (patterns["region_key"] == "so") + strength * (
+        (patterns["sex_key"] == "male") & (patterns["age_band"] == "18_24")
+    )
+    rows = rng.integers(300, 600, (5, len(patterns)))
+    fold_pos = rng.binomial(rows, expit(eta.to_numpy())).astype(float)[:, :, None]
+    fold_total = rows.astype(float)[:, :, None]
+    return fold_pos.sum(axis=0), fold_total.sum(axis=0), (fold_pos, fold_total)
+
+
+def test_main_spec_is_the_historical_design():
+    patterns = make_patterns()
+    expected = sm.add_constant(pd.get_dummies(patterns, drop_first=True), has_constant="add").astype(float)
+    pd.testing.assert_frame_equal(spec_design(patterns, FEATURES, "main"), expected)
+
+
+def test_expand_design_reproduces_every_spec():
+    patterns = make_patterns()
+    for spec in ("main", "pairwise", "saturated"):
+        design = spec_design(patterns, FEATURES, spec)
+        np.testing.assert_array_equal(expand_design(patterns, FEATURES, list(design.columns)), design.to_numpy())
+
+
+def test_saturated_fit_reproduces_cell_shares():
+    patterns = make_patterns()
+    pos, total, _ = interaction_totals(patterns, 1.0, seed=0)
+    design = spec_design(patterns, FEATURES, "saturated")
+    assert design.shape[1] == len(patterns)
+
+    fit = fit_logit_batch(design.to_numpy(), pos, total, list(design.columns))
+    np.testing.assert_allclose(fit.predict(design.to_numpy())[:, 0], pos[:, 0] / total[:, 0], rtol=1e-8)
+
+
+def test_selection_finds_the_interaction_only_when_present():
+    patterns = make_patterns()
+    for strength, expected in ((1.5, "pairwise"), (0.0, "main")):
+        pos, total, folds = interaction_totals(patterns, strength, seed=1)
+        sizes = total.sum(axis=0)
+        for criterion in ("aic", "heldout"):
+            chosen, scores = select_specs(patterns, FEATURES, pos, total, sizes, criterion, folds)
+            assert chosen == [expected], (criterion, strength, scores)
+
+
+def test_heldout_scores_fit_each_fold_on_the_others():
+    patterns = make_patterns()
+    _, _, (fold_pos, fold_total) = interaction_totals(patterns, 0.5, seed=2)
+    design = spec_design(patterns, FEATURES, "main")
+    x = design.to_numpy()
+    sizes = np.array([1000.0])
+
+    expected = 0.0
+    for v in range(len(fold_pos)):
+        rest = np.delete(np.arange(len(fold_pos)), v)
+        fit = fit_logit_batch(x, fold_pos[rest].sum(axis=0), fold_total[rest].sum(axis=0), list(design.columns))
+        mu = expit(x @ fit.params[0])
+        y, n = fold_pos[v, :, 0], fold_total[v, :, 0]
+        expected += 2 * np.sum(y * np.log(y / n / mu) + (n - y) * np.log((n - y) / n / (1 - mu)))
+    score = heldout_scores(x, list(design.columns), fold_pos, fold_total, sizes)
+    np.testing.assert_allclose(score, expected * 1000.0 / fold_total.sum(), rtol=1e-8)
+
+
+def test_cell_encoder_predicts_every_spec_in_one_product():
+    patterns = make_patterns()
+    pos, total, _ = interaction_totals(patterns, 1.0, seed=2)
+    fits = []
+    for spec in ("main", "pairwise"):
+        design = spec_design(patterns, FEATURES, spec)
+        fits.append(fit_logit_batch(design.to_numpy(), pos, total, list(design.columns)))
+
+    # Cells in a different order, with a level no fit has seen
+    unseen = pd.DataFrame([{"sex_key": "male", "age_band": "45_54", "region_key": "ne"}])
+    cells = pd.concat([patterns.iloc[::-1], unseen])
+    encoder = CellEncoder(cells, FEATURES)
+    probs = predict_cells(encoder, [(fits[0], 0), (fits[1], 0)])
+
+    for j, fit in enumerate(fits):
+        expected = fit.predict(expand_design(cells, FEATURES, fit.columns))[:, 0]
+        np.testing.assert_allclose(probs[:, j], expected, rtol=1e-12)
+    # The unseen age band predicts like the reference level
+    reference = (cells["age_band"] == "18_24") & (cells["sex_key"] == "male") & (cells["region_key"] == "ne")
+    np.testing.assert_allclose(probs[-1, 0], probs[reference.to_numpy()][0, 0])
+    assert encoder.design(fits[1].columns) is encoder.design(list(fits[1].columns))
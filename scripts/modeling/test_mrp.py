@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import expit
+
+from batched_logit import fit_logit_batch
+from build_brfss_traits import parse_args
+from model_specs import spec_design
+from mrp import fit_mrp, poststratification_weights, poststratify
+
+FEATURES = ["sex_key", "age_band", "region_key"]
+STATE_REGIONS = {"01": "so", "05": "so", "12": "so", "06": "we", "08": "we", "53": "we"}
+
+
+def make_patterns() -> pd.DataFrame:
+    index = pd.MultiIndex.from_product(
+        [sorted(STATE_REGIONS), ["female", "male"], ["18_24", "25_44", "45_plus"]],
+        names=["state_key", "sex_key", "age_band"],
+    )
+    patterns = index.to_frame(index=False)
+    patterns["region_key"] = patterns["state_key"].map(STATE_REGIONS)
+    return patterns
+
+
+def state_totals(patterns: pd.DataFrame, spread: float, seed: int):
+    """Totals whose log-odds carry state intercepts drawn with standard deviation `spread`."""
+    rng = np.random.default_rng(seed)
+    effects = dict(zip(sorted(STATE_REGIONS), rng.normal(0, spread, len(STATE_REGIONS))))
+    eta = -0.5 + 0.3 * (patterns["sex_key"] == "male") + patterns["state_key"].map(effects)
+    total = rng.integers(200, 400, len(patterns)).astype(float)
+    pos = rng.binomial(total.astype(int), expit(eta.to_numpy())).astype(float)
+    return pos[:, None], total[:, None]
+
+
+def fit(patterns, pos, total, sigma_grid=None):
+    columns = list(spec_design(patterns, FEATURES, "main").columns)
+    kwargs = {} if sigma_grid is None else {"sigma_grid": sigma_grid}
+    return fit_mrp(patterns, FEATURES, columns, sorted(STATE_REGIONS), pos, total, total.sum(axis=0), **kwargs)
+
+
+def test_zero_penalty_matches_the_unpenalized_fit():
+    patterns = make_patterns()
+    pos, total = state_totals(patterns, 0.5, seed=0)
+    design = spec_design(patterns, FEATURES, "main")
+    plain = fit_logit_batch(design.to_numpy(), pos, total, list(design.columns))
+    penalized = fit_logit_batch(
+        design.to_numpy(), pos, total, list(design.columns), penalty=np.zeros((1, design.shape[1]))
+    )
+    np.testing.assert_allclose(penalized.params, plain.params, rtol=1e-10)
+    np.testing.assert_allclose(penalized.deviance, plain.deviance, rtol=1e-10)
+
+
+def test_sigma_tracks_the_state_effect():
+    patterns = make_patterns()
+    flat = fit(patterns, *state_totals(patterns, 0.0, seed=1))
+    spread = fit(patterns, *state_totals(patterns, 0.6, seed=1))
+    assert flat.sigma[0] < 0.1
+    assert spread.sigma[0] > 0.2
+    assert flat.converged.all() and spread.converged.all()
+
+
+def test_weak_penalty_recovers_state_shares():
+    patterns = make_patterns()
+    pos, total = state_totals(patterns, 0.6, seed=2)
+    mrp_fit = fit(patterns, pos, total, sigma_grid=np.array([100.0]))
+    by_state = pd.DataFrame({"state_key": patterns["state_key"], "pos": pos[:, 0], "total": total[:, 0]})
+    observed = by_state.groupby("state_key")[["pos", "total"]].sum()
+    weights = poststratification_weights(
+        patterns.assign(pop=total[:, 0]), pd.DataFrame({"state_key": mrp_fit.states}), ["state_key"]
+    )
+    prob, (se, lower, upper) = poststratify(mrp_fit.params[0], mrp_fit.cov[0], mrp_fit.design(patterns, FEATURES), weights)
+    # The main-effects model is not saturated, so state shares match only up to the sex/age fit
+    np.testing.assert_allclose(prob, observed["pos"] / observed["total"], atol=0.01)
+    assert ((lower < prob) & (prob < upper) & (se > 0)).all()
+
+
+def test_poststratification_weights_are_population_shares():
+    patterns = make_patterns().assign(pop=np.arange(1, 37, dtype=float))
+    targets = pd.DataFrame({"region_key": ["so", "we"]})
+    weights = poststratification_weights(patterns, targets, ["region_key"])
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+    south = (patterns["region_key"] == "so").to_numpy()
+    np.testing.assert_allclose(weights[0, south], patterns["pop"][south] / patterns["pop"][south].sum())
+    assert (weights[0, ~south] == 0).all()
+
+
+@pytest.mark.parametrize("flag", [["--bootstrap", "50"], ["--calibrate"]])
+def test_mrp_rejects_flags_that_would_leave_its_state_estimates_inconsistent(flag, capsys):
+    # Bootstrap replicates would be refitted and discarded; raking would skip the state outputs
+    with pytest.raises(SystemExit):
+        parse_args(["--mrp", *flag])
+    assert "cannot be combined" in capsys.readouterr().err
@@ -0,0 +1,82 @@
+import pandas as pd
+import pyreadstat
+import pytest
+
+import build_atus_traits
+import build_brfss_traits
+from build_atus_traits import preflight_atus
+from build_brfss_traits import CONFIG_PATH, TraitConfig, load_json, preflight_brfss
+from preflight import PreflightError, PreflightReport, normalize_names, raise_if_failed
+from test_xpt_cache import make_frame, write_xpt
+
+BRFSS_TRAITS = [TraitConfig(**t) for t in load_json(CONFIG_PATH)["traits"]]
+ATUS_TRAITS = [
+    build_atus_traits.TraitConfig(**t) for t in build_atus_traits.load_json(build_atus_traits.CONFIG_PATH)["traits"]
+]
+
+
+def test_report_resolves_candidates_case_insensitively():
+    report = PreflightReport("test")
+    columns = normalize_names(["_llcpwt", "SEXVAR", "DRNKANY6"])
+
+    assert report.require("weight", columns, ["_LLCPWT", "LLCPWT"]) == "_llcpwt"
+    assert report.prefer("region", columns, ["GEREG"]) is None
+    assert report.require_any("alcohol", columns, ["DRNKANY6", "_DRNKWK3"]) == ["DRNKANY6"]
+    assert report.ok
+    assert report.warnings == ["region: none of GEREG present", "alcohol: not in file (fallbacks only): _DRNKWK3"]
+
+    report.require("age", columns, ["_AGEG5YR"])
+    assert not report.ok
+    with pytest.raises(PreflightError, match="Preflight failed for test"):
+        raise_if_failed([report])
+
+
+def test_brfss_preflight_reads_only_the_xpt_header(tmp_path, monkeypatch):
+    df = make_frame()
+    for trait in BRFSS_TRAITS:
+        df[build_brfss_traits.label_rule_vars(trait)[0]] = 1.0
+    xpt = write_xpt(tmp_path / "LLCP2024.XPT", df)
+
+    read_xport = pyreadstat.read_xport
+    calls = []
+
+    def header_only(path, **kwargs):
+        calls.append(kwargs)
+        return read_xport(path, **kwargs)
+
+    monkeypatch.setattr(build_brfss_traits.pyreadstat, "read_xport", header_only)
+    report = preflight_brfss(xpt, BRFSS_TRAITS)
+
+    assert report.ok, report.errors
+    assert calls and all(call.get("metadataonly") for call in calls)
+    assert report.resolved["state"] == "_STATE"
+
+    missing = write_xpt(tmp_path / "missing" / "LLCP2024.XPT", make_frame().drop(columns=["_AGEG5YR"]))
+    report = preflight_brfss(missing, BRFSS_TRAITS[:1])
+    assert "age: none of _AGEG5YR present" in report.errors
+    assert any(error.startswith("smokes label_rule") for error in report.errors)
+
+
+def test_atus_preflight_reads_only_the_csv_header_rows(tmp_path, monkeypatch):
+    resp = tmp_path / "atusresp_2024.csv"
+    summary = tmp_path / "atussum_2024.csv"
+    pd.DataFrame({"TUCASEID": [1], "TUFINLWGT": [1.0]}).to_csv(resp, index=False)
+    pd.DataFrame({"TUCASEID": [1], "TESEX": [1], "TEAGE": [30], "t030101": [0], "t140101": [5]}).to_csv(
+        summary, index=False
+    )
+
+    read_csv = pd.read_csv
+    calls = []
+
+    def header_only(path, **kwargs):
+        calls.append(kwargs)
+        return read_csv(path, **kwargs)
+
+    monkeypatch.setattr(build_atus_traits.pd, "read_csv", header_only)
+    report = preflight_atus(resp, summary, ATUS_TRAITS)
+
+    assert [call.get("nrows") for call in calls] == [0, 0]
+    assert report.ok, report.errors
+    assert "region: none of GEREG present" in report.warnings
+    assert report.resolved["high_childcare_time label_rule"].startswith("1 columns")
+    assert "has_pet_proxy: no columns match ['^t06']; trait will be skipped" in report.warnings
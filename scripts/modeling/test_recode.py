@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from recode import (
+    recode_atus_age,
+    recode_brfss_age,
+    recode_census_region,
+    recode_sex,
+    recode_state,
+    recode_state_region,
+    state_region_table,
+)
+
+
+def as_list(series: pd.Series) -> list:
+    return [None if pd.isna(v) else v for v in series.astype(object)]
+
+
+def test_brfss_age_bands_collapse_open_ended_top_codes():
+    codes = pd.Series([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 13, 14, 0, np.nan, 2.7, -1])
+    assert as_list(recode_brfss_age(codes)) == [
+        "18_24", "25_34", "25_34", "35_44", "35_44", "45_54", "45_54", "55_64", "55_64",
+        "65_plus", "65_plus", "65_plus", None, None, "25_34", None,
+    ]
+
+
+def test_sex_codes_outside_one_and_two_are_missing():
+    codes = pd.Series([1, 2, 7, 9, np.nan], dtype="float64")
+    assert as_list(recode_sex(codes)) == ["male", "female", None, None, None]
+
+
+def test_state_fips_map_to_regions_and_unknown_fips_are_missing():
+    table = state_region_table({"01": "south", "09": "northeast", "56": "west"})
+    codes = pd.Series([1, 9, 56, 66, 150, np.nan])
+    assert as_list(recode_state_region(codes, table)) == ["south", "northeast", "west", None, None, None]
+
+
+def test_state_fips_become_two_digit_keys():
+    states = recode_state(pd.Series([1, 9, 56, 66, 150, np.nan]), {"01": "south", "09": "northeast", "56": "west"})
+    assert as_list(states) == ["01", "09", "56", None, None, None]
+    assert list(states.cat.categories) == ["01", "09", "56"]
+
+
+def test_atus_ages_exclude_minors_and_top_code_into_65_plus():
+    codes = pd.Series([15, 17, 18, 24, 25, 44, 64, 65, 80, 85, np.nan])
+    assert as_list(recode_atus_age(codes)) == [
+        None, None, "18_24", "18_24", "25_34", "35_44", "55_64", "65_plus", "65_plus", "65_plus", None,
+    ]
+
+
+def test_census_region_codes_and_nullable_input():
+    codes = pd.Series([1, 2, 3, 4, 5, None], dtype="UInt8")
+    result = recode_census_region(codes)
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    assert as_list(result) == ["northeast", "midwest", "south", "west", None, None]
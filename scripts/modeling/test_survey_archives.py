@@ -0,0 +1,80 @@
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyreadstat
+import pytest
+
+from build_brfss_traits import (
+    CONFIG_PATH,
+    VECTORIZED_DERIVE_FUNCTIONS,
+    TraitConfig,
+    decode_brfss_chunks,
+    decode_brfss_dataframe,
+    load_json,
+    read_source_columns,
+)
+from survey_archives import find_member, iter_zipped_xpt
+from test_xpt_cache import make_frame, write_xpt
+from xpt_cache import ensure_parquet
+
+# CDC pads the member name inside LLCP2024XPT.zip with a trailing space
+MEMBER = "LLCP2024.XPT "
+USECOLS = ["_llcpwt", "SEXVAR", "_STATE", "_DRNKWK3"]
+
+
+@pytest.fixture
+def sources(tmp_path):
+    df = make_frame(rows=101, seed=7)
+    df["_DRNKWK3"] = np.tile([0.0, 14.0, 0.0, np.nan, 99999.0], 21)[:101]
+    plain = write_xpt(tmp_path / "plain" / "LLCP2024.XPT", df)
+    archive = tmp_path / "LLCP2024XPT.zip"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.write(plain, MEMBER)
+        zf.writestr("readme.txt", "codebook")
+    return plain, archive
+
+
+def test_padded_member_is_found_case_insensitively(sources):
+    _, archive = sources
+    assert find_member(archive, ["*.xpt"]) == MEMBER
+    assert find_member(archive, ["*.sas7bdat"]) is None
+    assert read_source_columns(archive) == read_source_columns(sources[0])
+
+
+def test_zipped_xpt_matches_the_plain_file_on_every_path(sources, tmp_path):
+    plain, archive = sources
+    reference, _ = pyreadstat.read_xport(str(plain))
+    projected = ["_STATE", "SEXVAR", "_LLCPWT", "_DRNKWK3"]
+
+    pd.testing.assert_frame_equal(decode_brfss_dataframe(archive), reference)
+    pd.testing.assert_frame_equal(decode_brfss_dataframe(archive, USECOLS), reference[projected])
+    pd.testing.assert_frame_equal(decode_brfss_dataframe(archive, USECOLS), decode_brfss_dataframe(plain, USECOLS))
+
+    chunks = list(decode_brfss_chunks(archive, USECOLS, chunksize=17))
+    assert [len(chunk) for chunk in chunks] == [17] * 5 + [16]
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks, ignore_index=True),
+        pd.concat(decode_brfss_chunks(plain, USECOLS, chunksize=17), ignore_index=True),
+        check_like=True,
+    )
+
+    parquet = ensure_parquet(archive, tmp_path / "cache")
+    pd.testing.assert_frame_equal(pd.read_parquet(parquet), reference)
+    pd.testing.assert_frame_equal(
+        pd.concat(decode_brfss_chunks(parquet, USECOLS, chunksize=17), ignore_index=True),
+        reference[sorted(projected)],
+    )
+
+
+def test_xport_zero_stays_a_non_drinker_on_the_pandas_path(sources):
+    plain, archive = sources
+    # pandas decodes an IBM-float zero as 2**-260, which would read as "drinks per week > 0"
+    raw = pd.read_sas(plain, format="xport", encoding="latin-1")
+    assert 0 < raw["_DRNKWK3"].iloc[0] < 1e-70
+
+    rule = next(TraitConfig(**t) for t in load_json(CONFIG_PATH)["traits"] if t["key"] == "any_alcohol_use").label_rule
+    for df in [decode_brfss_dataframe(plain), pd.concat(iter_zipped_xpt(archive, 17), ignore_index=True)]:
+        assert (df["_DRNKWK3"].iloc[[0, 2]] == 0.0).all()
+        labels = VECTORIZED_DERIVE_FUNCTIONS["any_alcohol_use"](df, rule, {col.upper(): col for col in df.columns})
+        np.testing.assert_array_equal(labels[:5], [0.0, 1.0, 0.0, np.nan, np.nan])
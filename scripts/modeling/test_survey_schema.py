@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from survey_schema import ATUS_PATTERN_SCHEMA, ATUS_SCHEMA, BRFSS_SCHEMA, KEY_DTYPES, apply_schema, observed_levels
+
+
+def test_codes_become_nullable_integers_and_weights_float32():
+    df = pd.DataFrame(
+        {
+            "_smoker3": [1.0, 4.0, np.nan],
+            "ALCDAY4": [101.0, 888.0, 999.0],
+            "_LLCPWT": [512.25, 80.5, np.nan],
+            "_PSU": [2024000001.0, 2024000002.0, 2024000003.0],
+            "UNLISTED": [1.5, 2.5, 3.5],
+        }
+    )
+    apply_schema(df, BRFSS_SCHEMA)
+
+    assert df["_smoker3"].dtype == "UInt8"
+    assert df["_smoker3"].isna().tolist() == [False, False, True]
+    assert df["_smoker3"].iloc[1] == 4
+    assert df["ALCDAY4"].dtype == "UInt16" and df["ALCDAY4"].tolist() == [101, 888, 999]
+    assert df["_LLCPWT"].dtype == np.float32 and np.isnan(df["_LLCPWT"].iloc[2])
+    assert df["_PSU"].dtype == np.float64
+    assert df["UNLISTED"].dtype == np.float64
+
+
+def test_values_that_do_not_fit_keep_float64(capsys):
+    df = pd.DataFrame({"SEXVAR": [1.0, 2.5], "_STATE": [1.0, 300.0], "DIABETE4": ["1", "x"]})
+    apply_schema(df, BRFSS_SCHEMA)
+
+    assert df["SEXVAR"].dtype == np.float64 and df["SEXVAR"].tolist() == [1.0, 2.5]
+    assert df["_STATE"].dtype == np.float64 and df["_STATE"].tolist() == [1.0, 300.0]
+    # Unparseable strings coerce to NA rather than failing the build
+    assert df["DIABETE4"].dtype == "UInt8" and df["DIABETE4"].isna().tolist() == [False, True]
+    out = capsys.readouterr().out
+    assert "SEXVAR does not fit UInt8" in out and "_STATE does not fit UInt8" in out
+
+
+def test_atus_activity_columns_match_by_pattern():
+    df = pd.DataFrame({"TUCASEID": [20240101240001.0], "t010101": [480.0], "T120303": [1440.0], "t0101": [5.0]})
+    apply_schema(df, ATUS_SCHEMA, ATUS_PATTERN_SCHEMA)
+
+    assert df["TUCASEID"].dtype == "UInt64" and df["TUCASEID"].iloc[0] == 20240101240001
+    assert df["t010101"].dtype == "UInt16" and df["T120303"].dtype == "UInt16"
+    assert df["t0101"].dtype == np.float64
+
+
+def test_observed_levels_drops_unused_key_levels():
+    frame = pd.DataFrame(
+        {
+            "sex_key": pd.Series(["male", "female"], dtype=KEY_DTYPES["sex_key"]),
+            "age_band": pd.Series(["18_24", "65_plus"], dtype=KEY_DTYPES["age_band"]),
+        }
+    )
+    observed = observed_levels(frame)
+
+    assert list(observed["age_band"].cat.categories) == ["18_24", "65_plus"]
+    assert list(observed["sex_key"].cat.categories) == ["female", "male"]
+    assert len(frame["age_band"].cat.categories) == 6
+    assert list(pd.get_dummies(observed["age_band"], drop_first=True).columns) == ["65_plus"]
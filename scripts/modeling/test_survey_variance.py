@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import expit
+
+from build_brfss_traits import (
+    TraitAggregates,
+    cell_design,
+    design_intervals,
+    fit_traits_batched,
+    load_trait_aggregates,
+    stream_trait_aggregates,
+)
+from test_brfss_fit import label_matrix, make_respondents
+from test_brfss_pooling import STATE_REGIONS, TRAIT, make_source
+from test_xpt_cache import write_xpt
+
+
+def assign_psus(frame: pd.DataFrame, layout: str, rng) -> pd.DataFrame:
+    frame["stratum"] = rng.integers(1, 30, len(frame)).astype("float64")
+    if layout == "one_per_respondent":
+        frame["psu"] = np.arange(len(frame), dtype="float64")
+    else:
+        frame["psu"] = frame["stratum"] * 100 + rng.integers(1, 6, len(frame))
+        if layout == "mixed":
+            # Half the respondents are their own PSU, as in BRFSS; the rest share one
+            single = rng.random(len(frame)) < 0.5
+            frame.loc[single, "psu"] = 10_000.0 + np.flatnonzero(single)
+    frame.loc[frame["stratum"] == 29, "psu"] = 2901.0  # a lonely-PSU stratum
+    return frame
+
+
+@pytest.mark.parametrize("layout", ["clustered", "one_per_respondent", "mixed"])
+def test_design_moments_match_row_level_sandwich(layout):
+    frame = make_respondents(6000, seed=21)
+    rng = np.random.default_rng(22)
+    frame = assign_psus(frame, layout, rng)
+    labels = (rng.random(len(frame)) < 0.3).astype(np.int8)
+
+    agg = TraitAggregates("trait")
+    agg.fold(frame, label_matrix(frame, labels))
+    fit = fit_traits_batched({"trait": agg})
+    design_cov, _ = design_intervals(fit, 0, agg, cell_design(frame.iloc[:5], fit.columns))
+
+    # Brute force: respondent-level scores summed per PSU, centered within strata
+    x = cell_design(frame, fit.columns)
+    w = frame["weight"].to_numpy(dtype="float64")
+    mu = expit(x @ fit.params[0])
+    scores = pd.DataFrame(x * (w * (labels - mu))[:, None])
+    z = scores.groupby([frame["stratum"], frame["psu"]]).sum()
+    meat = np.zeros((x.shape[1], x.shape[1]))
+    for _, block in z.groupby(level=0):
+        n_h = len(block)
+        if n_h > 1:
+            centered = block.to_numpy() - block.to_numpy().mean(axis=0)
+            meat += n_h / (n_h - 1) * centered.T @ centered
+    bread = np.linalg.inv((x * (w * mu * (1 - mu))[:, None]).T @ x)
+    expected = bread @ meat @ bread
+
+    assert design_cov.strata == 29
+    assert design_cov.psus == int(z.shape[0])
+    np.testing.assert_allclose(design_cov.cov, expected, rtol=1e-6, atol=1e-14)
+    # Only PSUs with several respondents keep per-PSU totals
+    shared_psus = agg.cluster_cells.index.droplevel("pattern").unique()
+    assert (len(shared_psus) == 1) == (layout == "one_per_respondent")
+    assert len(agg.stratum_cells) <= 29 * 2 * 6 * 4
+
+
+def test_pooled_sources_keep_strata_distinct():
+    frame = make_respondents(2000, seed=5)
+    frame["stratum"] = 1.0
+    frame["psu"] = np.tile([1.0, 2.0], 1000)
+    labels = np.tile(np.array([1, 0, 0, 1], dtype=np.int8), 500)
+    first, second = TraitAggregates("trait"), TraitAggregates("trait")
+    first.fold(frame, label_matrix(frame, labels))
+    second.fold(frame, label_matrix(frame, labels))
+
+    pooled = TraitAggregates("trait")
+    pooled.merge(first.scaled(0.5).with_source(0))
+    pooled.merge(second.scaled(0.5).with_source(1))
+
+    assert sorted(pooled.stratum_cells.index.droplevel("pattern").unique()) == [(0, 1.0), (1, 1.0)]
+    keys = pooled.cluster_cells.index.droplevel("pattern").unique()
+    assert sorted(keys) == [(0, 1.0, 1.0), (0, 1.0, 2.0), (1, 1.0, 1.0), (1, 1.0, 2.0)]
+    np.testing.assert_allclose(pooled.stratum_cells["sq_weight"].sum(), first.stratum_cells["sq_weight"].sum() / 2)
+
+
+@pytest.mark.parametrize("shared_psus", [True, False])
+def test_streamed_design_totals_match_the_in_memory_path(tmp_path, shared_psus):
+    df = make_source(500, seed=9)
+    if not shared_psus:
+        df["_PSU"] = np.arange(len(df), dtype=float)
+    xpt = write_xpt(tmp_path / "LLCP2024.XPT", df)
+    loaded = load_trait_aggregates(xpt, [TRAIT], STATE_REGIONS)[TRAIT.key]
+    # Chunks of 37 rows split every PSU's respondents (and patterns) across many chunks
+    streamed = stream_trait_aggregates(xpt, [TRAIT], STATE_REGIONS, chunksize=37)[TRAIT.key]
+
+    for name in ["cells", "stratum_cells", "cluster_cells", "fold_cells"]:
+        if getattr(loaded, name) is None:
+            assert getattr(streamed, name) is None and name == "cluster_cells" and not shared_psus
+            continue
+        pd.testing.assert_frame_equal(
+            getattr(streamed, name).sort_index(), getattr(loaded, name).sort_index(), check_dtype=False, rtol=1e-9
+        )
+
+    fit = fit_traits_batched({TRAIT.key: loaded})
+    cells = cell_design(loaded.cells.index.to_frame(index=False), fit.columns)
+    (loaded_cov, loaded_se), (streamed_cov, streamed_se) = (
+        design_intervals(fit, 0, agg, cells) for agg in (loaded, streamed)
+    )
+    assert (streamed_cov.strata, streamed_cov.psus) == (loaded_cov.strata, loaded_cov.psus)
+    assert loaded_cov.psus == (4 if shared_psus else loaded.cells["row_count"].sum())
+    np.testing.assert_allclose(streamed_cov.cov, loaded_cov.cov, rtol=1e-9)
+    np.testing.assert_allclose(streamed_se, loaded_se, rtol=1e-9)
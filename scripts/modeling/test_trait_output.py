@@ -0,0 +1,6 @@
+from trait_output import build_timestamp
+
+
+def test_source_date_epoch_pins_build_timestamp(monkeypatch):
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+    assert build_timestamp() == "2023-11-14T22:13:20+00:00"
@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pyreadstat
+import pytest
+
+import xpt_cache
+from xpt_cache import ensure_parquet
+
+
+def make_frame(rows=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "_STATE": rng.integers(1, 57, rows).astype(float),
+            "SEXVAR": rng.integers(1, 3, rows).astype(float),
+            "_AGEG5YR": rng.integers(1, 14, rows).astype(float),
+            "_LLCPWT": rng.uniform(10, 500, rows),
+        }
+    )
+
+
+def write_xpt(path, df):
+    """A CDC-style (version 5) transport file; writing names like _STATE needs pyreadstat >= 1.3.6."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pyreadstat.write_xport(df, str(path), table_name="LLCP", file_format_version=5)
+    return path
+
+
+def cache_files(cache_dir, suffix):
+    return sorted(p.name for p in cache_dir.iterdir() if p.name.endswith(suffix))
+
+
+def test_size_and_mtime_match_is_trusted_without_rehashing(tmp_path, monkeypatch):
+    xpt = write_xpt(tmp_path / "raw" / "LLCP2024.XPT", make_frame())
+    cache_dir = tmp_path / "cache"
+    first = ensure_parquet(xpt, cache_dir)
+    pd.testing.assert_frame_equal(pd.read_parquet(first), pyreadstat.read_xport(str(xpt))[0])
+
+    monkeypatch.setattr(xpt_cache, "sha256_file", lambda path: pytest.fail("rehashed an unchanged file"))
+    assert ensure_parquet(xpt, cache_dir) == first
+
+
+def test_touched_file_hits_through_its_hash(tmp_path, capsys):
+    xpt = write_xpt(tmp_path / "LLCP2024.XPT", make_frame())
+    cache_dir = tmp_path / "cache"
+    first = ensure_parquet(xpt, cache_dir)
+    os.utime(xpt, ns=(xpt.stat().st_atime_ns, xpt.stat().st_mtime_ns + 10**9))
+    capsys.readouterr()
+
+    assert ensure_parquet(xpt, cache_dir) == first
+    assert "contents unchanged" in capsys.readouterr().out
+    # The new mtime is recorded, so the next run is a plain size+mtime hit
+    assert ensure_parquet(xpt, cache_dir) == first
+    assert "contents unchanged" not in capsys.readouterr().out
+
+
+def test_changed_contents_reconvert_and_remove_the_stale_parquet(tmp_path):
+    xpt = write_xpt(tmp_path / "LLCP2024.XPT", make_frame(seed=1))
+    cache_dir = tmp_path / "cache"
+    first = ensure_parquet(xpt, cache_dir)
+
+    write_xpt(xpt, make_frame(seed=2))
+    second = ensure_parquet(xpt, cache_dir)
+
+    assert second != first and not first.exists()
+    assert cache_files(cache_dir, ".parquet") == [second.name]
+    assert len(cache_files(cache_dir, ".json")) == 1
+    pd.testing.assert_frame_equal(pd.read_parquet(second), pyreadstat.read_xport(str(xpt))[0])
+
+
+def test_same_file_name_in_two_year_directories_keeps_both_entries(tmp_path):
+    cache_dir = tmp_path / "cache"
+    older = write_xpt(tmp_path / "2023" / "LLCP.XPT", make_frame(seed=3))
+    newer = write_xpt(tmp_path / "2024" / "LLCP.XPT", make_frame(seed=4))
+    older_parquet = ensure_parquet(older, cache_dir)
+    newer_parquet = ensure_parquet(newer, cache_dir)
+
+    assert older_parquet != newer_parquet
+    assert older_parquet.exists() and newer_parquet.exists()
+    assert len(cache_files(cache_dir, ".json")) == 2
+    assert pq.read_metadata(older_parquet).num_rows == 50
+
+
+def test_failed_conversion_leaves_no_partial_file(tmp_path, monkeypatch):
+    xpt = write_xpt(tmp_path / "LLCP2024.XPT", make_frame())
+    cache_dir = tmp_path / "cache"
+
+    def first_chunk_then_fail(read, path, chunksize):
+        yield pyreadstat.read_xport(str(path), row_limit=10)
+        raise OSError("truncated file")
+
+    monkeypatch.setattr(xpt_cache.pyreadstat, "read_file_in_chunks", first_chunk_then_fail)
+    with pytest.raises(OSError, match="truncated"):
+        ensure_parquet(xpt, cache_dir)
+    assert cache_files(cache_dir, "") == []
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pyreadstat
+import pytest
+
+import xpt_parallel
+from test_xpt_cache import write_xpt
+from xpt_parallel import iter_xpt_parallel, read_xpt_parallel
+
+ROWS = 1001
+
+
+@pytest.fixture(scope="module")
+def xpt(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "ROWID": np.arange(ROWS, dtype=float),
+            "_LLCPWT": rng.uniform(10, 500, ROWS),
+            "SEXVAR": rng.integers(1, 3, ROWS).astype(float),
+        }
+    )
+    return write_xpt(tmp_path_factory.mktemp("xpt") / "LLCP2024.XPT", df)
+
+
+def assert_same_rows(df, reference):
+    assert df["ROWID"].tolist() == list(range(ROWS))
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), reference)
+
+
+def test_parallel_read_matches_a_single_read(xpt):
+    reference, _ = pyreadstat.read_xport(str(xpt))
+    # The size-based row estimate overshoots, so the last range is partly past the end
+    assert xpt_parallel.estimate_xpt_rows(xpt) > ROWS
+    assert_same_rows(read_xpt_parallel(xpt, None, workers=3), reference)
+    assert_same_rows(read_xpt_parallel(xpt, ["ROWID", "SEXVAR"], workers=3), reference[["ROWID", "SEXVAR"]])
+
+
+@pytest.mark.parametrize("chunksize", [7, 97, 334, 1000, 5000])
+def test_parallel_chunks_cover_every_row_once_in_order(xpt, chunksize, monkeypatch):
+    reference, _ = pyreadstat.read_xport(str(xpt))
+    chunks = list(iter_xpt_parallel(xpt, chunksize, workers=3))
+    assert all(0 < len(chunk) <= chunksize for chunk in chunks)
+    assert_same_rows(pd.concat(chunks), reference)
+
+    # A far larger estimate only adds empty trailing ranges
+    monkeypatch.setattr(xpt_parallel, "estimate_xpt_rows", lambda path: 3 * ROWS)
+    assert_same_rows(pd.concat(iter_xpt_parallel(xpt, chunksize, workers=3)), reference)
+    assert_same_rows(read_xpt_parallel(xpt, None, workers=3), reference)
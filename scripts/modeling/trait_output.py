@@ -0,0 +1,19 @@
+"""
+Build timestamp shared by the trait builders.
+
+Every trait in a build carries the same `generatedAt`, pinned by SOURCE_DATE_EPOCH when it
+is set, so rebuilding unchanged inputs reproduces the trait files byte for byte.
+"""
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+
+
+def build_timestamp() -> str:
+    """One timestamp per build (SOURCE_DATE_EPOCH when set), shared by every trait's meta."""
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch:
+        return pd.Timestamp(int(epoch), unit="s", tz="UTC").isoformat()
+    return pd.Timestamp.now("UTC").isoformat()
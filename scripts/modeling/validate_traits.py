@@ -16,6 +16,8 @@ from typing import Dict, List
 
 import numpy as np
 
+from cell_layout import is_child_age_band
+
 ROOT = Path(__file__).resolve().parents[2]
 ACS_CELLS_PATH = ROOT / "data" / "derived" / "acs_cells.json"
 TRAIT_DIR = ROOT / "data" / "derived" / "traits"
@@ -33,11 +35,6 @@ def load_json(path: Path) -> dict:
         return json.load(f)
 
 
-def is_child_age_band(age_band: str) -> bool:
-    """Check if an age band is for children (under 18)."""
-    return age_band in ("0_17", "0_14", "15_17")
-
-
 def validate_prevalence(
     probs: Dict[str, float],
     cells: List[dict],
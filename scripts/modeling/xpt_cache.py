@@ -0,0 +1,153 @@
+"""
+Parquet conversion cache for raw SAS transport (XPT) files, plain or zipped.
+
+Parsing a BRFSS XPT takes tens of seconds per run. The first time a file is seen it is
+converted chunk by chunk into a columnar Parquet file under data/cache/xpt/; later runs
+memory-map that file and read only the columns they need.
+
+Cache entries are keyed by file size, mtime and SHA-256 of the XPT contents. A sidecar
+JSON per source path records all three: a size+mtime match is trusted without rehashing, and
+a file that was merely touched or copied is recognized by its hash instead of being
+reconverted. Sidecars are named by the resolved source path, so pooled years that share a
+file name (2023/LLCP.XPT, 2024/LLCP.XPT) keep separate entries.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyreadstat
+
+from survey_archives import is_zip, iter_zipped_xpt
+from xpt_parallel import iter_xpt_parallel
+
+ROOT = Path(__file__).resolve().parents[2]
+CACHE_DIR = ROOT / "data" / "cache" / "xpt"
+CONVERT_CHUNK_ROWS = 100_000
+HASH_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sidecar_path(xpt_path: Path, cache_dir: Path) -> Path:
+    path_hash = hashlib.sha256(str(xpt_path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return cache_dir / f"{xpt_path.name}-{path_hash}.json"
+
+
+def _read_sidecar(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _write_sidecar(path: Path, entry: dict) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(entry, f, indent=2)
+
+
+def _referenced_elsewhere(parquet_name: str, sidecar: Path, cache_dir: Path) -> bool:
+    """Whether another source's sidecar points at `parquet_name` (identical contents share a file)."""
+    for other in cache_dir.glob("*.json"):
+        if other != sidecar and (_read_sidecar(other) or {}).get("parquet") == parquet_name:
+            return True
+    return False
+
+
+def convert_xpt_to_parquet(
+    xpt_path: Path,
+    parquet_path: Path,
+    chunksize: int = CONVERT_CHUNK_ROWS,
+    workers: int = 1,
+) -> int:
+    """
+    Convert every column of the XPT to Parquet, one row group per chunk, so the
+    conversion itself never holds the whole file in memory. With `workers` > 1 the
+    chunks are decoded on a process pool. Zip archives are streamed without extraction.
+    Returns the row count.
+    """
+    tmp_path = parquet_path.with_name(parquet_path.name + ".tmp")
+    writer: Optional[pq.ParquetWriter] = None
+    rows = 0
+    completed = False
+    try:
+        if is_zip(xpt_path):
+            chunks = iter_zipped_xpt(xpt_path, chunksize)
+        elif workers > 1:
+            chunks = iter_xpt_parallel(xpt_path, chunksize, workers)
+        else:
+            chunks = (chunk for chunk, _ in pyreadstat.read_file_in_chunks(
+                pyreadstat.read_xport, xpt_path, chunksize=chunksize
+            ))
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+        completed = True
+    finally:
+        if writer is not None:
+            writer.close()
+        # A failed conversion leaves no partial file behind
+        if not completed:
+            tmp_path.unlink(missing_ok=True)
+    tmp_path.replace(parquet_path)
+    return rows
+
+
+def ensure_parquet(xpt_path: Path, cache_dir: Path = CACHE_DIR, workers: int = 1) -> Path:
+    """Return the Parquet copy of `xpt_path`, converting it first if no valid cache entry exists."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    stat = xpt_path.stat()
+    sidecar = _sidecar_path(xpt_path, cache_dir)
+    entry = _read_sidecar(sidecar)
+
+    if entry and (cache_dir / entry["parquet"]).exists() and entry["size"] == stat.st_size:
+        if entry["mtime_ns"] == stat.st_mtime_ns:
+            print(f"Using cached Parquet for {xpt_path.name}: {entry['parquet']}")
+            return cache_dir / entry["parquet"]
+        content_hash = sha256_file(xpt_path)
+        if content_hash == entry["sha256"]:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            _write_sidecar(sidecar, entry)
+            print(f"Using cached Parquet for {xpt_path.name} (mtime changed, contents unchanged)")
+            return cache_dir / entry["parquet"]
+    else:
+        content_hash = sha256_file(xpt_path)
+
+    parquet_name = f"{xpt_path.stem}-{content_hash[:16]}.parquet"
+    print(f"Converting {xpt_path.name} to Parquet cache: {cache_dir / parquet_name}")
+    rows = convert_xpt_to_parquet(xpt_path, cache_dir / parquet_name, workers=workers)
+    if entry and entry["parquet"] != parquet_name and not _referenced_elsewhere(entry["parquet"], sidecar, cache_dir):
+        (cache_dir / entry["parquet"]).unlink(missing_ok=True)
+    _write_sidecar(
+        sidecar,
+        {
+            "source": str(xpt_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": content_hash,
+            "rows": rows,
+            "parquet": parquet_name,
+        },
+    )
+    return cache_dir / parquet_name
+
+
+def read_parquet_columns(parquet_path: Path) -> List[str]:
+    """Column names from the Parquet footer; no data pages are read."""
+    return list(pq.read_schema(parquet_path, memory_map=True).names)
@@ -90,6 +90,10 @@ export type TraitManifest = {
 export type TraitProbabilityFile = {
   meta: Record<string, unknown>
   prob_by_cell: Record<string, number>
+  se_by_cell?: Record<string, number>
+  ci95_by_cell?: Record<string, [number, number]>
+  prob_by_state_cell?: Record<string, number>
+  prevalence_by_state?: Record<string, number>
 }
 
 export type ModeledAssets = {